@@ -1,3 +1,7 @@
 from django.contrib import admin
+from analytic.models import SalesRollup, PaymentRollup
 
 # Register your models here.
+
+admin.site.register(SalesRollup)
+admin.site.register(PaymentRollup)
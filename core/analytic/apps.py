@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class AnalyticConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'analytic'
+
+    def ready(self):
+        from utils.cache import check_shared_cache
+        checks.register(check_shared_cache, checks.Tags.caches)
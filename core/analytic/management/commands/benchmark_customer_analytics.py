@@ -0,0 +1,82 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import F, DateTimeField
+from django.db.models.functions import Cast
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from analytic.views import CustomerAnalytics
+from authentication.models import User
+from business.models import Business
+from customer.models import Customer
+from sale.models import Sale
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Time CustomerAnalytics against a seeded business. The seed data is rolled back unless --keep is given"
+    def add_arguments(self, parser):
+        parser.add_argument("--sales", type=int, default=100000)
+        parser.add_argument("--customers", type=int, default=5000)
+        parser.add_argument("--runs", type=int, default=10)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded business")
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                owner, business = self.seed(options)
+                self.benchmark(owner, business, options["runs"])
+                if not options["keep"]:
+                    raise Rollback()
+        except Rollback:
+            self.stdout.write("Seed data rolled back.")
+
+    def seed(self, options):
+        self.stdout.write(f"Seeding {options['customers']} customers and {options['sales']} sales...")
+        suffix = random.randint(0, 10 ** 9)
+        owner = User.objects.create_user(
+            "Benchmark", "Owner", f"benchmark-{suffix}@example.com", f"0{suffix}",
+            password=None, role="OWNER", is_verified=True, is_subscribed=True
+        )
+        business = Business.objects.create(owner=owner, name="Benchmark", country="NG", state="Lagos", city="Lagos", street="Benchmark")
+        today = timezone.now()
+        customers = []
+        for month in range(12):
+            batch = Customer.objects.bulk_create([
+                Customer(business=business, name=f"Customer {month}-{i}", phone="0", email=f"c{month}-{i}@example.com", purchase_value=random.randint(0, 100000))
+                for i in range(options["customers"] // 12 or 1)
+            ], batch_size=options["batch_size"])
+            Customer.objects.filter(id__in=[c.id for c in batch]).update(created_at=today - timedelta(days=30 * month))
+            customers += batch
+        for start in range(0, options["sales"], options["batch_size"]):
+            Sale.objects.bulk_create([
+                Sale(
+                    business=business,
+                    customer=random.choice(customers) if random.random() < 0.8 else None,
+                    total_price=random.randint(100, 50000),
+                    date=(today - timedelta(days=random.randint(0, 540))).date()
+                ) for _ in range(min(options["batch_size"], options["sales"] - start))
+            ], batch_size=options["batch_size"])
+        Sale.objects.filter(business=business).update(created_at=Cast(F("date"), DateTimeField()))
+        return owner, business
+
+    def benchmark(self, owner, business, runs):
+        factory = APIRequestFactory()
+        view = CustomerAnalytics.as_view()
+        timings = []
+        for _ in range(runs):
+            request = factory.get(f"/api/v1/analytic/customers/{business.id}/")
+            force_authenticate(request, user=owner)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = view(request, id=business.id)
+                timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(f"Status {response.status_code}, {len(queries.captured_queries)} queries per request")
+        self.stdout.write(f"Latency over {runs} runs: median {statistics.median(timings):.1f} ms, min {min(timings):.1f} ms, max {max(timings):.1f} ms")
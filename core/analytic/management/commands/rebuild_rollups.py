@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from analytic.rollup import Rollup
+
+
+class Command(BaseCommand):
+    help = "Recompute the sales and payment rollups from the sales, payments and expenses tables"
+    def add_arguments(self, parser):
+        parser.add_argument("--business", action="append", help="Only rebuild this business id (repeatable)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding rollups...")
+        Rollup.rebuild(options["business"], options["batch_size"])
+        self.stdout.write("Rollups rebuilt.")
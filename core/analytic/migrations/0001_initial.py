@@ -0,0 +1,48 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('business', '0011_businessbank'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('method', models.CharField(choices=[('CREDIT', 'Credit'), ('PARTIAL', 'Partial'), ('CASH', 'Cash'), ('MYCLIQ', 'Mycliq'), ('BANK', 'Bank'), ('ADVANCE', 'Advance balance')], max_length=10)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('attendant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_rollups', to=settings.AUTH_USER_MODEL)),
+                ('bank', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment_rollups', to='business.businessbank')),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_rollups', to='business.business')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['business', 'date'], name='payment_rollup_business_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('expenses', models.BigIntegerField(default=0)),
+                ('attendant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sales_rollups', to=settings.AUTH_USER_MODEL)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='business.business')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['business', 'date'], name='sales_rollup_business_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def populate_rollups(apps, schema_editor):
+    Sale = apps.get_model("sale", "Sale")
+    PaymentHistory = apps.get_model("sale", "PaymentHistory")
+    Expenses = apps.get_model("expenses", "Expenses")
+    SalesRollup = apps.get_model("analytic", "SalesRollup")
+    PaymentRollup = apps.get_model("analytic", "PaymentRollup")
+    sales = Sale.objects.order_by().values("business_id", "attendant_id", "date").annotate(
+        total=Sum("total_price"), count=Count("id")
+    )
+    SalesRollup.objects.bulk_create([
+        SalesRollup(
+            business_id=row["business_id"], attendant_id=row["attendant_id"], date=row["date"],
+            revenue=row["total"], transaction_count=row["count"]
+        ) for row in sales.iterator()
+    ], batch_size=1000)
+    expenses = Expenses.objects.order_by().values("business_id", "date").annotate(total=Sum("amount"))
+    SalesRollup.objects.bulk_create([
+        SalesRollup(business_id=row["business_id"], date=row["date"], expenses=row["total"]) for row in expenses.iterator()
+    ], batch_size=1000)
+    payments = PaymentHistory.objects.order_by().values(
+        "sale__business_id", "sale__attendant_id", "sale__date", "method", "bank_id"
+    ).annotate(total=Sum("amount"))
+    PaymentRollup.objects.bulk_create([
+        PaymentRollup(
+            business_id=row["sale__business_id"], attendant_id=row["sale__attendant_id"], date=row["sale__date"],
+            method=row["method"], bank_id=row["bank_id"], amount=row["total"]
+        ) for row in payments.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytic', '0001_initial'),
+        ('expenses', '0003_expenses_added_by'),
+        ('sale', '0009_salesynckey'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
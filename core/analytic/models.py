@@ -1,3 +1,41 @@
 from django.db import models
+from business.models import Business, BusinessBank
+from sale.models import PAYMENT_METHOD
+from django.contrib.auth import get_user_model
 
 # Create your models here.
+
+User = get_user_model()
+
+class SalesRollup(models.Model):
+    """
+    Daily totals per business and attendant. Expenses are not tied to an
+    attendant and are kept on the rows without one.
+    """
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name="sales_rollups")
+    attendant = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="sales_rollups")
+    date = models.DateField()
+    revenue = models.DecimalField(decimal_places=2, max_digits=14, default=0)
+    transaction_count = models.IntegerField(default=0)
+    expenses = models.BigIntegerField(default=0)
+    class Meta:
+        indexes = [
+            models.Index(fields=["business", "date"], name="sales_rollup_business_date_idx"),
+        ]
+    def __str__(self):
+        return f"{self.business_id} on {self.date} = {self.revenue}"
+
+
+class PaymentRollup(models.Model):
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name="payment_rollups")
+    attendant = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="payment_rollups")
+    date = models.DateField()
+    method = models.CharField(max_length=10, choices=PAYMENT_METHOD)
+    bank = models.ForeignKey(BusinessBank, on_delete=models.SET_NULL, null=True, blank=True, related_name="payment_rollups")
+    amount = models.DecimalField(decimal_places=2, max_digits=14, default=0)
+    class Meta:
+        indexes = [
+            models.Index(fields=["business", "date"], name="payment_rollup_business_idx"),
+        ]
+    def __str__(self):
+        return f"{self.method} for {self.business_id} on {self.date} = {self.amount}"
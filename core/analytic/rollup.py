@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models import F, Sum, Count
+from analytic.models import SalesRollup, PaymentRollup
+from expenses.models import Expenses
+from sale.models import Sale, PaymentHistory
+
+
+def _add(model, keys, **amounts):
+    """
+    Adds `amounts` to the row matching `keys`, creating it when missing. Two
+    requests racing on a new day can both create a row; readers always sum rows,
+    so that only costs an extra row.
+    """
+    updated = model.objects.filter(**keys).update(**{field: F(field) + value for field, value in amounts.items()})
+    if not updated:
+        model.objects.create(**keys, **amounts)
+
+
+class Rollup:
+    """Keeps SalesRollup and PaymentRollup in step with sales and expenses."""
+
+    @staticmethod
+    def record_sale(sale, payment=None):
+        _add(
+            SalesRollup,
+            {"business_id": sale.business_id, "attendant_id": sale.attendant_id, "date": sale.date},
+            revenue=sale.total_price, transaction_count=1
+        )
+        if payment:
+            _add(
+                PaymentRollup,
+                {
+                    "business_id": sale.business_id, "attendant_id": sale.attendant_id,
+                    # Same day bucket as the sale the payment settles
+                    "date": sale.date, "method": payment.method, "bank_id": payment.bank_id
+                },
+                amount=payment.amount
+            )
+
+    @staticmethod
+    def record_expense(business_id, date, amount):
+        """`amount` is negative when an expense is removed or reduced."""
+        if amount:
+            _add(SalesRollup, {"business_id": business_id, "attendant_id": None, "date": date}, expenses=amount)
+
+    @staticmethod
+    def rebuild(business_ids=None, batch_size=1000):
+        """Recomputes the rollups from Sale, Expenses and PaymentHistory."""
+        sales = Sale.objects.all()
+        expenses = Expenses.objects.all()
+        payments = PaymentHistory.objects.all()
+        sales_rollups = SalesRollup.objects.all()
+        payment_rollups = PaymentRollup.objects.all()
+        if business_ids is not None:
+            sales = sales.filter(business_id__in=business_ids)
+            expenses = expenses.filter(business_id__in=business_ids)
+            payments = payments.filter(sale__business_id__in=business_ids)
+            sales_rollups = sales_rollups.filter(business_id__in=business_ids)
+            payment_rollups = payment_rollups.filter(business_id__in=business_ids)
+        sales = sales.order_by().values("business_id", "attendant_id", "date").annotate(
+            revenue=Sum("total_price"), transaction_count=Count("id")
+        )
+        expenses = expenses.order_by().values("business_id", "date").annotate(total=Sum("amount"))
+        payments = payments.order_by().values(
+            "sale__business_id", "sale__attendant_id", "sale__date", "method", "bank_id"
+        ).annotate(total=Sum("amount"))
+        with transaction.atomic():
+            sales_rollups.delete()
+            payment_rollups.delete()
+            SalesRollup.objects.bulk_create(
+                [SalesRollup(**row) for row in sales.iterator()], batch_size=batch_size
+            )
+            SalesRollup.objects.bulk_create(
+                [SalesRollup(business_id=row["business_id"], date=row["date"], expenses=row["total"]) for row in expenses.iterator()],
+                batch_size=batch_size
+            )
+            PaymentRollup.objects.bulk_create(
+                [
+                    PaymentRollup(
+                        business_id=row["sale__business_id"], attendant_id=row["sale__attendant_id"], date=row["sale__date"],
+                        method=row["method"], bank_id=row["bank_id"], amount=row["total"]
+                    ) for row in payments.iterator()
+                ],
+                batch_size=batch_size
+            )
@@ -1,3 +1,66 @@
+from datetime import timedelta
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from authentication.models import User
+from business.models import Business
+from category.models import Category
+from expenses.models import Expenses
+from product.models import Product
+from analytic.rollup import Rollup
+from sale.checkout import SaleCheckout
+from sale.serializers import UserSalesSerializer
 
-# Create your tests here.
+
+class SalesAnalyticViewTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Obi", "owner@example.com", "0801", password="pw")
+        User.objects.filter(id=self.owner.id).update(is_subscribed=True, subscription_end_date=timezone.localdate() + timedelta(days=30))
+        self.owner.refresh_from_db()
+        self.attendant = User.objects.create_user("Ike", "Eze", "attendant@example.com", "0802", password="pw", role="ATTENDANT")
+        self.business = Business.objects.create(owner=self.owner, name="Shop", country="NG", state="Lagos", city="Ikeja", street="1 Road", logo="business/logo.png")
+        self.business.attendants.add(self.attendant)
+        category = Category.objects.create(business=self.business, name="Drinks")
+        self.product = Product.objects.create(name="Malt", category=category, quantity=100, cost_price=5, selling_price=10)
+        today = timezone.localdate()
+        self.sell(self.owner, 3, "CASH", today)
+        self.sell(self.attendant, 2, "MYCLIQ", today)
+        self.sell(self.owner, 4, "CASH", today - timedelta(days=40))
+        expense = Expenses.objects.create(business=self.business, name="Rent", amount=15, date=today, added_by=self.owner)
+        Rollup.record_expense(self.business.id, expense.date, expense.amount)
+
+    def sell(self, attendant, quantity, method, date):
+        serializer = UserSalesSerializer(data={
+            "date": str(date), "method": method,
+            "products": [{"id": str(self.product.id), "unit_price": "10", "quantity": quantity}],
+        })
+        serializer.is_valid(raise_exception=True)
+        SaleCheckout(self.business, attendant).run(serializer.validated_data)
+
+    def analytics(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get(f"/api/v1/analytic/sales/{self.business.id}/")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_owner_sees_the_whole_business(self):
+        data = self.analytics(self.owner)
+        self.assertEqual((data["total_Revenue"], data["transaction_count"], data["total_profit"]), (50, 2, 35))
+        self.assertEqual(data["average_transaction_value"], 25)
+        self.assertEqual(
+            [(row["payment_method"], row["total_amount"]) for row in data["transaction_breakdown"]],
+            [("Cash", 30), ("Mycliq", 20)]
+        )
+        chart = data["chart_data"]
+        self.assertEqual((chart["all_time_revenue"], chart["one_month_revenue"], chart["all_time_profit"]), (90, 50, 75))
+
+    def test_attendant_sees_own_sales_and_business_expenses(self):
+        data = self.analytics(self.attendant)
+        self.assertEqual((data["total_Revenue"], data["transaction_count"], data["total_profit"]), (20, 1, 5))
+        self.assertEqual([row["total_amount"] for row in data["transaction_breakdown"]], [20])
+
+    def test_rebuilt_rollups_give_the_same_figures(self):
+        before = self.analytics(self.owner)
+        Rollup.rebuild([self.business.id])
+        self.assertEqual(self.analytics(self.owner), before)
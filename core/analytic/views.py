@@ -2,13 +2,16 @@ from rest_framework import status, generics, views
 from rest_framework.response import Response
 from utils.pagination import CustomPagination
 from rest_framework.permissions import IsAuthenticated
+from utils.access import Access
 from utils.permissions import IsBusinessOwner, IsSubscribed
 from utils.date import CustomDateFormating
-from sale.models import Sale, SaleProduct, PaymentHistory
-from django.db.models import Sum, Count
-from product.models import Product
+from sale.models import Sale, SaleProduct
+from django.db.models import Sum, Count, Q, Value, DecimalField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from analytic.models import SalesRollup, PaymentRollup
+from product.models import InventoryValuation
+from product.inventory import InventoryLedger
 from customer.models import Customer
-from expenses.models import Expenses
 from business.models import Business
 from drf_yasg import openapi
 from datetime import datetime, timedelta, date
@@ -44,10 +47,11 @@ class SalesAnalyticView(views.APIView):
     )
     def get(self, request, id):
         user = request.user
-        business = get_object_or_404(Business, id=id)
-        is_attendant = business.attendants.filter(id=user.id).exists()
-        if not business.owner == user and not is_attendant:
+        access = Access.of(request)
+        if not access.can_access(id):
             return Response(data={"message": "No Business matches the given query"}, status=status.HTTP_401_UNAUTHORIZED)
+        business = get_object_or_404(Business, id=id)
+        is_attendant = access.attends(id)
         param1 = self.request.query_params.get('start_date', None)
         param2 = self.request.query_params.get('end_date', None)
         attendant_id = self.request.query_params.get('attendance_id', None)
@@ -55,60 +59,62 @@ class SalesAnalyticView(views.APIView):
         if not start_date:
             return Response(data={"message":end_date}, status=status.HTTP_400_BAD_REQUEST)
 
-        all_sales = Sale.objects.filter(business__id = id, business__owner=user)
-        all_expenses = Expenses.objects.filter(business__id = id, business__owner=user)
-        payment_data = PaymentHistory.objects.filter(
-            sale__business__id=id,
-            sale__business__owner=user,
-            created_at__range=[start_date, end_date]
-        )
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        today = CustomDateFormating.single_day(today)
+        one_month_ago = today - relativedelta(months=1)
+        six_months_ago = today - relativedelta(months=6)
+        one_year_ago = today - relativedelta(years=1)
+
+        rollups = SalesRollup.objects.filter(business=business)
+        payment_data = PaymentRollup.objects.filter(business=business, date__gte=start_date, date__lt=end_date)
+        attendant_filter = Q()
         if is_attendant:
-            all_sales = all_sales.filter(attendant=user)
-            payment_data = payment_data.filter(sale__attendant =user)
-        if attendant_id and not is_attendant:
-            attendant = get_object_or_404(User, id=attendant_id)
-            all_sales = all_sales.filter(attendant=attendant)
-            payment_data = payment_data.filter(sale__attendant =attendant)
-        duration = all_sales.filter(date__range=[start_date, end_date])
-        before_duration = all_sales.filter(date__range=[date_before, start_date])
-        duration_total_revenue = duration.aggregate(total=Sum("total_price"))["total"] or 0
-        duration_count_of_transactions = duration.count()
+            attendant_filter = Q(attendant=user)
+        elif attendant_id:
+            attendant_filter = Q(attendant=get_object_or_404(User, id=attendant_id))
+        payment_data = payment_data.filter(attendant_filter)
+        windows = {
+            "duration": Q(date__range=[start_date, end_date]),
+            "before_duration": Q(date__range=[date_before, start_date]),
+            "all_time": Q(),
+            "one_month": Q(date__range=[one_month_ago, today]),
+            "six_month": Q(date__range=[six_months_ago, today]),
+            "one_year": Q(date__range=[one_year_ago, today]),
+        }
+        aggregates = {}
+        for name, window in windows.items():
+            # Expenses belong to the business, not to the attendant who made the sales
+            aggregates[f"{name}_revenue"] = Coalesce(Sum("revenue", filter=window & attendant_filter), Value(0), output_field=DecimalField())
+            aggregates[f"{name}_count"] = Coalesce(Sum("transaction_count", filter=window & attendant_filter), Value(0))
+            aggregates[f"{name}_expenses"] = Coalesce(Sum("expenses", filter=window), Value(0))
+        totals = rollups.aggregate(**aggregates)
+
+        duration_total_revenue = totals["duration_revenue"]
+        duration_count_of_transactions = totals["duration_count"]
         duration_average_volume = round(duration_total_revenue / duration_count_of_transactions, 0) if duration_count_of_transactions > 0 else 0
-        before_duration_total_revenue = before_duration.aggregate(total=Sum("total_price"))["total"] or 0
-        before_duration_count_of_transactions = before_duration.count()
+        before_duration_total_revenue = totals["before_duration_revenue"]
+        before_duration_count_of_transactions = totals["before_duration_count"]
         before_duration_average_volume = round(before_duration_total_revenue / before_duration_count_of_transactions, 0) if before_duration_count_of_transactions > 0 else 0
         revenue_change = calculate_percentage_change(before_duration_total_revenue,duration_total_revenue)
         transaction_change = calculate_percentage_change(before_duration_count_of_transactions,duration_count_of_transactions)
         volume_change = calculate_percentage_change(before_duration_average_volume,duration_average_volume)
-        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        today = CustomDateFormating.single_day(today)
-        one_month_ago = today - relativedelta(months=1)
-        six_months_ago = today - relativedelta(months=6)
-        one_year_ago = today - relativedelta(years=1)
 
-        all_time_revenue = all_sales.aggregate(total=Sum("total_price"))["total"] or 0
-        duration_revenue = duration.aggregate(total=Sum("total_price"))["total"] or 0
-        before_duration_revenue = before_duration.aggregate(total=Sum("total_price"))["total"] or 0
-        one_month_revenue = all_sales.filter(date__range=[one_month_ago, today]).aggregate(total=Sum("total_price"))["total"] or 0
-        six_month_revenue = all_sales.filter(date__range=[six_months_ago, today]).aggregate(total=Sum("total_price"))["total"] or 0
-        one_year_revenue = all_sales.filter(date__range=[one_year_ago, today]).aggregate(total=Sum("total_price"))["total"] or 0
-
-        all_time_expenses = all_expenses.aggregate(total=Sum("amount"))["total"] or 0
-        duration_expenses = all_expenses.filter(date__range=[start_date, end_date]).aggregate(total=Sum("amount"))["total"] or 0
-        before_duration_expenses = all_expenses.filter(date__range=[date_before, start_date]).aggregate(total=Sum("amount"))["total"] or 0
-        one_month_expenses = all_expenses.filter(created_at__range=[one_month_ago, today]).aggregate(total=Sum("amount"))["total"] or 0
-        six_month_expenses = all_expenses.filter(created_at__range=[six_months_ago, today]).aggregate(total=Sum("amount"))["total"] or 0
-        one_year_expenses = all_expenses.filter(created_at__range=[one_year_ago, today]).aggregate(total=Sum("amount"))["total"] or 0
+        all_time_revenue = totals["all_time_revenue"]
+        one_month_revenue = totals["one_month_revenue"]
+        six_month_revenue = totals["six_month_revenue"]
+        one_year_revenue = totals["one_year_revenue"]
+        all_time_expenses = totals["all_time_expenses"]
+        one_month_expenses = totals["one_month_expenses"]
+        six_month_expenses = totals["six_month_expenses"]
+        one_year_expenses = totals["one_year_expenses"]
         all_time_profit = all_time_revenue - all_time_expenses
-        duration_time_profit = duration_revenue - duration_expenses
-        before_duration_profit = before_duration_revenue - before_duration_expenses
+        duration_time_profit = duration_total_revenue - totals["duration_expenses"]
+        before_duration_profit = before_duration_total_revenue - totals["before_duration_expenses"]
         profit_change = calculate_percentage_change(before_duration_profit, duration_time_profit)
         one_month_profit = one_month_revenue - one_month_expenses
         six_month_profit = six_month_revenue - six_month_expenses
         one_year_profit = one_year_revenue - one_year_expenses
 
-        
-
         payment_data = payment_data.values('method', 'bank__bank_name').annotate(total_amount=Sum('amount')).order_by('method', 'bank__bank_name')
 
         transaction_data = []
@@ -168,10 +174,10 @@ class ProductAnalytics(views.APIView):
         start_date, end_date, date_before = CustomDateFormating.start_end_date(param1, param2)
         if not start_date:
             return Response(data={"message":end_date}, status=status.HTTP_400_BAD_REQUEST)
-        all_products = Product.objects.filter(category__business__id = id, category__business__owner = user)
-        total_products =  all_products.count()
-        low_stock = all_products.filter(status="LOW").count()
-        out_of_stock = all_products.filter(status="OUT-OF-STOCK").count()
+        inventory = InventoryLedger.totals(InventoryValuation.objects.filter(business__id = id, business__owner = user))
+        total_products = inventory["products"]
+        low_stock = inventory["low_stock"]
+        out_of_stock = inventory["out_of_stock"]
         sales_products = SaleProduct.objects.filter(sale__business__id=id)
         last_7_days = timezone.now().date() - timedelta(days=7)
         fast_moving = sales_products.filter(sale__date__gte=last_7_days).values("product__name", "product__image").annotate(quantity_sold=Sum("quantity")).order_by("-quantity_sold").first()
@@ -199,38 +205,51 @@ class CustomerAnalytics(views.APIView):
         start_date, end_date, date_before = CustomDateFormating.start_end_date(param1, param2)
         if not start_date:
             return Response(data={"message":end_date}, status=status.HTTP_400_BAD_REQUEST)
-        all_customers = Customer.objects.filter(business= business)
-        total_customers = all_customers.count()
-        new_customers = all_customers.filter(created_at__range = [start_date, end_date])
-        before_period = all_customers.filter(created_at__range= [date_before, start_date])
-        change_in_customer = calculate_percentage_change(before_period.count(), new_customers.count())
-        all_sales = Sale.objects.filter(business=business)
-        top_customer = all_customers.order_by('-purchase_value').first()
-        top_customer_last_sales = all_sales.filter(customer=top_customer).order_by("-created_at").first()
-        top_customer_info = {}
-        if top_customer_last_sales and top_customer:
-            last_amt = top_customer_last_sales.total_price
-            top_customer_info["name"] = top_customer.name
-            # top_customer_info["image"] = top_customer.profile_pic
-            top_customer_info["last_amount"]  = last_amt
-        returning_customer = all_sales.filter(created_at__range=[start_date, end_date]).values('customer').distinct().count()
-        # before_period_returning_customer = all_sales.filter(created_at__range=[date_before, start_date]).values('customer').distinct().count()
-        returning_customer_percentage = round((returning_customer / total_customers * 0.01), 0) if total_customers else 0
-
         today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         today = CustomDateFormating.single_day(today)
         one_month_ago = today - relativedelta(months=1)
         six_months_ago = today - relativedelta(months=6)
         one_year_ago = today - relativedelta(years=1)
 
+        all_customers = Customer.objects.filter(business= business)
+        customers = all_customers.aggregate(
+            total=Count('id'),
+            new=Count('id', filter=Q(created_at__range=[start_date, end_date])),
+            before_period=Count('id', filter=Q(created_at__range=[date_before, start_date])),
+            one_month=Count('id', filter=Q(created_at__range=[one_month_ago, today])),
+            six_months=Count('id', filter=Q(created_at__range=[six_months_ago, today])),
+            one_year=Count('id', filter=Q(created_at__range=[one_year_ago, today])),
+        )
+        returning = Sale.objects.filter(business=business).aggregate(
+            duration=Count('customer', distinct=True, filter=Q(created_at__range=[start_date, end_date])),
+            all_time=Count('customer', distinct=True),
+            one_month=Count('customer', distinct=True, filter=Q(created_at__range=[one_month_ago, today])),
+            six_months=Count('customer', distinct=True, filter=Q(created_at__range=[six_months_ago, today])),
+            one_year=Count('customer', distinct=True, filter=Q(created_at__range=[one_year_ago, today])),
+        )
+        total_customers = customers['total']
+        new_customers = customers['new']
+        change_in_customer = calculate_percentage_change(customers['before_period'], new_customers)
+        last_sale = Sale.objects.filter(business=business, customer=OuterRef('pk')).order_by('-created_at')
+        top_customer = all_customers.annotate(
+            last_amount=Subquery(last_sale.values('total_price')[:1])
+        ).order_by('-purchase_value').values('name', 'last_amount').first()
+        top_customer_info = {}
+        if top_customer and top_customer['last_amount'] is not None:
+            top_customer_info["name"] = top_customer['name']
+            # top_customer_info["image"] = top_customer.profile_pic
+            top_customer_info["last_amount"]  = top_customer['last_amount']
+        returning_customer = returning['duration']
+        returning_customer_percentage = round((returning_customer / total_customers * 0.01), 0) if total_customers else 0
+
         all_time_total_customer = total_customers
-        one_month_total_customer = all_customers.filter(created_at__range = [one_month_ago, today]).count()
-        six_months_total_customer = all_customers.filter(created_at__range = [six_months_ago, today]).count()
-        one_year_total_customer = all_customers.filter(created_at__range = [one_year_ago, today]).count()
-        all_time_returning_customer = all_sales.filter().values('customer').distinct().count()
-        one_month_returning_customer = all_sales.filter(created_at__range = [one_month_ago, today]).values('customer').distinct().count()
-        six_months_returning_customer = all_sales.filter(created_at__range = [six_months_ago, today]).values('customer').distinct().count()
-        one_year_returning_customer = all_sales.filter(created_at__range = [one_year_ago, today]).values('customer').distinct().count()
+        one_month_total_customer = customers['one_month']
+        six_months_total_customer = customers['six_months']
+        one_year_total_customer = customers['one_year']
+        all_time_returning_customer = returning['all_time']
+        one_month_returning_customer = returning['one_month']
+        six_months_returning_customer = returning['six_months']
+        one_year_returning_customer = returning['one_year']
 
         chart={
             'all_time_total_customer': all_time_total_customer,
@@ -245,7 +264,7 @@ class CustomerAnalytics(views.APIView):
 
         return Response({
             'total_customers':total_customers,
-            'new_customers':new_customers.count(),
+            'new_customers':new_customers,
             'change_customers':change_in_customer,
             'returning_customers':returning_customer_percentage,
             'top_customer':top_customer_info,
@@ -112,6 +112,17 @@ DATABASES = {
     "default": dj_database_url.parse(config('DATABASE_URL'))
 }
 
+# Deployments must share one cache between workers, e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache with
+# CACHE_LOCATION=redis://host:6379. The LocMem default only suits a single
+# local process; the utils.W001 check warns about it.
+CACHES = {
+    "default": {
+        "BACKEND": config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default=""),
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -161,6 +172,7 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': datetime.timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': datetime.timedelta(days=3),
     'UPDATE_LAST_LOGIN': True,
+    'TOKEN_REFRESH_SERIALIZER': 'authentication.serializers.ClaimsTokenRefreshSerializer',
 }
 
 # CORS_ORIGIN_ALLOW_ALL = True
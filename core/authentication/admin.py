@@ -1,11 +1,17 @@
 from django.contrib import admin
 from authentication.models import User, EmailVerification, ForgetPasswordToken, Marketter
+from authentication.tokens import TokenRevocation
 # Register your models here.
 
 class CustomUser(admin.ModelAdmin):
   
     list_display = ('id','firstname', 'lastname', 'email', 'role')
     search_fields =  ('id','firstname', 'lastname', 'email', 'role')
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Suspended users lose the tokens they hold, even for claim-only reads
+        if not obj.is_active:
+            TokenRevocation.revoke(obj.id)
 
 
 admin.site.register(User, CustomUser)
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-18 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('authentication', '0016_alter_user_marketter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='subscription_reminded_for',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_subscribed', 'subscription_end_date'], name='user_subscription_end_idx'),
+        ),
+    ]
@@ -140,6 +140,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     )
     subscription_date = models.DateField(null=True, blank=True)
     subscription_end_date = models.DateField(null=True, blank=True)
+    # End date the renewal reminder went out for
+    subscription_reminded_for = models.DateField(null=True, blank=True)
     is_tempPassword = models.BooleanField(default=False)
     two_factor_auth = models.BooleanField(default=False)
     new_orders_notification = models.BooleanField(default=False)
@@ -165,14 +167,19 @@ class User(AbstractBaseUser, PermissionsMixin):
         return f"{self.firstname} - {self.phone}"
 
     def tokens(self):
+        # Imported here: the claims read businesses, whose models need this one
+        from authentication.tokens import AccessClaims
         refresh = RefreshToken.for_user(self)
         return {
             'refresh': str(refresh),
-            'access': str(refresh.access_token)
+            'access': str(AccessClaims.access_token(refresh, self))
         }
 
     class Meta:
         db_table = "User"
+        indexes = [
+            models.Index(fields=["is_subscribed", "subscription_end_date"], name="user_subscription_end_idx"),
+        ]
 
 
 class EmailVerification(models.Model):
@@ -14,6 +14,10 @@ from django.db.models import Q
 import re
 import hashlib
 from uuid import UUID
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from authentication.tokens import AccessClaims, TokenRevocation
 
 
 
@@ -445,4 +449,18 @@ def check_password(new_password):
 
     if re.search(r"[@$!%*#?&]", new_password) is None:
         raise serializers.ValidationError(
-            "Password must contain One Special Character")
\ No newline at end of file
+            "Password must contain One Special Character")
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refreshes access tokens with AccessClaims read from the user as it is now."""
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        refresh = RefreshToken(data.get("refresh", attrs["refresh"]))
+        if TokenRevocation.is_revoked(refresh):
+            raise AuthenticationFailed("Token has been revoked")
+        user = User.objects.filter(id=refresh[jwt_settings.USER_ID_CLAIM]).first()
+        if not user or not user.is_active:
+            raise AuthenticationFailed("Account disabled, contact admin")
+        data["access"] = str(AccessClaims.access_token(refresh, user))
+        return data
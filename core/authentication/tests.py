@@ -1,3 +1,47 @@
-from django.test import TestCase
+import tempfile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+from authentication.models import User
+from authentication.tokens import ClaimsAuthentication, ClaimsUser, TokenRevocation
 
-# Create your tests here.
+
+def shared_cache():
+    return override_settings(CACHES={"default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": tempfile.mkdtemp(),
+    }})
+
+
+class TokenRevocationTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("Ada", "Obi", "user@example.com", "0801", password="pw", is_verified=True)
+        self.tokens = self.user.tokens()
+
+    def authenticate(self, method="get"):
+        request = getattr(APIRequestFactory(), method)("/", HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+        return ClaimsAuthentication().authenticate(request)
+
+    def test_claims_are_only_trusted_with_a_shared_cache(self):
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+            self.assertIsInstance(self.authenticate()[0], User)
+        with shared_cache():
+            self.assertIsInstance(self.authenticate()[0], ClaimsUser)
+            self.assertIsInstance(self.authenticate("post")[0], User)
+
+    def test_revoked_tokens_are_refused(self):
+        with shared_cache():
+            TokenRevocation.revoke(self.user.id)
+            self.assertTrue(TokenRevocation.is_revoked(AccessToken(self.tokens["access"])))
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+            self.assertEqual(client.get("/api/v1/business/").status_code, 401)
+            response = APIClient().post("/api/v1/auth/refresh-token/", {"refresh": self.tokens["refresh"]}, format="json")
+            self.assertEqual(response.status_code, 401)
+
+    def test_tokens_issued_after_the_revocation_are_accepted(self):
+        with shared_cache():
+            TokenRevocation.revoke(self.user.id)
+            token = AccessToken(self.user.tokens()["access"])
+            token["iat"] += 1
+            self.assertFalse(TokenRevocation.is_revoked(token))
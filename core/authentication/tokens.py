@@ -0,0 +1,127 @@
+import time
+from datetime import date
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from utils.access import Access
+from utils.cache import cache_is_shared
+
+# Set on every access token AccessClaims issues
+ACCESS_CLAIMS = ["role", "subscription", "subscription_end_date", "subscribed", "owned", "attended"]
+
+
+class AccessClaims:
+    """
+    Signs what authorization needs into access tokens: the role, the
+    subscription code and end date, and the AccessContext of the user (the
+    businesses they own and attend, and whether the paying subscription is
+    live), as of when the token is issued.
+    """
+
+    @staticmethod
+    def access_token(refresh, user):
+        access = refresh.access_token
+        state = Access.build(user)
+        access["role"] = user.role
+        access["subscription"] = user.subscription
+        access["subscription_end_date"] = user.subscription_end_date.isoformat() if user.subscription_end_date else None
+        access["subscribed"] = state["subscribed"]
+        access["owned"] = state["owned"]
+        access["attended"] = state["attended"]
+        return access
+
+    @staticmethod
+    def is_current(token):
+        """Whether the claims of `token` can stand in for the user table."""
+        # Revocations and access changes are only seen by every worker through a shared cache
+        if not cache_is_shared():
+            return False
+        if any(claim not in token for claim in ACCESS_CLAIMS):
+            return False
+        return not Access.changed_since(token[api_settings.USER_ID_CLAIM], token["iat"])
+
+
+class TokenRevocation:
+    """
+    Cache backed list of users whose tokens, up to the moment they were
+    added, are refused, e.g. on suspension. Entries outlive every token they
+    can apply to and then expire.
+    """
+
+    @staticmethod
+    def key(user_id):
+        return f"token_revoked:{user_id}"
+
+    @staticmethod
+    def revoke(user_id):
+        lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+        cache.set(TokenRevocation.key(user_id), int(time.time()), int(lifetime.total_seconds()))
+
+    @staticmethod
+    def is_revoked(token):
+        revoked_at = cache.get(TokenRevocation.key(token[api_settings.USER_ID_CLAIM]))
+        return revoked_at is not None and token.get("iat", 0) <= revoked_at
+
+
+class ClaimsUser(TokenUser):
+    """The user of a request authenticated from AccessClaims, without a database row."""
+
+    @cached_property
+    def role(self):
+        return self.token["role"]
+
+    @cached_property
+    def subscription(self):
+        return self.token["subscription"]
+
+    @cached_property
+    def subscription_end_date(self):
+        end_date = self.token["subscription_end_date"]
+        return date.fromisoformat(end_date) if end_date else None
+
+    @cached_property
+    def is_subscribed(self):
+        # The expiry job may not have flipped the flag yet
+        end_date = self.subscription_end_date
+        return bool(self.token["subscribed"]) and (end_date is None or end_date > date.today())
+
+    @cached_property
+    def access_state(self):
+        return {
+            "role": self.role,
+            "owned": self.token["owned"],
+            "attended": self.token["attended"],
+            "subscribed": self.token["subscribed"] if self.role != "OWNER" else self.is_subscribed,
+        }
+
+
+class ClaimsAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that serves reads from the token alone: a ClaimsUser
+    is built from its AccessClaims and the user table is not touched.
+
+    Writes, tokens issued without claims, tokens older than the last change
+    to the user's access, and every token while the cache is local to the
+    process (see utils.cache) go through the user table as before. Tokens
+    of revoked users are refused either way. Only views whose read paths
+    use nothing but the claims (the id, role, subscription and Access) opt
+    in with `authentication_classes`.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        if TokenRevocation.is_revoked(validated_token):
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+        if request.method in SAFE_METHODS and AccessClaims.is_current(validated_token):
+            return ClaimsUser(validated_token), validated_token
+        return self.get_user(validated_token), validated_token
@@ -5,6 +5,7 @@ from django.utils import timezone
 from rest_framework import generics, status, views, permissions, parsers
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
+from authentication.tokens import TokenRevocation
 from django.contrib.sites.shortcuts import get_current_site
 from django.urls import reverse
 from django.utils.encoding import smart_bytes, smart_str, DjangoUnicodeDecodeError
@@ -154,6 +155,7 @@ class DropUser(generics.GenericAPIView):
         serializer.is_valid(raise_exception=True)
         email = serializer.validated_data["email"]
         user = get_object_or_404(User, email=email)
+        TokenRevocation.revoke(user.id)
         user.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0011_businessbank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='logo_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
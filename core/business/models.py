@@ -56,6 +56,7 @@ class Business(models.Model):
     street = models.CharField(max_length=100)
     is_active = models.BooleanField(default=True)
     logo = models.ImageField(upload_to="business")
+    logo_variants = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     def __str__(self):
@@ -2,6 +2,8 @@ from rest_framework import serializers
 from business.models import Business, Supplier, SupplierFunding, BUSINESS_TYPES, CURRENCIES, PAYMENT_METHOD, PAYMENT_TYPE, BusinessBank
 from django.contrib.auth import get_user_model
 from product.models import ProductStocking
+from utils.media import ImageVariantField
+from utils.uploads import UPLOAD_FOLDERS, UPLOAD_CONTENT_TYPES
 
 
 User = get_user_model()
@@ -11,6 +13,7 @@ class BusinessSerializer(serializers.ModelSerializer):
     currency = serializers.ChoiceField(choices=[c[0] for c in CURRENCIES])
     type = serializers.ChoiceField(
         choices=[t[0] for t in BUSINESS_TYPES])
+    logo = ImageVariantField()
     class Meta:
         model = Business
         fields = ["id", "name","owner", "type", "country", "state", "city", "street",
@@ -74,4 +77,14 @@ class GetAttendanceSerializer(serializers.ModelSerializer):
         model = User
         fields = ["id", "name"]
     def get_name(self, obj):
-        return f"{obj.firstname} {obj.lastname}"
\ No newline at end of file
+        return f"{obj.firstname} {obj.lastname}"
+
+
+class UploadSlotSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=list(UPLOAD_FOLDERS))
+    filename = serializers.CharField(max_length=255)
+    content_type = serializers.CharField(max_length=100)
+    def validate_content_type(self, value):
+        if value not in UPLOAD_CONTENT_TYPES:
+            raise serializers.ValidationError("Only JPEG, PNG and WebP images can be uploaded")
+        return value
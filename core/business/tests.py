@@ -1,3 +1,91 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from urllib.parse import urlparse
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from authentication.models import User
+from utils.uploads import DirectUpload
 
-# Create your tests here.
+
+def image_bytes(image_format="PNG"):
+    buffer = io.BytesIO()
+    Image.new("RGB", (40, 30), "blue").save(buffer, image_format)
+    return buffer.getvalue()
+
+
+class DirectUploadTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        storage = override_settings(MEDIA_ROOT=media_root, STORAGES={
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+            "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+        })
+        storage.enable()
+        self.addCleanup(storage.disable)
+        self.user = User.objects.create_user("Ada", "Obi", "owner@example.com", "0801", password="pw")
+        User.objects.filter(id=self.user.id).update(is_subscribed=True, subscription_end_date=timezone.localdate() + timedelta(days=30))
+        self.user.refresh_from_db()
+        self.other = User.objects.create_user("Ike", "Eze", "other@example.com", "0802", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def slot(self, kind="product", content_type="image/png"):
+        response = self.client.post("/api/v1/business/upload/", {"kind": kind, "filename": "Shoe.PNG", "content_type": content_type}, format="json")
+        self.assertEqual(response.status_code, 201)
+        return response.data
+
+    def put(self, slot, body, content_type="image/png"):
+        return APIClient().put(urlparse(slot["url"]).path, body, content_type=content_type)
+
+    def test_slot_is_uploaded_to_and_claimed(self):
+        slot = self.slot()
+        self.assertEqual((slot["method"], slot["headers"]), ("PUT", {"Content-Type": "image/png"}))
+        self.assertEqual(self.put(slot, image_bytes()).status_code, 200)
+        key = DirectUpload.claim(slot["token"], "product", self.user)
+        self.assertRegex(key, r"^product/[0-9a-f]{32}\.png$")
+        self.assertTrue(default_storage.exists(key))
+
+    def test_only_raster_images_get_a_slot(self):
+        response = self.client.post("/api/v1/business/upload/", {"kind": "product", "filename": "a.svg", "content_type": "image/svg+xml"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_local_upload_checks_its_token_and_content_type(self):
+        slot = self.slot()
+        token = urlparse(slot["url"]).path.rstrip("/").rsplit("/", 1)[1]
+        self.assertEqual(DirectUpload.read_token(token)["content_type"], "image/png")
+        self.assertIsNone(DirectUpload.read_token(token[:-2] + "xx"))
+        self.assertEqual(self.put(slot, image_bytes(), content_type="image/jpeg").status_code, 400)
+        tampered = APIClient().put(urlparse(slot["url"]).path[:-3] + "xx/", image_bytes(), content_type="image/png")
+        self.assertEqual(tampered.status_code, 403)
+
+    def assertClaimRefused(self, token, folder="product", user=None, message=None):
+        with self.assertRaises(serializers.ValidationError) as raised:
+            DirectUpload.claim(token, folder, user or self.user)
+        if message:
+            self.assertIn(message, str(raised.exception.detail[0]))
+
+    def test_claim_is_bound_to_the_user_and_folder(self):
+        slot = self.slot()
+        self.put(slot, image_bytes())
+        self.assertClaimRefused(slot["token"], user=self.other, message="Invalid upload token")
+        self.assertClaimRefused(slot["token"], folder="customer", message="Invalid upload token")
+        self.assertClaimRefused(slot["token"][:-2] + "xx", message="Invalid or expired upload token")
+        self.assertClaimRefused("product/someone-elses.png", message="Invalid or expired upload token")
+
+    def test_claim_needs_an_uploaded_image(self):
+        slot = self.slot()
+        self.assertClaimRefused(slot["token"], message="Nothing was uploaded")
+        self.put(slot, b"<svg xmlns='http://www.w3.org/2000/svg'/>")
+        self.assertClaimRefused(slot["token"], message="Upload a valid image")
+
+    def test_claim_refuses_other_image_formats(self):
+        slot = self.slot()
+        self.put(slot, image_bytes("GIF"))
+        self.assertClaimRefused(slot["token"], message="Only JPEG, PNG and WebP")
@@ -7,7 +7,9 @@ from .views import (UserBusinessView,
                     InviteAttendantView,
                     ListAttendanceView,
                     UserBusinessBank,
-                    UserSingleBusinessBankView
+                    UserSingleBusinessBankView,
+                    UploadSlotView,
+                    LocalUploadView
                     )
 
 
@@ -19,6 +21,8 @@ urlpatterns = [
     path("single_supplier/<uuid:id>/", UserSingleBusinessSupplierView.as_view(), name= "business_supplier_single"),
     path("bank/<uuid:id>/", UserBusinessBank.as_view(), name= "banks"),
     path("single_bank/<uuid:id>/", UserSingleBusinessBankView.as_view(), name= "business_bank_single"),
+    path("upload/", UploadSlotView.as_view(), name="upload_slot"),
+    path("upload/local/<str:token>/", LocalUploadView.as_view(), name="local_upload"),
     path("<uuid:id>/", UserSingleBusinessView.as_view(), name="user_business"),
     path("", UserBusinessView.as_view(), name="user_business"),
 ]
\ No newline at end of file
@@ -5,63 +5,71 @@ from business.serializers import (
     FundSupplier,
     InviteAttendantSerializer,
     GetAttendanceSerializer,
-    BusinessBankDetails)
+    BusinessBankDetails,
+    UploadSlotSerializer)
 from rest_framework import generics, status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, AllowAny
 from business.models import Business, Supplier, BusinessBank
 from django.db import transaction
-from django.db.models import Q
 from utils.pagination import CustomPagination
 from django.shortcuts import get_object_or_404
 from user.models import SyncSubscription
+from user.usage import PlanUsageLedger
 from django.contrib.auth import get_user_model
 import random
 import string
 from utils.email import SendMail
+from utils.access import Access
+from authentication.tokens import ClaimsAuthentication
 from utils.permissions import IsBusinessOwner, IsSubscribed
-from django.db.models import Sum, Count, Q, F, DecimalField
+from utils.media import ImageDerivatives
+from utils.uploads import DirectUpload
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from storages.backends.s3 import S3Storage
+from django.db.models import Sum, Count, F, DecimalField
 # Create your views here.
 
 User = get_user_model()
 class UserBusinessView(generics.GenericAPIView):
     serializer_class = BusinessSerializer
     permission_classes = [IsAuthenticated, IsSubscribed]
+    authentication_classes = [ClaimsAuthentication]
     pagination_class = CustomPagination
     def get(self, request):
         queryset = self.get_queryset()
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.serializer_class(page, many=True)
+            serializer = self.serializer_class(page, many=True, context={"image_size": "thumb"})
             return self.get_paginated_response(serializer.data)
-        serializer = self.serializer_class(queryset, many=True)
+        serializer = self.serializer_class(queryset, many=True, context={"image_size": "thumb"})
         return Response(serializer.data, status=status.HTTP_200_OK)
     def post(self, request):
         user = request.user
         if user.role != "OWNER":
             return Response(data={"message": "You are not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.serializer_class(data=request.data, context={"request": request})
         active_sub = SyncSubscription.objects.filter(code=user.subscription).first()
         if not active_sub:
             return Response(data={"message": "User not subscribed"}, status= status.HTTP_402_PAYMENT_REQUIRED)
-        businesses = Business.objects.filter(owner=user).count()
-        if (businesses >= active_sub.no_of_business) and (active_sub.no_of_business != -1 ):
-            return Response(data={"message": "Maximum number of businesses reached for your plan"}, status=status.HTTP_400_BAD_REQUEST)
         serializer.is_valid(raise_exception=True)
         with transaction.atomic():
-            serializer.save(owner=user)
+            if not PlanUsageLedger.reserve(user, active_sub, "businesses"):
+                return Response(data={"message": "Maximum number of businesses reached for your plan"}, status=status.HTTP_400_BAD_REQUEST)
+            business = serializer.save(owner=user)
+            ImageDerivatives.schedule(business, "logo")
+            Access.invalidate(user.id)
             return Response(data=serializer.data, status=status.HTTP_201_CREATED)
     def get_queryset(self, *args, **kwargs):
-        user = self.request.user
-        return Business.objects.filter(Q(owner=user) | Q(attendants=user)).order_by("-created_at").distinct()
+        return Business.objects.filter(id__in=Access.of(self.request).business_ids).order_by("-created_at")
 
 class UserBusinessBank(generics.GenericAPIView):
     serializer_class = BusinessBankDetails
     permission_classes = [IsAuthenticated, IsSubscribed]
     def get_queryset(self, *args, **kwargs):
-        user = self.request.user
         id = self.kwargs.get('id')
-        return BusinessBank.objects.filter(Q(business__owner=user) | Q(business__attendants=user), business__id=id).order_by("-created_at").distinct()
+        return BusinessBank.objects.filter(business__in=Access.of(self.request).business_ids, business__id=id).order_by("-created_at")
     def get(self, request, id):
         queryset = self.get_queryset()
         serializer = self.serializer_class(queryset, many=True)
@@ -105,9 +113,8 @@ class UserSingleBusinessView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated, IsSubscribed]
     pagination_class = CustomPagination
     def get_queryset(self, *args, **kwargs):
-        user = self.request.user
         id = self.kwargs.get("id")
-        return Business.objects.filter(Q(owner=user) | Q(attendants=user), id=id).order_by("-created_at")
+        return Business.objects.filter(id__in=Access.of(self.request).business_ids, id=id).order_by("-created_at")
     def get(self, request, id):
         queryset = self.get_queryset()
         serializer = self.serializer_class(queryset, many=True)
@@ -117,9 +124,10 @@ class UserSingleBusinessView(generics.GenericAPIView):
         if user.role != "OWNER":
             return Response(data={"message": "You are not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
         business = get_object_or_404(Business, id=id, owner=user)
-        serializer = self.serializer_class(instance=business, data=request.data, partial=True)
+        serializer = self.serializer_class(instance=business, data=request.data, context={"request": request}, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        ImageDerivatives.schedule(business, "logo")
         return Response(data=serializer.data, status=status.HTTP_201_CREATED)
     def delete(self, request, id):
         user = request.user
@@ -128,9 +136,12 @@ class UserSingleBusinessView(generics.GenericAPIView):
         business = get_object_or_404(Business, id=id, owner=user)
         attendants = business.attendants.all()
         with transaction.atomic():
+            Access.invalidate_owner(user)
             for att in attendants:
                 att.delete()
             business.delete()
+            # Its products, services and customers went with it
+            PlanUsageLedger.recount(user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -165,17 +176,15 @@ class UserBusinessSuppliersView(generics.GenericAPIView):
             serializer.save(business=business)
             return Response(data=serializer.data, status=status.HTTP_201_CREATED)
     def get_queryset(self, *args, **kwargs):
-        user = self.request.user
-        return Supplier.objects.filter(Q(business__owner=user) | Q(business__attendants=user)).order_by("-created_at").distinct()
+        return Supplier.objects.filter(business__in=Access.of(self.request).business_ids).order_by("-created_at")
 
 class UserSingleBusinessSupplierView(generics.GenericAPIView):
     serializer_class = BusinessSupplierSerializer
     permission_classes = [IsAuthenticated, IsSubscribed]
     pagination_class = CustomPagination
     def get_queryset(self, *args, **kwargs):
-        user = self.request.user
         id = self.kwargs["id"]
-        return get_object_or_404(Supplier,Q(business__owner=user) | Q(business__attendants=user), id=id)
+        return get_object_or_404(Supplier,business__in=Access.of(self.request).business_ids, id=id)
     def get(self, request, id):
         queryset = self.get_queryset()
         serializer = self.serializer_class(queryset)
@@ -289,4 +298,30 @@ class ListAttendanceView(generics.GenericAPIView):
         return Response(data=serializer.data, status=status.HTTP_200_OK)
     
 
-    
\ No newline at end of file
+    
+
+
+class UploadSlotView(generics.GenericAPIView):
+    serializer_class = UploadSlotSerializer
+    permission_classes = [IsAuthenticated, IsSubscribed]
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        slot = DirectUpload.slot(request, **serializer.validated_data)
+        return Response(data=slot, status=status.HTTP_201_CREATED)
+
+
+class LocalUploadView(generics.GenericAPIView):
+    """Takes the PUT of an upload slot when the media storage is not S3."""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    def put(self, request, token):
+        upload = DirectUpload.read_token(token)
+        if isinstance(default_storage, S3Storage) or not upload:
+            return Response(data={"message": "Invalid or expired upload url"}, status=status.HTTP_403_FORBIDDEN)
+        if request.content_type != upload["content_type"]:
+            return Response(data={"message": "Content-Type does not match the upload slot"}, status=status.HTTP_400_BAD_REQUEST)
+        if default_storage.exists(upload["key"]):
+            default_storage.delete(upload["key"])
+        default_storage.save(upload["key"], ContentFile(request.body))
+        return Response(status=status.HTTP_200_OK)
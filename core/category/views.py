@@ -2,13 +2,15 @@ from django.shortcuts import get_object_or_404, get_list_or_404
 from rest_framework import status, generics
 from rest_framework.response import Response
 from utils.pagination import CustomPagination
+from utils.access import Access
+from authentication.tokens import ClaimsAuthentication
 from utils.permissions import IsSubscribed
 from rest_framework.permissions import IsAuthenticated
 from django.db import transaction
-from django.db.models import Q
 from category.models import Category
 from category.serializers import CategorySerializer
 from business.models import Business
+from user.usage import PlanUsageLedger
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 # Create your views here.
@@ -16,6 +18,7 @@ from drf_yasg.utils import swagger_auto_schema
 class BusinessCategoryView(generics.GenericAPIView):
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated, IsSubscribed]
+    authentication_classes = [ClaimsAuthentication]
     pagination_class = CustomPagination
 
     @swagger_auto_schema(
@@ -47,17 +50,15 @@ class BusinessCategoryView(generics.GenericAPIView):
             return Response(data=serializer.data, status=status.HTTP_201_CREATED)
     def get_queryset(self):
         business_id = self.kwargs['id']
-        user = self.request.user
-        return Category.objects.filter(Q(business__owner=user) | Q(business__attendants=user), business__id=business_id).order_by("-created_at").distinct()
+        return Category.objects.filter(business__in=Access.of(self.request).business_ids, business__id=business_id).order_by("-created_at")
 
 class BusinessSingleCategoryView(generics.GenericAPIView):
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticated, IsSubscribed]
     pagination_class = CustomPagination
     def get_queryset(self, *args, **kwargs):
-        user = self.request.user
         id = self.kwargs["id"]
-        return get_object_or_404(Category, Q(business__owner=user) | Q(business__attendants=user), id=id)
+        return get_object_or_404(Category, business__in=Access.of(self.request).business_ids, id=id)
     def get(self, request, id):
         queryset = self.get_queryset()
         serializer = self.serializer_class(queryset)
@@ -76,5 +77,8 @@ class BusinessSingleCategoryView(generics.GenericAPIView):
         if user.role != "OWNER":
             return Response(data={"message": "You are not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
         category = get_object_or_404(Category, id=id, business__owner=user)
-        category.delete()
+        with transaction.atomic():
+            category.delete()
+            # Its products and services went with it
+            PlanUsageLedger.recount(user)
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customer', '0002_customer_customer_name_trgm_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='profile_pic_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
 from business.models import Business
 import uuid
 from django.contrib.auth import get_user_model
@@ -12,6 +14,7 @@ class Customer(models.Model):
     name = models.CharField(max_length=250)
     phone = models.CharField(max_length=15)
     profile_pic = models.ImageField(upload_to="customer", null=True, blank=True)
+    profile_pic_variants = models.JSONField(default=dict, blank=True)
     email = models.EmailField()
     email_marketting = models.BooleanField(default=False)
     sms_marketting = models.BooleanField(default=False)
@@ -20,6 +23,13 @@ class Customer(models.Model):
     lastSales = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        # Back icontains/istartswith searches, see utils.search.Search
+        indexes = [
+            GinIndex(OpClass(Upper("name"), name="gin_trgm_ops"), name="customer_name_trgm"),
+            GinIndex(OpClass(Upper("phone"), name="gin_trgm_ops"), name="customer_phone_trgm"),
+            GinIndex(OpClass(Upper("email"), name="gin_trgm_ops"), name="customer_email_trgm"),
+        ]
     def __str__(self):
         return f"{self.name} - {self.business.name}"
 
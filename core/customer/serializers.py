@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from customer.models import Customer, CustomerWalletTransaction, PAYMENT_METHOD, CUSTOMER_TRANSACTION_TYPE
 from sale.models import Sale, SaleProduct
+from utils.media import ImageVariantField, ImageDerivatives
 
 
 # class UserGetCustomerSerializer(serializers.ModelSerializer):
@@ -13,7 +14,7 @@ class UserCustomerSerializer(serializers.ModelSerializer):
     name = serializers.CharField(max_length=250)
     phone = serializers.CharField(max_length=15)
     wallet = serializers.IntegerField(read_only=True)
-    profile_pic = serializers.ImageField(required=False)
+    profile_pic = ImageVariantField(required=False)
     id = serializers.UUIDField(read_only=True)
     class Meta:
         model = Customer
@@ -50,7 +51,7 @@ class ProductHistorySerializer(serializers.ModelSerializer):
     def get_name(self, obj):
         return obj.product.name
     def get_image(self, obj):
-        return obj.product.image.url if obj.product.image else None
+        return ImageDerivatives.url(obj.product.image.name, obj.product.image_variants, "thumb")
 class CustomerPurchaseHistorySerializer(serializers.ModelSerializer):
     id = serializers.UUIDField(read_only=True)
     attendance = serializers.SerializerMethodField(read_only=True)
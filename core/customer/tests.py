@@ -1,3 +1,44 @@
+from datetime import timedelta
+from urllib.parse import urlparse
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from authentication.models import User
+from business.models import Business
+from customer.models import Customer
 
-# Create your tests here.
+
+class CustomerCursorPagingTest(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user("Ada", "Obi", "owner@example.com", "0801", password="pw")
+        User.objects.filter(id=owner.id).update(is_subscribed=True, subscription_end_date=timezone.localdate() + timedelta(days=30))
+        owner.refresh_from_db()
+        self.business = Business.objects.create(owner=owner, name="Shop", country="NG", state="Lagos", city="Ikeja", street="1 Road", logo="business/logo.png")
+        Customer.objects.bulk_create([
+            Customer(business=self.business, name=f"Customer {i}", phone=f"080{i}", email=f"c{i}@example.com", wallet=(i % 4) - 2)
+            for i in range(13)
+        ])
+        # Ties on the first ordering column must be broken by the id
+        tied = Customer.objects.filter(business=self.business).order_by("id").values_list("id", flat=True)[:6]
+        Customer.objects.filter(id__in=list(tied)).update(created_at=timezone.now())
+        self.client = APIClient()
+        self.client.force_authenticate(owner)
+
+    def walk(self, query):
+        ids, url = [], f"/api/v1/customer/{self.business.id}/?limit=4&cursor=&{query}"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [customer["id"] for customer in response.data["results"]["data"]]
+            url = response.data["links"]["next"]
+            url = url and f"{urlparse(url).path}?{urlparse(url).query}"
+        return ids
+
+    def expected(self, *ordering, **filters):
+        return [str(customer_id) for customer_id in Customer.objects.filter(business=self.business, **filters).order_by(*ordering).values_list("id", flat=True)]
+
+    def test_newest_first(self):
+        self.assertEqual(self.walk(""), self.expected("-created_at", "-id"))
+
+    def test_debts_largest_first(self):
+        self.assertEqual(self.walk("status=DEBTS"), self.expected("wallet", "-id", wallet__lt=0))
@@ -5,62 +5,79 @@ from customer.models import  Customer, CustomerWalletTransaction
 from customer.serializers import UserCustomerSerializer, CustomerTransactionSerializer, CustomerPurchaseHistorySerializer
 from rest_framework.permissions import IsAuthenticated
 from utils.pagination import CustomPagination
+from utils.access import Access
+from authentication.tokens import ClaimsAuthentication
 from utils.permissions import  IsSubscribed
 from django.shortcuts import get_object_or_404
 from business.models import Business
-from django.db.models import Q, Sum
+from django.db.models import Sum
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from sale.models import Sale
 from django.db.models import Count
-from django.db.models import Q
 from django.db import transaction
 from django.utils import timezone
-from datetime import timedelta
 from user.models import SyncSubscription
+from user.usage import PlanUsageLedger
+from utils.cache import DashboardCache
+from utils.search import Search
+from utils.media import ImageDerivatives
 
 # Create your views here.
 
 class UserCustomersView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated, IsSubscribed]
+    authentication_classes = [ClaimsAuthentication]
     serializer_class = UserCustomerSerializer
     pagination_class = CustomPagination
+    cursor_ordering = ("-created_at", "-id")
 
     @swagger_auto_schema(
         manual_parameters=[
-            openapi.Parameter('search', openapi.IN_QUERY, description='Search by name, email, phone',
+            openapi.Parameter('search', openapi.IN_QUERY, description='Search by name, email, phone or customer id, best matches first. End a word with * to match prefixes only',
                               type=openapi.TYPE_STRING, required=False),
             openapi.Parameter('status', openapi.IN_QUERY, description='Filter by status',
                               type=openapi.TYPE_STRING, enum=['MOST_ACTIVE', 'LEAST_ACTIVE', 'DEBTS'], required=False),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description='Keyset paging: empty for the first page, then the cursor from links.next',
+                              type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('total', openapi.IN_QUERY, description='Total to return in keyset paging',
+                              type=openapi.TYPE_STRING, enum=['exact', 'estimate'], required=False),
         ]
     )
     def get(self, request, id):
         queryset = self.get_queryset()
         search_param = self.request.GET.get("search", None)
         if search_param:
-            queryset = queryset.filter(Q(id__icontains=search_param) | Q(name__icontains=search_param) | Q(phone__icontains=search_param) | Q(email__icontains=search_param))
+            queryset = Search.filter(queryset, search_param, ["name", "phone", "email"])
         cus_status = self.request.GET.get("status", None)
         customer_count = queryset.count()
+        if cus_status in ('MOST_ACTIVE', 'LEAST_ACTIVE') or (search_param and not cus_status):
+            # Ordered by last sale or relevance, so only page numbers apply
+            self.cursor_ordering = None
         if cus_status == 'MOST_ACTIVE':
             queryset = queryset.order_by('-lastSales')
         elif cus_status == 'LEAST_ACTIVE':
             queryset = queryset.order_by('lastSales')
         elif cus_status == "DEBTS":
-            queryset = queryset.filter(wallet__lt = 0).order_by('wallet')
+            # Largest debts first in both paging modes
+            self.cursor_ordering = ("wallet", "-id")
+            queryset = queryset.filter(wallet__lt = 0).order_by('wallet', '-id')
+        elif search_param:
+            queryset = queryset.order_by(f"-{Search.rank_field}", "-created_at")
         else:
             queryset = queryset.order_by("-created_at")
         page = self.paginate_queryset(queryset)
         total_debt = queryset.filter(wallet__lt=0).aggregate(Sum('wallet'))['wallet__sum'] or 0
         total_wallet = queryset.filter(wallet__gt=0).aggregate(Sum('wallet'))['wallet__sum'] or 0
         if page is not None:
-            serializer = self.serializer_class(page, many=True)
+            serializer = self.serializer_class(page, many=True, context={"image_size": "thumb"})
             return self.get_paginated_response({
                 'total_debt': total_debt,
                 'total_wallet':total_wallet,
                 'customer_count':customer_count,
                 'data':serializer.data,
                 })
-        serializer = self.serializer_class(queryset, many=True)
+        serializer = self.serializer_class(queryset, many=True, context={"image_size": "thumb"})
         return Response({
             'total_debt': total_debt,
             'total_wallet':total_wallet,
@@ -69,49 +86,51 @@ class UserCustomersView(generics.GenericAPIView):
         }, status=status.HTTP_200_OK)
     def post(self, request, id):
         user = request.user
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.serializer_class(data=request.data, context={"request": request})
         serializer.is_valid(raise_exception=True)
         business = get_object_or_404(Business, id=id, owner=user)
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        recent_customers_count = Customer.objects.filter(business__owner=user, created_at__gte=thirty_days_ago).count()
         active_sub = SyncSubscription.objects.filter(code=user.subscription).first()
         if not active_sub:
             return Response(data={"message": "User not subscribed"}, status= status.HTTP_400_BAD_REQUEST)
-        if (recent_customers_count >= active_sub.customers_count) and (active_sub.customers_count != -1 ):
-            return Response(data={"message": "Maximum number of customers reached for last 30 days"}, status=status.HTTP_400_BAD_REQUEST)
-        serializer.save(business=business)
+        with transaction.atomic():
+            if not PlanUsageLedger.reserve(user, active_sub, "customers"):
+                return Response(data={"message": "Maximum number of customers reached for last 30 days"}, status=status.HTTP_400_BAD_REQUEST)
+            customer = serializer.save(business=business)
+        ImageDerivatives.schedule(customer, "profile_pic")
+        DashboardCache.invalidate(business.id, new_customer=1)
         return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
     def get_queryset(self):
-        user = self.request.user
         id = self.kwargs["id"]
-        return Customer.objects.filter(Q(business__owner=user) | Q(business__attendants=user), business=id).distinct()
+        return Customer.objects.filter(business__in=Access.of(self.request).business_ids, business=id)
     
 class UserSingleCustomerView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated, IsSubscribed]
     serializer_class = UserCustomerSerializer
     pagination_class = CustomPagination
     def get_queryset(self):
-        user = self.request.user
         id = self.kwargs["id"]
-        return get_object_or_404(Customer, Q(business__owner=user) | Q(business__attendants=user), id=id)
+        return get_object_or_404(Customer, business__in=Access.of(self.request).business_ids, id=id)
     def get(self, request, id):
         queryset = self.get_queryset()
         serializer = self.serializer_class(queryset)
         return Response(serializer.data, status=status.HTTP_200_OK)
     def patch(self, request, id):
-        user = request.user
-        customer = get_object_or_404(Customer, Q(business__owner=user) | Q(business__attendants=user), id=id)
-        serializer = self.serializer_class(instance=customer, data=request.data, partial=True)
+        customer = get_object_or_404(Customer, business__in=Access.of(request).business_ids, id=id)
+        serializer = self.serializer_class(instance=customer, data=request.data, context={"request": request}, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        ImageDerivatives.schedule(customer, "profile_pic")
         return Response(data=serializer.data, status=status.HTTP_201_CREATED)
     def delete(self, request, id):
         user = request.user
         if user.role != "OWNER":
             return Response(data={"message": "You are not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
         customer = get_object_or_404(Customer, business__owner=user, id=id)
-        customer.delete()
+        with transaction.atomic():
+            customer.delete()
+            PlanUsageLedger.release(user, "customers", day=timezone.localdate(customer.created_at))
+            DashboardCache.invalidate(customer.business_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 class CustomerTransactionView(generics.GenericAPIView):
@@ -119,12 +138,11 @@ class CustomerTransactionView(generics.GenericAPIView):
     serializer_class = CustomerTransactionSerializer
     pagination_class = CustomPagination
     def get_queryset(self):
-        user = self.request.user
         id = self.kwargs["id"]
-        return CustomerWalletTransaction.objects.filter(Q(customer__business__owner=user) | Q(customer__business__attendants=user), customer__id=id).order_by("-created_at").distinct()
+        return CustomerWalletTransaction.objects.filter(customer__business__in=Access.of(self.request).business_ids, customer__id=id).order_by("-created_at")
     def post(self, request, id):
         user = request.user
-        customer = get_object_or_404(Customer, Q(business__owner=user) | Q(business__attendants=user), id=id)
+        customer = get_object_or_404(Customer, business__in=Access.of(request).business_ids, id=id)
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
         type = serializer.validated_data.get("type")
@@ -150,9 +168,8 @@ class CustomerPaymentHistory(generics.GenericAPIView):
     serializer_class = CustomerTransactionSerializer
     pagination_class = CustomPagination
     def get_queryset(self):
-        user = self.request.user
         id = self.kwargs["id"]
-        return CustomerWalletTransaction.objects.filter(Q(customer__business__owner=user) | Q(customer__business__attendants=user), customer__id=id).order_by("-created_at").distinct()
+        return CustomerWalletTransaction.objects.filter(customer__business__in=Access.of(self.request).business_ids, customer__id=id).order_by("-created_at")
     def get(self, request, id):
         queryset = self.get_queryset()
         serializer = self.serializer_class(queryset, many=True)
@@ -163,9 +180,8 @@ class CustomerPurchaseHistory(generics.GenericAPIView):
     serializer_class = CustomerPurchaseHistorySerializer
     pagination_class = CustomPagination
     def get_queryset(self):
-        user = self.request.user
         id = self.kwargs["id"]
-        return Sale.objects.filter(Q(business__owner=user) | Q(business__attendants=user), customer__id=id ).order_by("-created_at").distinct()
+        return Sale.objects.filter(business__in=Access.of(self.request).business_ids, customer__id=id ).order_by("-created_at")
     def get(self, request, id):
         queryset = self.get_queryset()
         serializer = self.serializer_class(queryset, many=True)
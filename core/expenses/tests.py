@@ -1,3 +1,39 @@
+from datetime import timedelta
+from urllib.parse import urlparse
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from authentication.models import User
+from business.models import Business
+from category.models import Category
+from expenses.models import Expenses
 
-# Create your tests here.
+
+class ExpensesCursorPagingTest(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user("Ada", "Obi", "owner@example.com", "0801", password="pw")
+        User.objects.filter(id=owner.id).update(is_subscribed=True, subscription_end_date=timezone.localdate() + timedelta(days=30))
+        owner.refresh_from_db()
+        self.business = Business.objects.create(owner=owner, name="Shop", country="NG", state="Lagos", city="Ikeja", street="1 Road", logo="business/logo.png")
+        category = Category.objects.create(business=self.business, name="Rent", type="EXPENSES")
+        self.today = timezone.localdate()
+        # Entered in order, but several are backdated
+        for i in range(11):
+            Expenses.objects.create(business=self.business, category=category, name=f"Expense {i}", amount=i, date=self.today - timedelta(days=i % 3), added_by=owner)
+        self.client = APIClient()
+        self.client.force_authenticate(owner)
+
+    def walk(self, query):
+        ids, url = [], f"/api/v1/expenses/business/{self.business.id}/?start_date={self.today - timedelta(days=5)}&limit=3&{query}"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [expense["id"] for expense in response.data["results"]["data"]]
+            url = response.data["links"]["next"]
+            url = url and f"{urlparse(url).path}?{urlparse(url).query}"
+        return ids
+
+    def test_cursor_and_page_modes_agree(self):
+        expected = [str(expense_id) for expense_id in Expenses.objects.order_by("-date", "-created_at", "-id").values_list("id", flat=True)]
+        self.assertEqual(self.walk("cursor="), expected)
+        self.assertEqual(self.walk(""), expected)
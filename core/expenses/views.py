@@ -16,12 +16,14 @@ from django.utils import timezone
 from datetime import timedelta
 from datetime import datetime
 from utils.date import CustomDateFormating
+from analytic.rollup import Rollup
 # Create your views here.
 
 class UserExpensesView(generics.GenericAPIView):
     serializer_class = ExpensesSerializer
     permission_classes = [IsAuthenticated, IsBusinessOwner, IsSubscribed]
     pagination_class = CustomPagination
+    cursor_ordering = ("-date", "-created_at", "-id")
     @swagger_auto_schema(
         manual_parameters=[
             openapi.Parameter('category', openapi.IN_QUERY, description='Filter by category',
@@ -31,7 +33,11 @@ class UserExpensesView(generics.GenericAPIView):
             openapi.Parameter('start_date', openapi.IN_QUERY, description='Start date',
                               type=openapi.TYPE_STRING, required=False),
             openapi.Parameter('end_date', openapi.IN_QUERY, description='End date',
-                              type=openapi.TYPE_STRING, required=False)
+                              type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description='Keyset paging: empty for the first page, then the cursor from links.next',
+                              type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('total', openapi.IN_QUERY, description='Total to return in keyset paging',
+                              type=openapi.TYPE_STRING, enum=['exact', 'estimate'], required=False)
         ]
     )
     def get(self, request, id):
@@ -53,7 +59,8 @@ class UserExpensesView(generics.GenericAPIView):
         category_id = serializer.validated_data.pop("category_id", None)
         category = get_object_or_404(Category, type="EXPENSES", id=category_id, business = business)
         with transaction.atomic():
-            serializer.save(business=business, category=category, added_by=user)
+            expense = serializer.save(business=business, category=category, added_by=user)
+            Rollup.record_expense(business.id, expense.date, expense.amount)
             return Response(data=serializer.data, status=status.HTTP_201_CREATED)
     def get_queryset(self):
         business_id = self.kwargs['id']
@@ -63,7 +70,7 @@ class UserExpensesView(generics.GenericAPIView):
         category = self.request.GET.get("category")
         start_date, end_date, _ = CustomDateFormating.start_end_date(start_date, end_date)
         user = self.request.user
-        expenses = Expenses.objects.filter(business__id=business_id, business__owner=user, date__range=[start_date, end_date]).order_by("-date").distinct()
+        expenses = Expenses.objects.filter(business__id=business_id, business__owner=user, date__range=[start_date, end_date]).order_by(*self.cursor_ordering).distinct()
         if search:
             expenses = expenses.filter(Q(name__icontains= search) | Q(id__icontains=search))
         if category:
@@ -88,14 +95,21 @@ class UserExpensesSingleCategoryView(generics.GenericAPIView):
         serializer = self.serializer_class(instance=expenses, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         category_id = serializer.validated_data.pop("category_id", None)
-        if category_id:
-            category = get_object_or_404(Category, type="EXPENSES", id=category_id, business__owner = user)
-            serializer.save(category=category)
-        else:
-            serializer.save()
+        previous_date, previous_amount = expenses.date, expenses.amount
+        with transaction.atomic():
+            if category_id:
+                category = get_object_or_404(Category, type="EXPENSES", id=category_id, business__owner = user)
+                serializer.save(category=category)
+            else:
+                serializer.save()
+            if (expenses.date, expenses.amount) != (previous_date, previous_amount):
+                Rollup.record_expense(expenses.business_id, previous_date, -previous_amount)
+                Rollup.record_expense(expenses.business_id, expenses.date, expenses.amount)
         return Response(data=serializer.data, status=status.HTTP_201_CREATED)
     def delete(self, request, id):
         user = request.user
         expenses = get_object_or_404(Expenses, id=id, business__owner=user)
-        expenses.delete()
+        with transaction.atomic():
+            Rollup.record_expense(expenses.business_id, expenses.date, -expenses.amount)
+            expenses.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,3 +1,6 @@
 from django.contrib import admin
+from notification.models import OutboxMessage
 
 # Register your models here.
+
+admin.site.register(OutboxMessage)
@@ -0,0 +1,21 @@
+import time
+from django.core.management.base import BaseCommand
+from notification.outbox import Outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver pending outbox messages"
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--loop", action="store_true", help="Keep draining until stopped")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds to sleep when the outbox is empty")
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        while True:
+            sent, failed = Outbox.drain(batch_size)
+            if sent or failed:
+                self.stdout.write(f"Delivered {sent} messages, gave up on {failed}.")
+            if not options["loop"]:
+                break
+            if sent + failed < batch_size:
+                time.sleep(options["interval"])
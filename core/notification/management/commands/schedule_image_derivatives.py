@@ -0,0 +1,25 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from notification.models import OutboxMessage
+from utils.media import IMAGE_FIELDS
+
+
+class Command(BaseCommand):
+    help = "Queue thumbnails for images uploaded before derivatives were built, drained by drain_outbox"
+    def add_arguments(self, parser):
+        parser.add_argument("--model", action="append", choices=list(IMAGE_FIELDS), help="Only this model (repeatable)")
+        parser.add_argument("--batch-size", type=int, default=1000)
+    def handle(self, *args, **options):
+        for label in options["model"] or IMAGE_FIELDS:
+            field = IMAGE_FIELDS[label]
+            model = apps.get_model(label)
+            missing = model.objects.exclude(**{f"{field}__isnull": True}).exclude(**{field: ""}).filter(**{f"{field}_variants": {}})
+            queued = 0
+            batch = []
+            for pk in missing.values_list("pk", flat=True).iterator(chunk_size=options["batch_size"]):
+                batch.append(OutboxMessage(kind="IMAGE_DERIVATIVES", payload={"model": label, "id": str(pk), "field": field}))
+                if len(batch) == options["batch_size"]:
+                    queued += len(OutboxMessage.objects.bulk_create(batch))
+                    batch = []
+            queued += len(OutboxMessage.objects.bulk_create(batch))
+            self.stdout.write(f"Queued {queued} {label} images.")
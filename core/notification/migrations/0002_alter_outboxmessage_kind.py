@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outboxmessage',
+            name='kind',
+            field=models.CharField(choices=[('PUSH', 'Push notification'), ('STOCK_ALERT', 'Stock level alerts')], default='PUSH', max_length=20),
+        ),
+    ]
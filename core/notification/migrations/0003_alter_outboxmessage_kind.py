@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notification', '0002_alter_outboxmessage_kind'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outboxmessage',
+            name='kind',
+            field=models.CharField(choices=[('PUSH', 'Push notification'), ('STOCK_ALERT', 'Stock level alerts'), ('IMAGE_DERIVATIVES', 'Image thumbnails')], default='PUSH', max_length=20),
+        ),
+    ]
@@ -1,3 +1,34 @@
 from django.db import models
+from django.utils import timezone
+import uuid
 
 # Create your models here.
+
+OUTBOX_KIND = [
+    ("PUSH", "Push notification"),
+    ("STOCK_ALERT", "Stock level alerts"),
+    ("IMAGE_DERIVATIVES", "Image thumbnails"),
+]
+
+OUTBOX_STATUS = [
+    ("PENDING", "Waiting for delivery"),
+    ("SENT", "Delivered"),
+    ("FAILED", "Gave up delivering"),
+]
+
+class OutboxMessage(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=OUTBOX_KIND, default=OUTBOX_KIND[0][0])
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=OUTBOX_STATUS, default=OUTBOX_STATUS[0][0])
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "available_at"], name="outbox_pending_idx"),
+        ]
+    def __str__(self):
+        return f"{self.kind} {self.status} - {self.created_at}"
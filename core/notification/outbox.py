@@ -0,0 +1,198 @@
+from datetime import timedelta
+from decouple import config
+from django.db import transaction
+from django.utils import timezone
+from notification.models import OutboxMessage
+from utils import logger
+from utils.notification import SendPushNotification
+from utils.media import ImageDerivatives
+
+MAX_ATTEMPTS = 5
+RETRY_DELAY = timedelta(seconds=30)
+STOCK_ALERT_WINDOW = timedelta(seconds=config("STOCK_ALERT_WINDOW", default=60, cast=int))
+# Kinds too slow to handle while the batch is locked: they are leased for
+# LEASE_TIME in the drain transaction and handled after it commits
+LEASED_KINDS = ["IMAGE_DERIVATIVES"]
+LEASE_TIME = timedelta(minutes=5)
+
+
+def deliver_push(messages):
+    """Returns the ids of the messages the notification service accepted."""
+    delivered = set()
+    for message in messages:
+        if SendPushNotification.notify(message.payload):
+            delivered.add(message.id)
+    return delivered
+
+
+def stock_digest(messages):
+    """Builds one notification from the stock alerts of several sales."""
+    levels = {}
+    for message in sorted(messages, key=lambda m: m.created_at):
+        for alert in message.payload["alerts"]:
+            levels[alert["product"]] = alert["status"]
+    sold_out = [name for name, level in levels.items() if level == "OUT-OF-STOCK"]
+    running_low = [name for name, level in levels.items() if level == "LOW"]
+    if len(levels) == 1 and sold_out:
+        return "Product Out of stock", f"Your product {sold_out[0]} has been sold out"
+    if len(levels) == 1:
+        return "Product Low on stock", f"Your product {running_low[0]} is running out of stock"
+    body = []
+    if sold_out:
+        body.append(f"Sold out: {', '.join(sold_out)}.")
+    if running_low:
+        body.append(f"Running out of stock: {', '.join(running_low)}.")
+    return "Stock alert", " ".join(body)
+
+
+def deliver_stock_alerts(messages):
+    """Sends a single digest per business through the bulk notification route."""
+    by_business = {}
+    for message in messages:
+        by_business.setdefault(message.payload["business_id"], []).append(message)
+    delivered = set()
+    for business_id, batch in by_business.items():
+        title, body = stock_digest(batch)
+        tokens = sorted({message.payload["token"] for message in batch})
+        if SendPushNotification.notify_bulk({"tokens": tokens, "title": title, "body": body, "data": {"business_id": business_id}}):
+            delivered |= {message.id for message in batch}
+    return delivered
+
+
+def build_image_derivatives(messages):
+    """Builds the thumbnails of the uploads in `messages`, one image at a time."""
+    built = set()
+    for message in messages:
+        try:
+            ImageDerivatives.build(message.payload["model"], message.payload["id"], message.payload["field"])
+            built.add(message.id)
+        except Exception as e:
+            logger.error(f"Error building derivatives of {message.payload}: {str(e)}")
+    return built
+
+
+DELIVERY_HANDLERS = {
+    "PUSH": deliver_push,
+    "STOCK_ALERT": deliver_stock_alerts,
+    "IMAGE_DERIVATIVES": build_image_derivatives,
+}
+
+
+class Outbox:
+    """
+    Side effects recorded in the same transaction as the write that caused them
+    and delivered later by the drain_outbox command, so a slow or unavailable
+    notification service never holds up a request.
+
+    LEASED_KINDS are not handled under the row locks of the batch: the drain
+    counts their attempt and moves them out of reach for LEASE_TIME, commits,
+    and then handles them, so a worker that dies on one does not retry it
+    forever.
+    """
+
+    @staticmethod
+    def push(token, title, body, data=None):
+        return OutboxMessage(kind="PUSH", payload={"token": token, "title": title, "body": body, "data": data or {}})
+
+    @staticmethod
+    def stock_alert(business, token, alerts):
+        """
+        `alerts` is a list of {"product", "status"} for one sale. Delivery waits
+        for STOCK_ALERT_WINDOW so alerts from other sales of the business can be
+        sent in the same digest.
+        """
+        return OutboxMessage(
+            kind="STOCK_ALERT",
+            payload={"business_id": str(business.id), "token": token, "alerts": alerts},
+            available_at=timezone.now() + STOCK_ALERT_WINDOW
+        )
+
+    @staticmethod
+    def enqueue(messages):
+        return OutboxMessage.objects.bulk_create(messages)
+
+    @staticmethod
+    def drain(batch_size=100):
+        """Delivers one batch of due messages. Returns (sent, failed) counts."""
+        now = timezone.now()
+        leased = []
+        with transaction.atomic():
+            messages = list(
+                OutboxMessage.objects.select_for_update(skip_locked=True)
+                .filter(status="PENDING", available_at__lte=now)
+                .order_by("available_at")[:batch_size]
+            )
+            alerting = {m.payload["business_id"] for m in messages if m.kind == "STOCK_ALERT"}
+            if alerting:
+                # Fold alerts still inside their window into the digest going out now
+                messages += list(
+                    OutboxMessage.objects.select_for_update(skip_locked=True)
+                    .filter(kind="STOCK_ALERT", status="PENDING", payload__business_id__in=alerting)
+                    .exclude(id__in=[m.id for m in messages])
+                )
+            leased = [message for message in messages if message.kind in LEASED_KINDS]
+            messages = [message for message in messages if message.kind not in LEASED_KINDS]
+            failed = 0
+            for message in leased:
+                message.updated_at = now
+                if message.attempts >= MAX_ATTEMPTS:
+                    # Every lease ran out without the message being settled
+                    message.status = "FAILED"
+                    failed += 1
+                    continue
+                message.attempts += 1
+                message.available_at = now + LEASE_TIME
+                message.last_error = f"Delivery attempt {message.attempts} did not finish"
+            OutboxMessage.objects.bulk_update(leased, ["status", "attempts", "available_at", "last_error", "updated_at"])
+            leased = [message for message in leased if message.status == "PENDING"]
+            delivered = Outbox.deliver(messages)
+            for message in messages:
+                message.updated_at = now
+                if message.id in delivered:
+                    message.status = "SENT"
+                    continue
+                message.attempts += 1
+                message.available_at = now + RETRY_DELAY * message.attempts
+                message.last_error = f"Delivery attempt {message.attempts} failed"
+                if message.attempts >= MAX_ATTEMPTS:
+                    message.status = "FAILED"
+                    failed += 1
+            OutboxMessage.objects.bulk_update(messages, ["status", "attempts", "available_at", "last_error", "updated_at"])
+        if leased:
+            sent, leased_failed = Outbox.settle_leased(leased)
+            return len(delivered) + sent, failed + leased_failed
+        return len(delivered), failed
+
+    @staticmethod
+    def deliver(messages):
+        """Runs the handler of each kind in `messages`. Returns the ids delivered."""
+        by_kind = {}
+        for message in messages:
+            by_kind.setdefault(message.kind, []).append(message)
+        delivered = set()
+        for kind, batch in by_kind.items():
+            try:
+                delivered |= DELIVERY_HANDLERS[kind](batch)
+            except Exception as e:
+                logger.error(f"Error delivering {kind} outbox messages: {str(e)}")
+        return delivered
+
+    @staticmethod
+    def settle_leased(messages):
+        """Handles leased messages outside any transaction. Returns (sent, failed) counts."""
+        delivered = Outbox.deliver(messages)
+        now = timezone.now()
+        failed = 0
+        for message in messages:
+            message.updated_at = now
+            if message.id in delivered:
+                message.status = "SENT"
+                message.last_error = None
+                continue
+            message.available_at = now + RETRY_DELAY * message.attempts
+            message.last_error = f"Delivery attempt {message.attempts} failed"
+            if message.attempts >= MAX_ATTEMPTS:
+                message.status = "FAILED"
+                failed += 1
+        OutboxMessage.objects.bulk_update(messages, ["status", "available_at", "last_error", "updated_at"])
+        return len(delivered), failed
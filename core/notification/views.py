@@ -14,6 +14,7 @@ from datetime import date, timedelta
 from django.utils.timezone import now
 from django.db import transaction
 from decouple import config
+from utils.access import Access
 from user.management.commands.daily import Command as DailyCheckCommand
 
 
@@ -91,6 +92,7 @@ class VelvpayWebhook(views.APIView):
             user.subscription_end_date = end_date
             user.is_subscribed = True
             user.save()
+            Access.invalidate_owner(user)
         return Response(status=status.HTTP_204_NO_CONTENT)
         
 
@@ -133,6 +135,7 @@ class PaystackWebhook(views.APIView):
                 user.subscription_end_date = today + timedelta(days=30)
                 user.is_subscribed = True
                 user.save()
+                Access.invalidate_owner(user)
             # Do something with event
             return Response(status=status.HTTP_204_NO_CONTENT)
         else:
@@ -1,6 +1,7 @@
 from django.contrib import admin
-from product.models import Product, ProductStocking
+from product.models import Product, ProductStocking, InventoryValuation
 # Register your models here.
 
 admin.site.register(Product)
-admin.site.register(ProductStocking)
\ No newline at end of file
+admin.site.register(ProductStocking)
+admin.site.register(InventoryValuation)
@@ -0,0 +1,187 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from decouple import config
+from django.db import transaction
+from django.db.models import F
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from business.models import Supplier
+from category.models import Category
+from product.inventory import InventoryLedger
+from product.models import Product, ProductStocking, RESTOCK_PAYMENT_METHOD
+from product.serializers import ProductImportSerializer
+from user.usage import PlanUsageLedger
+from utils.cache import DashboardCache
+
+IMPORT_CHUNK_SIZE = config("IMPORT_CHUNK_SIZE", default=500, cast=int)
+
+# Day 0 of the dates Excel stores as serial numbers
+EXCEL_EPOCH = date(1899, 12, 30)
+DATE_FIELDS = ["expiry_date", "due_date"]
+PRODUCT_FIELDS = [
+    "name", "sku", "category_id", "supplier_id", "expiry_date", "quantity", "low_stock_threshold",
+    "status", "unit", "cost_price", "selling_price", "discount", "discount_type",
+]
+
+
+class ProductImport:
+    """
+    Loads the rows of a product spreadsheet into a business.
+
+    Categories and suppliers are matched by name, case insensitively, against
+    maps built once per import. Rows are validated with the ProductSerializer
+    rules a chunk at a time; the valid rows of a chunk are written with
+    bulk_create in one transaction, with one wallet update per supplier, and
+    the others are reported by row number (the first row after the header is
+    row 1). The plan's inventory_count is checked against PlanUsage once, up
+    front, and each chunk reserves its rows before they are written.
+
+    Chunks are committed as they go, so if reading the file fails part way
+    the rows up to `last_row` stay imported (except those in `errors`).
+    """
+    def __init__(self, business, plan, chunk_size=IMPORT_CHUNK_SIZE):
+        self.business = business
+        self.chunk_size = chunk_size
+        self.categories = {}
+        for category_id, name in Category.objects.filter(business=business, type="PRODUCT").values_list("id", "name"):
+            self.categories.setdefault(name.strip().lower(), category_id)
+        self.suppliers = {}
+        for supplier_id, name in Supplier.objects.filter(business=business).values_list("id", "name"):
+            self.suppliers.setdefault(name.strip().lower(), supplier_id)
+        self.owner = business.owner
+        self.plan = plan
+        self.remaining = None
+        if plan.inventory_count != -1:
+            self.remaining = max(plan.inventory_count - PlanUsageLedger.usage(self.owner).inventory, 0)
+        # Building a serializer's fields costs more than validating a row,
+        # so one instance validates every row
+        self.serializer = ProductImportSerializer()
+        self.created = 0
+        self.errors = []
+        self.last_row = 0
+
+    def run(self, rows):
+        chunk = []
+        try:
+            for number, row in enumerate(rows, 1):
+                chunk.append((number, row))
+                if len(chunk) == self.chunk_size:
+                    self.load(chunk)
+                    self.last_row = number
+                    chunk = []
+            if chunk:
+                self.load(chunk)
+                self.last_row = chunk[-1][0]
+        finally:
+            if self.created:
+                DashboardCache.invalidate(self.business.id)
+        return self.created, self.errors
+
+    def load(self, chunk):
+        valid = []
+        for number, row in chunk:
+            data, errors = self.prepare(row)
+            if not errors:
+                try:
+                    validated = dict(self.serializer.run_validation(data))
+                    errors = self.settle(validated)
+                except ValidationError as e:
+                    errors = e.detail
+            if errors:
+                self.errors.append({"row": number, "errors": errors})
+            else:
+                valid.append((number, validated))
+        if self.remaining is not None:
+            self.over_quota(valid[self.remaining:])
+            valid = valid[:self.remaining]
+            self.remaining -= len(valid)
+        if not valid:
+            return
+        products, stockings = [], []
+        owed = defaultdict(int)
+        for _, data in valid:
+            product = Product(**{field: data[field] for field in PRODUCT_FIELDS if field in data})
+            if "status" not in data:
+                product.status = self.status(product)
+            products.append(product)
+            restock_amount = product.cost_price * product.quantity
+            stockings.append(ProductStocking(
+                product=product,
+                supplier_id=product.supplier_id,
+                quantity=product.quantity,
+                cost_price=product.cost_price,
+                selling_price=product.selling_price,
+                payment_method=data["payment_method"],
+                amount_paid=data["amount_paid"],
+                due_date=data.get("due_date"),
+                restock_amount=restock_amount,
+            ))
+            if product.supplier_id:
+                owed[product.supplier_id] += restock_amount - data["amount_paid"]
+        with transaction.atomic():
+            if not PlanUsageLedger.reserve(self.owner, self.plan, "inventory", len(products)):
+                # Something else took the room since the import started
+                self.over_quota(valid)
+                self.remaining = 0
+                return
+            Product.objects.bulk_create(products)
+            ProductStocking.objects.bulk_create(stockings)
+            for supplier_id, amount in owed.items():
+                if amount:
+                    Supplier.objects.filter(id=supplier_id).update(wallet=F("wallet") - amount)
+            InventoryLedger.record({}, InventoryLedger.snapshot(products))
+        self.created += len(products)
+
+    def over_quota(self, rows):
+        for number, _ in rows:
+            self.errors.append({"row": number, "errors": {api_settings.NON_FIELD_ERRORS_KEY: ["Maximum number of Inventory reached for your plan"]}})
+
+    def prepare(self, row):
+        """Turns a spreadsheet row into serializer data, resolving names to ids."""
+        data = {key: value for key, value in row.items() if value != ""}
+        errors = {}
+        category = data.pop("category", None)
+        if not category:
+            errors["category"] = ["This field is required."]
+        elif category.lower() not in self.categories:
+            errors["category"] = [f"No product category named {category}"]
+        else:
+            data["category_id"] = self.categories[category.lower()]
+        supplier = data.pop("supplier", None)
+        if supplier:
+            if supplier.lower() not in self.suppliers:
+                errors["supplier"] = [f"No supplier named {supplier}"]
+            else:
+                data["supplier_id"] = self.suppliers[supplier.lower()]
+        for field in DATE_FIELDS:
+            if data.get(field, "").isdigit():
+                data[field] = (EXCEL_EPOCH + timedelta(days=int(data[field]))).isoformat()
+        return data, errors
+
+    @staticmethod
+    def settle(data):
+        """Works out what was paid for the opening stock, as UserProductView.post does."""
+        restock_amount = data["cost_price"] * data["quantity"]
+        payment_method = data.get("payment_method")
+        amount_paid = data.get("amount_paid")
+        if payment_method == RESTOCK_PAYMENT_METHOD[2][0]:
+            amount_paid = 0
+        elif payment_method == RESTOCK_PAYMENT_METHOD[1][0]:
+            if amount_paid > restock_amount:
+                return {"amount_paid": ["Amount paid can't be more than restock price"]}
+            if amount_paid == restock_amount:
+                payment_method = RESTOCK_PAYMENT_METHOD[0][0]
+        else:
+            payment_method = RESTOCK_PAYMENT_METHOD[0][0]
+            amount_paid = restock_amount
+        data["payment_method"] = payment_method
+        data["amount_paid"] = amount_paid
+        return None
+
+    @staticmethod
+    def status(product):
+        if product.quantity <= 0:
+            return "OUT-OF-STOCK"
+        if product.quantity <= product.low_stock_threshold:
+            return "LOW"
+        return "IN-STOCK"
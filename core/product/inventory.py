@@ -0,0 +1,145 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from django.db.models import F, Sum, Count, Q
+from category.models import Category
+from product.models import Product, InventoryValuation
+from product.stock import StockReservation
+
+COUNTERS = ["products", "units", "cost_value", "retail_value", "low_stock", "out_of_stock"]
+
+
+def _totals(category_id, quantity, cost_price, selling_price, status):
+    return {
+        "products": 1,
+        "units": quantity,
+        "cost_value": quantity * cost_price,
+        "retail_value": quantity * selling_price,
+        "low_stock": int(status == "LOW"),
+        "out_of_stock": int(status == "OUT-OF-STOCK"),
+    }
+
+
+class InventoryLedger:
+    """
+    Keeps InventoryValuation in step with product writes.
+
+    Writers take a snapshot of the products they are about to change and one
+    of the same products afterwards, inside the same transaction (see
+    `track`); only the difference is written, with F() updates. Checkout
+    skips the snapshots and locks and records what it sold from the rows it
+    already loaded (see `sold`). `reconcile` recomputes the rows from the
+    products to catch any drift.
+    """
+
+    FIELDS = ["category_id", "quantity", "cost_price", "selling_price", "status"]
+
+    @staticmethod
+    def snapshot(products):
+        return {product.id: tuple(getattr(product, field) for field in InventoryLedger.FIELDS) for product in products}
+
+    @staticmethod
+    def read(product_ids, lock=False):
+        products = Product.objects.filter(id__in=product_ids)
+        if lock:
+            products = products.select_for_update().order_by("id")
+        return {row[0]: row[1:] for row in products.values_list("id", *InventoryLedger.FIELDS)}
+
+    @staticmethod
+    @contextmanager
+    def track(product_ids):
+        """
+        Records what the block changes on `product_ids`. Must run inside a
+        transaction: the rows are locked first so the snapshot taken before
+        the change cannot be overtaken by another writer.
+        """
+        before = InventoryLedger.read(product_ids, lock=True)
+        yield
+        InventoryLedger.record(before, InventoryLedger.read(product_ids))
+
+    @staticmethod
+    def sold(products, lines):
+        """
+        Records a successful StockReservation.reserve of `lines`, as
+        {product_id: quantity}, on the `products` loaded before it. Units and
+        values follow from the lines and prices alone; the low and out of
+        stock counts assume the loaded quantities, which a concurrent sale of
+        the same product can make stale until the next `reconcile`.
+        """
+        after = {}
+        for product in products:
+            quantity = lines[product.id]
+            status = StockReservation.status_after(product.quantity, product.low_stock_threshold, product.status, quantity)
+            after[product.id] = (product.category_id, product.quantity - quantity, product.cost_price, product.selling_price, status)
+        InventoryLedger.record(InventoryLedger.snapshot(products), after)
+
+    @staticmethod
+    def record(before, after):
+        deltas = defaultdict(lambda: defaultdict(int))
+        for snapshot, sign in ((before, -1), (after, 1)):
+            for row in snapshot.values():
+                for field, value in _totals(*row).items():
+                    deltas[row[0]][field] += sign * value
+        for category_id, delta in deltas.items():
+            delta = {field: value for field, value in delta.items() if value}
+            if delta:
+                InventoryLedger.add(category_id, delta)
+
+    @staticmethod
+    def add(category_id, delta):
+        changes = {field: F(field) + value for field, value in delta.items()}
+        if not InventoryValuation.objects.filter(category_id=category_id).update(**changes):
+            business_id = Category.objects.filter(id=category_id).values_list("business_id", flat=True).first()
+            InventoryValuation.objects.get_or_create(category_id=category_id, defaults={"business_id": business_id})
+            InventoryValuation.objects.filter(category_id=category_id).update(**changes)
+
+    @staticmethod
+    def totals(valuations):
+        """Sums a queryset of InventoryValuation rows."""
+        totals = valuations.aggregate(**{field: Sum(field) for field in COUNTERS})
+        return {field: value or 0 for field, value in totals.items()}
+
+    @staticmethod
+    def actual(business_ids=None):
+        products = Product.objects.all()
+        if business_ids is not None:
+            products = products.filter(category__business_id__in=business_ids)
+        rows = products.order_by().values("category_id", "category__business_id").annotate(
+            products=Count("id"),
+            units=Sum("quantity"),
+            cost_value=Sum(F("quantity") * F("cost_price")),
+            retail_value=Sum(F("quantity") * F("selling_price")),
+            low_stock=Count("id", filter=Q(status="LOW")),
+            out_of_stock=Count("id", filter=Q(status="OUT-OF-STOCK")),
+        )
+        return {row.pop("category_id"): row for row in rows}
+
+    @staticmethod
+    def reconcile(business_ids=None, fix=False):
+        """
+        Compares every valuation row with its products. Returns a list of
+        (category_id, field, stored, actual) and, with `fix`, rewrites the rows
+        that drifted.
+        """
+        actual = InventoryLedger.actual(business_ids)
+        valuations = InventoryValuation.objects.all()
+        if business_ids is not None:
+            valuations = valuations.filter(business_id__in=business_ids)
+        stored = {valuation.category_id: valuation for valuation in valuations}
+        drift = []
+        for category_id in set(actual) | set(stored):
+            row = actual.get(category_id, {})
+            valuation = stored.get(category_id)
+            changed = False
+            for field in COUNTERS:
+                expected = row.get(field) or 0
+                current = getattr(valuation, field) if valuation else 0
+                if expected != current:
+                    drift.append((category_id, field, current, expected))
+                    changed = True
+            if fix and changed:
+                values = {field: row.get(field) or 0 for field in COUNTERS}
+                if valuation:
+                    InventoryValuation.objects.filter(id=valuation.id).update(**values)
+                else:
+                    InventoryValuation.objects.create(category_id=category_id, business_id=row["category__business_id"], **values)
+        return drift
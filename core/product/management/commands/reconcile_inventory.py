@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from product.inventory import InventoryLedger
+
+
+class Command(BaseCommand):
+    help = "Compare the maintained inventory valuations with the products and report drift"
+    def add_arguments(self, parser):
+        parser.add_argument("--business", action="append", help="Only check this business id (repeatable)")
+        parser.add_argument("--fix", action="store_true", help="Rewrite the rows that drifted")
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drift = InventoryLedger.reconcile(options["business"], fix=options["fix"])
+        for category_id, field, stored, actual in drift:
+            self.stdout.write(f"Category {category_id}: {field} is {stored}, products say {actual}")
+        if not drift:
+            self.stdout.write("No drift found.")
+        elif options["fix"]:
+            self.stdout.write(f"Fixed {len({row[0] for row in drift})} categories.")
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+
+
+def populate_valuations(apps, schema_editor):
+    Product = apps.get_model("product", "Product")
+    InventoryValuation = apps.get_model("product", "InventoryValuation")
+    rows = Product.objects.order_by().values("category_id", "category__business_id").annotate(
+        products_count=Count("id"),
+        units=Sum("quantity"),
+        cost_value=Sum(F("quantity") * F("cost_price")),
+        retail_value=Sum(F("quantity") * F("selling_price")),
+        low_stock=Count("id", filter=Q(status="LOW")),
+        out_of_stock=Count("id", filter=Q(status="OUT-OF-STOCK")),
+    )
+    InventoryValuation.objects.bulk_create([
+        InventoryValuation(
+            category_id=row["category_id"], business_id=row["category__business_id"],
+            products=row["products_count"], units=row["units"] or 0, cost_value=row["cost_value"] or 0,
+            retail_value=row["retail_value"] or 0, low_stock=row["low_stock"], out_of_stock=row["out_of_stock"]
+        ) for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0011_businessbank'),
+        ('category', '0003_alter_category_type'),
+        ('product', '0011_alter_product_unit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryValuation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('products', models.IntegerField(default=0)),
+                ('units', models.BigIntegerField(default=0)),
+                ('cost_value', models.BigIntegerField(default=0)),
+                ('retail_value', models.BigIntegerField(default=0)),
+                ('low_stock', models.IntegerField(default=0)),
+                ('out_of_stock', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_valuations', to='business.business')),
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='valuation', to='category.category')),
+            ],
+        ),
+        migrations.RunPython(populate_valuations, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
 import uuid
 from category.models import Category
-from business.models import Supplier
+from business.models import Supplier, Business
 from django.core.validators import MinValueValidator
 from django.contrib.auth import get_user_model
 # Create your models here.
@@ -48,6 +50,7 @@ class Product(models.Model):
     name = models.CharField(max_length=100)
     sku = models.CharField(max_length=50, null=True, blank=True)
     image = models.ImageField(upload_to="product", null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     expiry_date = models.DateField(null=True, blank=True)
     supplier = models.ForeignKey(Supplier, on_delete=models.SET_NULL, null=True, blank=True)
@@ -63,6 +66,12 @@ class Product(models.Model):
     discount_type = models.CharField(max_length=10, choices=DISCOUNT_TYPE, default=DISCOUNT_TYPE[0][0])
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        # Back icontains/istartswith searches, see utils.search.Search
+        indexes = [
+            GinIndex(OpClass(Upper("name"), name="gin_trgm_ops"), name="product_name_trgm"),
+            GinIndex(OpClass(Upper("sku"), name="gin_trgm_ops"), name="product_sku_trgm"),
+        ]
     @property
     def image_url(self):
         return self.image.url if self.image else None
@@ -96,3 +105,21 @@ class ProductStocking(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     def __str__(self):
         return f"{self.product.name} - {self.quantity} - {self.created_at}"
+
+
+class InventoryValuation(models.Model):
+    """
+    Stock totals of one category, kept up to date by InventoryLedger. The
+    business totals are the sum of its category rows.
+    """
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, related_name="valuation")
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name="inventory_valuations")
+    products = models.IntegerField(default=0)
+    units = models.BigIntegerField(default=0)
+    cost_value = models.BigIntegerField(default=0)
+    retail_value = models.BigIntegerField(default=0)
+    low_stock = models.IntegerField(default=0)
+    out_of_stock = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    def __str__(self):
+        return f"{self.category_id}: {self.units} units worth {self.cost_value}"
@@ -2,6 +2,10 @@ from rest_framework import serializers
 from product.models import Product, ProductStocking, STOCK_STATUS, DISCOUNT_TYPE, PRODUCT_UNIT, RESTOCK_PAYMENT_METHOD
 from datetime import date
 from service.models import Service
+from django.db.models import Prefetch
+from utils.media import ImageVariantField, ImageDerivatives
+
+HISTORY_PREVIEW_SIZE = 5
 
 
 # class GetProductsSerializer(serializers.ModelSerializer):
@@ -13,11 +17,24 @@ from service.models import Service
 #         return obj.category.name
 class GetProductsSerializer(serializers.Serializer):
     def to_representation(self, instance):
+        if isinstance(instance, dict):
+            # A row of UserProductView.catalog_rows
+            row = {
+                "id": instance["id"],
+                "name": instance["name"],
+                "image": ImageDerivatives.url(instance["image"], instance["image_variants"], "thumb"),
+            }
+            if instance["item_type"] == "PRODUCT":
+                fields = ["sku", "status", "selling_price", "cost_price", "sold", "quantity", "category", "type"]
+            else:
+                fields = ["description", "amount", "category", "type"]
+            row.update({field: instance[f"item_{field}"] for field in fields})
+            return row
         if isinstance(instance, Product):
             return {
                 "id": instance.id,
                 "name": instance.name,
-                "image": instance.image.url if instance.image else None,
+                "image": ImageDerivatives.url(instance.image.name, instance.image_variants, "thumb"),
                 "sku": instance.sku,
                 "status": instance.status,
                 "selling_price": instance.selling_price,
@@ -31,7 +48,7 @@ class GetProductsSerializer(serializers.Serializer):
             return {
                 "id": instance.id,
                 "name": instance.name,
-                "image": instance.image.url if instance.image else None,
+                "image": ImageDerivatives.url(instance.image.name, instance.image_variants, "thumb"),
                 "description": instance.description,
                 "amount": instance.amount,
                 "category": instance.category.name,
@@ -45,7 +62,7 @@ class ProductSerializer(serializers.ModelSerializer):
     category = serializers.SerializerMethodField(read_only=True)
     name = serializers.CharField()
     sku = serializers.CharField(max_length=50,required=False)
-    image= serializers.ImageField()
+    image = ImageVariantField()
     expiry_date = serializers.DateField(required=False)
     supplier_id = serializers.UUIDField(write_only=True, required=False)
     payment_method = serializers.ChoiceField(choices=[p[0] for p in RESTOCK_PAYMENT_METHOD], required=False, write_only=True)
@@ -78,8 +95,23 @@ class ProductSerializer(serializers.ModelSerializer):
         return obj.quantity * obj.cost_price
     def get_supplier(self, obj):
         return obj.supplier.name if obj.supplier else None
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The full history is paginated by UserSupplierProductRestock
+        if not self.context.get("include_history"):
+            self.fields.pop("history")
+    @staticmethod
+    def with_latest_restocks(queryset, size=HISTORY_PREVIEW_SIZE):
+        """Prefetches the latest `size` restocks of every product in one query."""
+        return queryset.prefetch_related(Prefetch(
+            "productstocking_set",
+            queryset=ProductStocking.objects.order_by("-created_at")[:size],
+            to_attr="latest_restocks"
+        ))
     def get_history(self, obj):
-        history_data = ProductStocking.objects.filter(product=obj)
+        history_data = getattr(obj, "latest_restocks", None)
+        if history_data is None:
+            history_data = ProductStocking.objects.filter(product=obj).order_by("-created_at")[:HISTORY_PREVIEW_SIZE]
         history_serializer = SupplierProductRestockSerializer(history_data, many=True)
         return history_serializer.data
     def validate(self, attrs):
@@ -114,6 +146,15 @@ class ProductSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("Discount must be less than the selling price")
         return attrs
         
+class ProductImportSerializer(ProductSerializer):
+    """One row of a bulk import. Images are added to the products afterwards."""
+    image = serializers.ImageField(required=False)
+
+
+class ProductImportFileSerializer(serializers.Serializer):
+    file = serializers.FileField()
+
+
 class SupplierProductRestockSerializer(serializers.ModelSerializer):
     cost_price = serializers.IntegerField()
     selling_price = serializers.IntegerField()
@@ -146,3 +187,39 @@ class SupplierProductRestockSerializer(serializers.ModelSerializer):
         
         
         return attrs
+
+
+class RestockLineSerializer(serializers.Serializer):
+    product_id = serializers.UUIDField()
+    quantity = serializers.IntegerField(min_value=1)
+    cost_price = serializers.IntegerField(min_value=1)
+    selling_price = serializers.IntegerField(min_value=1)
+    def validate(self, attrs):
+        if attrs["selling_price"] <= attrs["cost_price"]:
+            raise serializers.ValidationError("Selling price must be above cost price")
+        return attrs
+
+
+class BulkRestockSerializer(serializers.Serializer):
+    supplier_id = serializers.UUIDField(required=False)
+    payment_method = serializers.ChoiceField(choices=[p[0] for p in RESTOCK_PAYMENT_METHOD])
+    amount_paid = serializers.IntegerField(min_value=0, required=False)
+    due_date = serializers.DateField(required=False)
+    products = RestockLineSerializer(many=True, allow_empty=False)
+    def validate(self, attrs):
+        supplier = attrs.get('supplier_id')
+        due_date = attrs.get('due_date')
+        payment_method = attrs.get('payment_method')
+        amount_paid = attrs.get("amount_paid")
+        product_ids = [line["product_id"] for line in attrs["products"]]
+        if len(product_ids) != len(set(product_ids)):
+            raise serializers.ValidationError("Product IDs must be unique")
+        if payment_method != RESTOCK_PAYMENT_METHOD[0][0] and not supplier:
+            raise serializers.ValidationError("Supplier is required when payment is not full")
+        if payment_method != RESTOCK_PAYMENT_METHOD[0][0] and not due_date:
+            raise serializers.ValidationError("Date due is required when payment is not full")
+        if payment_method == RESTOCK_PAYMENT_METHOD[1][0] and not amount_paid:
+            raise serializers.ValidationError("Amount paid must be specified for partial payment")
+        if due_date and due_date <= date.today():
+            raise serializers.ValidationError("Date due must be a future date")
+        return attrs
@@ -0,0 +1,91 @@
+from django.db import transaction
+from django.db.models import Case, When, Value, F, Q, IntegerField, CharField
+from django.utils import timezone
+from product.models import Product
+
+
+class _Rollback(Exception):
+    pass
+
+
+class StockReservation:
+    """
+    Set based stock changes done with conditional UPDATE statements.
+
+    Quantities are never read into Python and written back, so two sales of the
+    same product cannot overwrite each other, and no row is locked before the
+    UPDATE reaches it. The locks the UPDATE takes are held until the surrounding
+    transaction commits (for a sale, the whole checkout), so keep the work after
+    it in that transaction short.
+    """
+
+    @staticmethod
+    def _per_product(lines, key=None):
+        return Case(
+            *[When(id=product_id, then=Value(line[key] if key else line)) for product_id, line in lines.items()],
+            output_field=IntegerField()
+        )
+
+    @staticmethod
+    def status_after(quantity, low_stock_threshold, status, sold):
+        """The status `reserve` leaves on a product that had `quantity` in stock when `sold` were taken."""
+        if quantity == sold:
+            return "OUT-OF-STOCK"
+        if quantity <= low_stock_threshold + sold:
+            return "LOW"
+        return status
+
+    @staticmethod
+    def reserve(lines):
+        """
+        Takes `lines` as {product_id: quantity} and decrements every product in
+        one statement, only if all of them have enough stock. Returns the ids of
+        the products that could not cover their line; nothing is changed then.
+        """
+        if not lines:
+            return []
+        enough_stock = Q()
+        for product_id, quantity in lines.items():
+            enough_stock |= Q(id=product_id, quantity__gte=quantity)
+        sold = StockReservation._per_product(lines)
+        try:
+            with transaction.atomic():
+                updated = Product.objects.filter(enough_stock).update(
+                    quantity=F("quantity") - sold,
+                    sold=F("sold") + sold,
+                    # SET expressions see the row before the update
+                    status=Case(
+                        When(quantity=sold, then=Value("OUT-OF-STOCK")),
+                        When(quantity__lte=F("low_stock_threshold") + sold, then=Value("LOW")),
+                        default=F("status"),
+                        output_field=CharField()
+                    ),
+                    updated_at=timezone.now()
+                )
+                if updated != len(lines):
+                    raise _Rollback()
+        except _Rollback:
+            available = dict(Product.objects.filter(id__in=lines.keys()).values_list("id", "quantity"))
+            return [product_id for product_id, quantity in lines.items() if available.get(product_id, 0) < quantity]
+        return []
+
+    @staticmethod
+    def restock(lines):
+        """
+        Takes `lines` as {product_id: {"quantity", "cost_price", "selling_price"}}
+        and adds the restocked quantities and new prices in one statement.
+        """
+        if not lines:
+            return 0
+        added = StockReservation._per_product(lines, "quantity")
+        return Product.objects.filter(id__in=lines.keys()).update(
+            quantity=F("quantity") + added,
+            cost_price=StockReservation._per_product(lines, "cost_price"),
+            selling_price=StockReservation._per_product(lines, "selling_price"),
+            status=Case(
+                When(quantity__gt=F("low_stock_threshold") - added, then=Value("IN-STOCK")),
+                default=Value("LOW"),
+                output_field=CharField()
+            ),
+            updated_at=timezone.now()
+        )
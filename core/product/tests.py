@@ -1,3 +1,146 @@
+from datetime import timedelta
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+from authentication.models import User
+from business.models import Business, Supplier
+from category.models import Category
+from product.importer import ProductImport, EXCEL_EPOCH
+from product.models import Product, ProductStocking
+from product.stock import StockReservation
+from user.models import PlanUsage, SyncSubscription
+from utils.spreadsheet import SpreadsheetError
 
-# Create your tests here.
+
+class StockReservationTest(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user("Ada", "Obi", "owner@example.com", "0801", password="pw")
+        business = Business.objects.create(owner=owner, name="Shop", country="NG", state="Lagos", city="Ikeja", street="1 Road", logo="business/logo.png")
+        category = Category.objects.create(business=business, name="Drinks")
+        self.first = Product.objects.create(name="Malt", category=category, quantity=10, cost_price=5, selling_price=10, low_stock_threshold=3)
+        self.second = Product.objects.create(name="Soda", category=category, quantity=2, cost_price=5, selling_price=10, low_stock_threshold=3)
+
+    def stock(self):
+        return list(Product.objects.filter(id__in=[self.first.id, self.second.id]).order_by("name").values_list("quantity", "sold", "status"))
+
+    def test_reserve_takes_every_line(self):
+        self.assertEqual(StockReservation.reserve({self.first.id: 7, self.second.id: 2}), [])
+        self.assertEqual(self.stock(), [(3, 7, "LOW"), (0, 2, "OUT-OF-STOCK")])
+
+    def test_reserve_changes_nothing_when_a_line_is_short(self):
+        before = self.stock()
+        self.assertEqual(StockReservation.reserve({self.first.id: 7, self.second.id: 3}), [self.second.id])
+        self.assertEqual(self.stock(), before)
+
+    def test_reserve_reports_missing_products(self):
+        product_id = self.second.id
+        self.second.delete()
+        self.assertEqual(StockReservation.reserve({self.first.id: 1, product_id: 1}), [product_id])
+        self.assertEqual(Product.objects.get(id=self.first.id).quantity, 10)
+
+
+class BulkRestockViewTest(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user("Ada", "Obi", "owner@example.com", "0801", password="pw")
+        User.objects.filter(id=owner.id).update(is_subscribed=True, subscription_end_date=timezone.localdate() + timedelta(days=30))
+        owner.refresh_from_db()
+        self.business = Business.objects.create(owner=owner, name="Shop", country="NG", state="Lagos", city="Ikeja", street="1 Road", logo="business/logo.png")
+        category = Category.objects.create(business=self.business, name="Drinks")
+        self.supplier = Supplier.objects.create(business=self.business, name="Depot", phone="0802", email="depot@example.com")
+        self.malt = Product.objects.create(name="Malt", category=category, quantity=0, cost_price=5, selling_price=10, low_stock_threshold=3)
+        self.soda = Product.objects.create(name="Soda", category=category, quantity=1, cost_price=4, selling_price=8, low_stock_threshold=3)
+        self.client = APIClient()
+        self.client.force_authenticate(owner)
+
+    def restock(self, *lines, **payment):
+        body = {"supplier_id": str(self.supplier.id), "products": list(lines), **payment}
+        return self.client.post(f"/api/v1/product/bulk_restock/{self.business.id}/", body, format="json")
+
+    def line(self, product, quantity, cost_price, selling_price):
+        return {"product_id": str(product.id), "quantity": quantity, "cost_price": cost_price, "selling_price": selling_price}
+
+    def test_part_payment_is_spread_over_the_lines(self):
+        due_date = str(timezone.localdate() + timedelta(days=7))
+        response = self.restock(self.line(self.malt, 10, 6, 12), self.line(self.soda, 1, 5, 9), payment_method="PART", amount_paid=62, due_date=due_date)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["restock_amount"], response.data["amount_paid"]), (65, 62))
+        self.assertEqual(
+            list(Product.objects.filter(id__in=[self.malt.id, self.soda.id]).order_by("name").values_list("quantity", "cost_price", "selling_price", "status")),
+            [(10, 6, 12, "IN-STOCK"), (2, 5, 9, "LOW")]
+        )
+        self.assertEqual(
+            list(ProductStocking.objects.order_by("-restock_amount").values_list("restock_amount", "amount_paid")),
+            [(60, 60), (5, 2)]
+        )
+        self.supplier.refresh_from_db()
+        self.assertEqual(self.supplier.wallet, -3)
+
+    def test_unknown_products_restock_nothing(self):
+        stranger = User.objects.create_user("Ike", "Eze", "other@example.com", "0803", password="pw")
+        business = Business.objects.create(owner=stranger, name="Other", country="NG", state="Lagos", city="Ikeja", street="2 Road", logo="business/logo.png")
+        other = Product.objects.create(name="Elsewhere", category=Category.objects.create(business=business, name="Drinks"), quantity=0, cost_price=5, selling_price=10)
+        response = self.restock(self.line(self.malt, 10, 6, 12), self.line(other, 1, 5, 9), payment_method="FULL")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Product.objects.get(id=self.malt.id).quantity, 0)
+        self.assertFalse(ProductStocking.objects.exists())
+
+
+class ProductImportTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Obi", "owner@example.com", "0801", password="pw", subscription="GOLD")
+        self.business = Business.objects.create(owner=self.owner, name="Shop", country="NG", state="Lagos", city="Ikeja", street="1 Road", logo="business/logo.png")
+        self.category = Category.objects.create(business=self.business, name="Drinks")
+        self.supplier = Supplier.objects.create(business=self.business, name="Depot", phone="0802", email="depot@example.com")
+
+    def plan(self, inventory_count=-1):
+        return SyncSubscription.objects.create(
+            name="GOLD", code="GOLD", monthly=1, quarterly=1, biannually=1, annually=1, sales_count=1,
+            inventory_count=inventory_count, customers_count=-1, no_of_business=-1, no_of_attendants=-1
+        )
+
+    def row(self, name, **values):
+        return {"name": name, "category": "drinks", "quantity": "4", "cost_price": "5", "selling_price": "10", **values}
+
+    def test_valid_rows_are_created_and_the_others_reported(self):
+        expiry_date = timezone.localdate() + timedelta(days=30)
+        rows = [
+            self.row("Malt", supplier="DEPOT", payment_method="CREDIT", due_date=str(timezone.localdate() + timedelta(days=7))),
+            self.row("Soda", category="Snacks"),
+            self.row("Water", quantity="two"),
+            # Excel serial date
+            self.row("Juice", low_stock_threshold="5", expiry_date=str((expiry_date - EXCEL_EPOCH).days)),
+            self.row("Tea", category=""),
+        ]
+        importer = ProductImport(self.business, self.plan(), chunk_size=2)
+        created, errors = importer.run(rows)
+        self.assertEqual(created, 2)
+        self.assertEqual([error["row"] for error in errors], [2, 3, 5])
+        self.assertEqual(errors[0]["errors"], {"category": ["No product category named Snacks"]})
+        self.assertEqual(importer.last_row, 5)
+        juice = Product.objects.get(name="Juice")
+        self.assertEqual((juice.status, juice.expiry_date), ("LOW", expiry_date))
+        self.assertEqual(ProductStocking.objects.filter(product__category=self.category).count(), 2)
+        self.supplier.refresh_from_db()
+        self.assertEqual(self.supplier.wallet, -20)
+        self.assertEqual(PlanUsage.objects.get(owner=self.owner).inventory, 2)
+
+    def test_rows_over_the_plan_limit_are_refused(self):
+        Product.objects.create(name="Old", category=self.category, quantity=1, cost_price=5, selling_price=10)
+        importer = ProductImport(self.business, self.plan(inventory_count=3), chunk_size=2)
+        created, errors = importer.run([self.row(f"P{i}") for i in range(5)])
+        self.assertEqual(created, 2)
+        self.assertEqual([error["row"] for error in errors], [3, 4, 5])
+        self.assertEqual(errors[0]["errors"], {api_settings.NON_FIELD_ERRORS_KEY: ["Maximum number of Inventory reached for your plan"]})
+        self.assertEqual(PlanUsage.objects.get(owner=self.owner).inventory, 3)
+
+    def test_chunks_read_before_a_fault_stay_imported(self):
+        def rows():
+            for i in range(3):
+                yield self.row(f"P{i}")
+            raise SpreadsheetError("The file could not be read")
+        importer = ProductImport(self.business, self.plan(), chunk_size=2)
+        with self.assertRaises(SpreadsheetError):
+            importer.run(rows())
+        self.assertEqual((importer.created, importer.last_row), (2, 2))
+        self.assertEqual(sorted(Product.objects.values_list("name", flat=True)), ["P0", "P1"])
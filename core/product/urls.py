@@ -1,8 +1,10 @@
 from django.urls import path
-from product.views import UserProductView, UserProductSingleView, UserSupplierProductRestock
+from product.views import UserProductView, UserProductSingleView, UserSupplierProductRestock, UserProductImportView, UserBulkRestockView
 
 urlpatterns = [
     path("single_product/<str:id>/", UserProductSingleView.as_view(), name="single_product"),
     path("restock/<str:id>/", UserSupplierProductRestock.as_view(), name="supplier_restock_product"),
     path("business/<str:id>/", UserProductView.as_view(), name="business_product"),
+    path("import/<str:id>/", UserProductImportView.as_view(), name="business_product_import"),
+    path("bulk_restock/<str:id>/", UserBulkRestockView.as_view(), name="business_bulk_restock"),
 ]
\ No newline at end of file
@@ -3,91 +3,140 @@ from rest_framework import status,  generics
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db import transaction
-from django.db.models import Q
-from product.serializers import ProductSerializer, SupplierProductRestockSerializer, GetProductsSerializer
-from product.models import Product, ProductStocking, RESTOCK_PAYMENT_METHOD
+from product.serializers import ProductSerializer, SupplierProductRestockSerializer, GetProductsSerializer, ProductImportFileSerializer, BulkRestockSerializer
+from product.importer import ProductImport
+from product.models import Product, ProductStocking, InventoryValuation, RESTOCK_PAYMENT_METHOD
+from product.stock import StockReservation
+from product.inventory import InventoryLedger
 from utils.pagination import CustomPagination
-from business.models import  Supplier
+from business.models import  Supplier, Business
 from category.models import Category
-from django.db.models import Sum, Count, Q, F, DecimalField
+from django.db.models import Sum, Count, F, DecimalField, Value, CharField, TextField, IntegerField, BigIntegerField
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from service.models import Service
-from itertools import chain
+from utils.access import Access
+from authentication.tokens import ClaimsAuthentication
 from utils.permissions import IsSubscribed
-from operator import attrgetter
 from user.models import SyncSubscription
+from user.usage import PlanUsageLedger
+from utils.cache import DashboardCache
+from utils.search import Search
+from utils.media import ImageDerivatives
+from utils.spreadsheet import Spreadsheet, SpreadsheetError
 # Create your views here.
 
 
 class UserProductView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated, IsSubscribed]
+    authentication_classes = [ClaimsAuthentication]
     serializer_class = ProductSerializer
     pagination_class = CustomPagination
+    cursor_ordering = ("-created_at", "-id")
     retrieval_serializer_class = GetProductsSerializer
     def get_serializer(self, *args, **kwargs):
         if self.request.method == 'GET':
             return self.retrieval_serializer_class(*args, **kwargs)
         return self.serializer_class(*args, **kwargs)
     def get_queryset(self):
-        user = self.request.user
         id = self.kwargs["id"]
         search_param = self.request.query_params.get('search', None)
         category_param = self.request.query_params.get('category_id', None)
-        products = Product.objects.filter(Q(category__business__owner=user) | Q(category__business__attendants=user), category__business__id= id).order_by("-created_at").distinct()
-        services = Service.objects.filter(Q(category__business__owner=user) | Q(category__business__attendants=user), category__business__id= id).order_by("-created_at").distinct()
+        business = Business.objects.filter(id__in=Access.of(self.request).business_ids, id=id).first()
+        self.valuations = InventoryValuation.objects.filter(business=business)
+        products = Product.objects.filter(category__business=business)
+        services = Service.objects.filter(category__business=business)
+        if not business:
+            products, services = products.none(), services.none()
         if category_param:
+            self.valuations = self.valuations.filter(category__id = category_param)
             products = products.filter(category__id = category_param)
-            services = products.filter(category__id = category_param)
+            services = services.filter(category__id = category_param)
         if search_param:
-            products = products.filter(Q(name__icontains=search_param) | Q(sku__icontains=search_param))
-            services = products.filter(Q(name__icontains=search_param) | Q(sku__icontains=search_param))
+            # The maintained totals are per category, so a search is summed from the products
+            self.valuations = None
+            # Ranked by relevance, so only page numbers apply
+            self.cursor_ordering = None
+            products = Search.filter(products, search_param, ["name", "sku"])
+            services = Search.filter(services, search_param, ["name"])
         return products, services
     @swagger_auto_schema(
         manual_parameters=[
-            openapi.Parameter('search', openapi.IN_QUERY, description='Search by item name or SKU',
+            openapi.Parameter('search', openapi.IN_QUERY, description='Search by item name or SKU, best matches first. End a word with * to match prefixes only',
                               type=openapi.TYPE_STRING, required=False),
             openapi.Parameter('category_id', openapi.IN_QUERY, description='Filter by category id',
                               type=openapi.TYPE_STRING,format='uuid', required=False),
             openapi.Parameter('type', openapi.IN_QUERY, description='Filter by type',
                               type=openapi.TYPE_STRING, enum=['PRODUCT', 'SERVICE'], required=False),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description='Keyset paging: empty for the first page, then the cursor from links.next',
+                              type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('total', openapi.IN_QUERY, description='Total to return in keyset paging',
+                              type=openapi.TYPE_STRING, enum=['exact', 'estimate'], required=False),
 
         ]
     )
     def get(self, request, id):
         product_queryset, service_queryset = self.get_queryset()
-        inventory_value = product_queryset.aggregate(inv_value=Sum(F('quantity') * F('cost_price')))["inv_value"] or 0
-        selling_price = product_queryset.aggregate(inv_value=Sum(F('quantity') * F('selling_price')))["inv_value"] or 0
+        if self.valuations is not None:
+            inventory = InventoryLedger.totals(self.valuations)
+            inventory_value = inventory["cost_value"]
+            selling_price = inventory["retail_value"]
+        else:
+            inventory = product_queryset.aggregate(
+                inventory_value=Sum(F('quantity') * F('cost_price')),
+                selling_price=Sum(F('quantity') * F('selling_price'))
+            )
+            inventory_value = inventory["inventory_value"] or 0
+            selling_price = inventory["selling_price"] or 0
         profit = selling_price - inventory_value
         type_param = request.query_params.get('type')
+        catalog = [self.catalog_rows(product_queryset), self.catalog_rows(service_queryset)]
         if type_param == "PRODUCT":
-            combined_qs = product_queryset
+            catalog = catalog[:1]
         elif type_param == "SERVICE":
-            combined_qs = service_queryset
-        else:
-            combined_qs = sorted(
-                chain(product_queryset, service_queryset),
-                key=attrgetter('created_at'),
-                reverse=True
-            )
-        serializer = self.get_serializer(combined_qs, many=True)
-        page = self.paginate_queryset(combined_qs)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response({"inventory_value": inventory_value,"selling_price":selling_price,"profit":profit, "data": serializer.data})
+            catalog = catalog[1:]
+        ordering = (f"-{Search.rank_field}", "name", "id") if self.cursor_ordering is None else None
+        page = self.paginator.paginate_union(catalog, request, view=self, ordering=ordering)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response({"inventory_value": inventory_value,"selling_price":selling_price,"profit":profit, "data": serializer.data})
+    @staticmethod
+    def catalog_rows(queryset):
+        """
+        Products and services projected onto the same columns so they can be
+        combined with UNION ALL. Everything besides the shared fields is an
+        annotation, listed in the same order for both models, because a
+        UNION matches columns by position.
+        """
+        if queryset.model is Product:
+            columns = {
+                "item_sku": F("sku"),
+                "item_status": F("status"),
+                "item_selling_price": F("selling_price"),
+                "item_cost_price": F("cost_price"),
+                "item_sold": F("sold"),
+                "item_quantity": F("quantity"),
+                "item_description": Value(None, output_field=TextField()),
+                "item_amount": Value(None, output_field=BigIntegerField()),
+                "item_type": Value("PRODUCT", output_field=CharField()),
+            }
         else:
-            data = serializer.data
-            response_data = {
-                "inventory_value": inventory_value,
-                "selling_price":selling_price,
-                "profit":profit,
-                "data": data,
-                # "total_products": queryset.count(),
-                # "total_sold": queryset.filter(sold_quantity__gt=0).aggregate(Sum('sold_quantity'))["sold_quantity__sum"] or 0,
-                # "total_restocked": queryset.filter(restock_amount__gt=0).aggregate(Sum('restock_amount'))["restock_amount__sum"] or 0,
-                # "total_sold_value": queryset.filter(sold_quantity__gt=0).aggregate(Sum('sold_quantity') * F('selling_price'))["sold_quantity__sum__sum"] or 0.0,
+            columns = {
+                "item_sku": Value(None, output_field=CharField()),
+                "item_status": Value(None, output_field=CharField()),
+                "item_selling_price": Value(None, output_field=IntegerField()),
+                "item_cost_price": Value(None, output_field=IntegerField()),
+                "item_sold": Value(None, output_field=IntegerField()),
+                "item_quantity": Value(None, output_field=IntegerField()),
+                "item_description": F("description"),
+                "item_amount": F("amount"),
+                "item_type": Value("SERVICE", output_field=CharField()),
             }
-            return Response(response_data, status=status.HTTP_200_OK)
+        columns["item_category"] = F("category__name")
+        fields = ["id", "name", "image", "image_variants", "created_at"]
+        if Search.rank_field in queryset.query.annotations:
+            fields.append(Search.rank_field)
+        return queryset.values(*fields, **columns)
+
     def post(self, request, id):
         user = request.user
         if user.role != "OWNER":
@@ -95,11 +144,7 @@ class UserProductView(generics.GenericAPIView):
         active_sub = SyncSubscription.objects.filter(code=user.subscription).first()
         if not active_sub:
             return Response(data={"message": "User not subscribed"}, status= status.HTTP_402_PAYMENT_REQUIRED)
-        product_counts = Product.objects.filter(category__business__owner=user).count()
-        service_counts = Service.objects.filter(category__business__owner=user).count()
-        if ((product_counts + service_counts) >= active_sub.inventory_count) and (active_sub.inventory_count != -1 ):
-            return Response(data={"message": "Maximum number of Inventory reached for your plan"}, status=status.HTTP_400_BAD_REQUEST)
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.serializer_class(data=request.data, context={"request": request})
         serializer.is_valid(raise_exception=True)
         category_id = serializer.validated_data.pop("category_id", None)
         supplier_id = serializer.validated_data.pop("supplier_id", None)
@@ -127,7 +172,11 @@ class UserProductView(generics.GenericAPIView):
             payment_method = RESTOCK_PAYMENT_METHOD[0][0]
             amount_paid = restock_amount
         with transaction.atomic():
+            if not PlanUsageLedger.reserve(user, active_sub, "inventory"):
+                return Response(data={"message": "Maximum number of Inventory reached for your plan"}, status=status.HTTP_400_BAD_REQUEST)
             product = serializer.save(category=category, supplier=supplier)
+            InventoryLedger.record({}, InventoryLedger.snapshot([product]))
+            ImageDerivatives.schedule(product, "image")
             if supplier:
                 supplier.wallet -= (restock_amount - amount_paid)
                 supplier.save()
@@ -142,8 +191,46 @@ class UserProductView(generics.GenericAPIView):
                 due_date = due_date,
                 restock_amount= restock_amount,
                 )
+            DashboardCache.invalidate(category.business_id)
             return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
+class UserProductImportView(generics.GenericAPIView):
+    serializer_class = ProductImportFileSerializer
+    permission_classes = [IsAuthenticated, IsSubscribed]
+    def post(self, request, id):
+        """
+        Creates products from a .csv or .xlsx file with a header row. Columns:
+        name, sku, category, supplier, quantity, cost_price, selling_price,
+        low_stock_threshold, status, unit, expiry_date, discount,
+        discount_type, payment_method, amount_paid, due_date. Category and
+        supplier are names. Valid rows are created, the others are returned
+        in `errors` with their row number. If the file cannot be read to the
+        end, `last_row` is the last row whose chunk was imported.
+        """
+        user = request.user
+        if user.role != "OWNER":
+            return Response(data={"message": "You are not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
+        active_sub = SyncSubscription.objects.filter(code=user.subscription).first()
+        if not active_sub:
+            return Response(data={"message": "User not subscribed"}, status= status.HTTP_402_PAYMENT_REQUIRED)
+        business = get_object_or_404(Business, id=id, owner=user)
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        importer = ProductImport(business, active_sub)
+        try:
+            created, errors = importer.run(Spreadsheet.rows(serializer.validated_data["file"]))
+        except SpreadsheetError as e:
+            data = {"message": e.message}
+            if importer.last_row:
+                # The chunks read before the fault were committed
+                data.update(created=importer.created, errors=importer.errors, last_row=importer.last_row)
+            return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            data={"created": created, "errors": errors},
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
+        )
+
+
 class UserProductSingleView(generics.GenericAPIView):
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated, IsSubscribed]
@@ -151,31 +238,48 @@ class UserProductSingleView(generics.GenericAPIView):
         user = self.request.user
         id = self.kwargs["id"]
         # q = Q(category__business__owner=user) | Q(category__business__attendants=user)
-        return get_object_or_404(Product,id=id)
+        products = Product.objects.select_related("category", "supplier")
+        if self.include_history():
+            products = ProductSerializer.with_latest_restocks(products)
+        return get_object_or_404(products, id=id)
+    def include_history(self):
+        return self.request.query_params.get("include_history", "").lower() == "true"
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('include_history', openapi.IN_QUERY, description='Include the latest restocks; the full history is paged at restock/<id>/',
+                              type=openapi.TYPE_BOOLEAN, required=False),
+        ]
+    )
     def get(self, request, id):
         queryset = self.get_queryset()
-        serializer = self.serializer_class(queryset)
+        serializer = self.serializer_class(queryset, context={"include_history": self.include_history()})
         return Response(serializer.data, status=status.HTTP_200_OK)
     def patch(self, request, id):
         user = request.user
         if user.role != "OWNER":
             return Response(data={"message": "You are not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
         product = get_object_or_404(Product, category__business__owner=user, id=id)
-        serializer = self.serializer_class(instance=product, data=request.data, partial=True)
+        serializer = self.serializer_class(instance=product, data=request.data, context={"request": request}, partial=True)
         serializer.is_valid(raise_exception=True)
         category_id = serializer.validated_data.pop("category_id", None)
-        if category_id:
-            category = get_object_or_404(Category, business__id = id, id= category_id, type="PRODUCT", business__owner=user)
-            serializer.save(category=category)
-        else:
-            serializer.save()
+        with transaction.atomic(), InventoryLedger.track([product.id]):
+            if category_id:
+                category = get_object_or_404(Category, business__id = id, id= category_id, type="PRODUCT", business__owner=user)
+                serializer.save(category=category)
+            else:
+                serializer.save()
+            ImageDerivatives.schedule(product, "image")
+        DashboardCache.invalidate(product.category.business_id)
         return Response(data=serializer.data, status=status.HTTP_201_CREATED)
     def delete(self, request, id):
         user = request.user
         if user.role != "OWNER":
             return Response(data={"message": "You are not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
         product = get_object_or_404(Product, category__business__owner=user, id=id)
-        product.delete()
+        with transaction.atomic(), InventoryLedger.track([product.id]):
+            product.delete()
+            PlanUsageLedger.release(user, "inventory")
+            DashboardCache.invalidate(product.category.business_id)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -186,8 +290,7 @@ class UserSupplierProductRestock(generics.GenericAPIView):
     pagination_class = CustomPagination
     def get_queryset(self):
         id = self.kwargs["id"]
-        user = self.request.user
-        return ProductStocking.objects.filter(Q(product__category__business__owner=user) | Q(product__category__business__attendants=user), product__id=id).order_by("-created_at").distinct()
+        return ProductStocking.objects.filter(product__category__business__in=Access.of(self.request).business_ids, product__id=id).order_by("-created_at")
     def get(self, request, id):
         user = request.user
         queryset = self.get_queryset()
@@ -224,14 +327,10 @@ class UserSupplierProductRestock(generics.GenericAPIView):
             if amount_paid == restock_amount:
                 payment_method = RESTOCK_PAYMENT_METHOD[0][0]
         with transaction.atomic():
-            product.quantity += quantity
-            product.cost_price = restock_cost_price
-            product.selling_price = restock_selling_price
-            if product.quantity > product.low_stock_threshold:
-                product.status = "IN-STOCK"
-            else:
-                product.status = "LOW"
-            product.save()
+            with InventoryLedger.track([product.id]):
+                StockReservation.restock({
+                    product.id: {"quantity": quantity, "cost_price": restock_cost_price, "selling_price": restock_selling_price}
+                })
             if supplier:
                 supplier.wallet -= (restock_amount - amount_paid)
                 supplier.save()
@@ -240,4 +339,77 @@ class UserSupplierProductRestock(generics.GenericAPIView):
                 restock_amount=restock_amount, product=product,
                 supplier=supplier, amount_paid=amount_paid, payment_method=payment_method
                 )
-            return Response(data=serializer.data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+            DashboardCache.invalidate(product.category.business_id)
+            return Response(data=serializer.data, status=status.HTTP_201_CREATED)
+
+
+class UserBulkRestockView(generics.GenericAPIView):
+    serializer_class = BulkRestockSerializer
+    permission_classes = [IsAuthenticated, IsSubscribed]
+    def post(self, request, id):
+        """
+        Restocks several products of a business from one supplier delivery.
+        Quantities, prices and statuses are set in one UPDATE, the restocks
+        are inserted together and the supplier wallet changes once.
+        """
+        user = request.user
+        if user.role != "OWNER":
+            return Response(data={"message": "You are not authorized"}, status=status.HTTP_401_UNAUTHORIZED)
+        business = get_object_or_404(Business, id=id, owner=user)
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        supplier_id = serializer.validated_data.get("supplier_id")
+        payment_method = serializer.validated_data["payment_method"]
+        amount_paid = serializer.validated_data.get("amount_paid")
+        due_date = serializer.validated_data.get("due_date")
+        lines = {line["product_id"]: line for line in serializer.validated_data["products"]}
+        supplier = None
+        if supplier_id:
+            supplier = get_object_or_404(Supplier, business=business, id=supplier_id)
+        found = set(Product.objects.filter(id__in=lines.keys(), category__business=business).values_list("id", flat=True))
+        missing = [str(product_id) for product_id in lines if product_id not in found]
+        if missing:
+            return Response(data={"message": f"Products not found: {', '.join(missing)}"}, status=status.HTTP_404_NOT_FOUND)
+        restock_amount = sum(line["cost_price"] * line["quantity"] for line in lines.values())
+        if payment_method == RESTOCK_PAYMENT_METHOD[2][0]:
+            amount_paid = 0
+        elif payment_method == RESTOCK_PAYMENT_METHOD[0][0]:
+            amount_paid = restock_amount
+        else:
+            if amount_paid > restock_amount:
+                return Response(data={"message": "Amount paid can't be more than restock price"}, status=status.HTTP_400_BAD_REQUEST)
+            if amount_paid == restock_amount:
+                payment_method = RESTOCK_PAYMENT_METHOD[0][0]
+        # A part payment is spread over the lines in order
+        unpaid_share = amount_paid
+        stockings = []
+        for product_id, line in lines.items():
+            line_amount = line["cost_price"] * line["quantity"]
+            line_paid = min(line_amount, unpaid_share)
+            unpaid_share -= line_paid
+            stockings.append(ProductStocking(
+                product_id=product_id, supplier=supplier, quantity=line["quantity"],
+                cost_price=line["cost_price"], selling_price=line["selling_price"],
+                restock_amount=line_amount, amount_paid=line_paid,
+                payment_method=payment_method, due_date=due_date
+            ))
+        with transaction.atomic():
+            with InventoryLedger.track(list(lines)):
+                StockReservation.restock(lines)
+            ProductStocking.objects.bulk_create(stockings)
+            if supplier and restock_amount != amount_paid:
+                Supplier.objects.filter(id=supplier.id).update(wallet=F("wallet") - (restock_amount - amount_paid))
+            DashboardCache.invalidate(business.id)
+        return Response(data={
+            "restock_amount": restock_amount,
+            "amount_paid": amount_paid,
+            "payment_method": payment_method,
+            "restocks": [
+                {
+                    "id": stocking.id, "product_id": stocking.product_id, "quantity": stocking.quantity,
+                    "cost_price": stocking.cost_price, "selling_price": stocking.selling_price,
+                    "restock_amount": stocking.restock_amount, "amount_paid": stocking.amount_paid,
+                    "due_date": stocking.due_date, "created_at": stocking.created_at
+                } for stocking in stockings
+            ]
+        }, status=status.HTTP_201_CREATED)
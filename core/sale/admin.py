@@ -1,8 +1,9 @@
 from django.contrib import admin
-from sale.models import Sale, PaymentHistory, SaleProduct, SaleService
+from sale.models import Sale, PaymentHistory, SaleProduct, SaleService, SaleSyncKey
 # Register your models here.
 
 admin.site.register(Sale)
 admin.site.register(PaymentHistory)
 admin.site.register(SaleProduct)
 admin.site.register(SaleService)
+admin.site.register(SaleSyncKey)
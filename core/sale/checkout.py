@@ -0,0 +1,147 @@
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from business.models import BusinessBank
+from customer.models import Customer
+from product.models import Product
+from product.stock import StockReservation
+from product.inventory import InventoryLedger
+from service.models import Service
+from sale.models import Sale, SaleProduct, SaleService, PaymentHistory
+from notification.outbox import Outbox
+from analytic.rollup import Rollup
+from utils.cache import DashboardCache
+
+
+class CheckoutError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+class SaleCheckout:
+    """
+    Applies a validated UserSalesSerializer payload for a business.
+
+    Products are loaded in one query, stock is taken with a single conditional
+    UPDATE and every other write is done in bulk, so the number of queries does
+    not grow with the size of the basket.
+    """
+    def __init__(self, business, attendant):
+        self.business = business
+        self.attendant = attendant
+
+    def run(self, validated_data):
+        data = dict(validated_data)
+        lines = data.pop("products", None) or []
+        customer = data.pop("customer", None)
+        bank = data.pop("bank", None)
+        amount_paid = data.pop("amount_paid", None)
+        partial_method = data.pop("partial_method", None)
+        method = data.get("method")
+        if customer:
+            customer = get_object_or_404(Customer, business=self.business, id=customer)
+        if bank:
+            bank = get_object_or_404(BusinessBank, business=self.business, id=bank)
+        product_lines = {line["id"]: line for line in lines if line["type"] == "PRODUCT"}
+        service_lines = {line["id"]: line for line in lines if line["type"] == "SERVICE"}
+
+        with transaction.atomic():
+            products = list(
+                Product.objects.filter(id__in=product_lines.keys(), category__business=self.business)
+                .exclude(status="OUT-OF-STOCK")
+            )
+            services = list(Service.objects.filter(id__in=service_lines.keys(), category__business=self.business))
+            total_amount = 0
+            for product in products:
+                line = product_lines[product.id]
+                if product.quantity < line["quantity"]:
+                    raise CheckoutError(f'Quantity of {product.name} available is less than {line["quantity"]}')
+                total_amount += line["quantity"] * line["unit_price"]
+            for service in services:
+                line = service_lines[service.id]
+                total_amount += line["unit_price"] * line.get("quantity", 1)
+
+            mtd = method
+            amt = total_amount
+            balance = 0
+            if method == "CREDIT":
+                balance = total_amount
+                customer.wallet -= total_amount
+            elif method == "PARTIAL":
+                if amount_paid > total_amount:
+                    raise CheckoutError("Amount paid greater than value")
+                debt = total_amount - amount_paid
+                customer.wallet -= debt
+                balance = debt
+                mtd = partial_method
+                amt = amount_paid
+            elif method == "ADVANCE" and customer.wallet < total_amount:
+                raise CheckoutError("Wallet balance not up to amount")
+            elif method == "ADVANCE":
+                customer.wallet -= total_amount
+            payment_status = "UNPAID" if balance else "PAID"
+
+            sold = {product.id: product_lines[product.id]["quantity"] for product in products}
+            failed = StockReservation.reserve(sold)
+            if failed:
+                product = next(p for p in products if p.id == failed[0])
+                raise CheckoutError(f'Quantity of {product.name} available is less than {product_lines[product.id]["quantity"]}')
+            InventoryLedger.sold(products, sold)
+
+            sale = Sale.objects.create(
+                **data,
+                business=self.business,
+                attendant=self.attendant,
+                customer=customer,
+                total_price=total_amount,
+                balance=balance,
+                payment_status=payment_status,
+            )
+            if customer:
+                customer.lastSales = timezone.now().date()
+                customer.purchase_value += total_amount
+                customer.save()
+            payment = None
+            if method != "CREDIT":
+                payment = PaymentHistory.objects.create(amount=amt, sale=sale, method=mtd, bank=bank)
+            Rollup.record_sale(sale, payment)
+            DashboardCache.invalidate(self.business.id, total_sales_today=total_amount, total_purchases=1, total_orders=total_amount)
+
+            sale_products = []
+            for product in products:
+                line = product_lines[product.id]
+                qty = line["quantity"]
+                discount = line.get("discount") or 0
+                price = qty * line["unit_price"] - discount
+                sale_products.append(SaleProduct(
+                    sale=sale, product=product, unit_price=line["unit_price"], discount=discount,
+                    quantity=qty, price=price, profit=price - (product.cost_price * qty)
+                ))
+            SaleProduct.objects.bulk_create(sale_products)
+            SaleService.objects.bulk_create([
+                SaleService(
+                    sale=sale, service=service,
+                    price=service_lines[service.id]["unit_price"],
+                    quantity=service_lines[service.id].get("quantity", 1)
+                ) for service in services
+            ])
+            self.notify_stock_levels([product.id for product in products])
+        return sale
+
+    def notify_stock_levels(self, product_ids):
+        owner = self.business.owner
+        if not product_ids or not owner.fcm_token:
+            return
+        if not (owner.low_stock_alert_notification or owner.out_of_stock_alert_notification):
+            return
+        # Read the stock levels the reservation left behind
+        products = Product.objects.filter(id__in=product_ids).only("name", "quantity", "low_stock_threshold")
+        alerts = []
+        for product in products:
+            if product.quantity == 0 and owner.out_of_stock_alert_notification:
+                alerts.append({"product": product.name, "status": "OUT-OF-STOCK"})
+            elif 0 < product.quantity <= product.low_stock_threshold and owner.low_stock_alert_notification:
+                alerts.append({"product": product.name, "status": "LOW"})
+        if alerts:
+            Outbox.enqueue([Outbox.stock_alert(self.business, owner.fcm_token, alerts)])
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from django.db.models import Sum
+from django.utils import timezone
+from customer.models import Customer
+from product.models import Product
+from sale.models import Sale, SaleProduct
+from utils.cache import DashboardCache
+from utils.media import ImageDerivatives
+
+
+class SalesDashboard:
+    """Payload of SalesAnalysisView, served through DashboardCache."""
+
+    @staticmethod
+    def get(business):
+        payload = dict(DashboardCache.get(business.id, lambda: SalesDashboard.build(business)))
+        # Read from the business row the view already loaded, never from the cache
+        payload["current_balance"] = business.balance
+        return payload
+
+    @staticmethod
+    def build(business):
+        today = datetime.now()
+        start_of_today = today.replace(hour=0, minute=0, second=0)
+        end_of_today = start_of_today + timedelta(days=1)
+        all_sales = Sale.objects.filter(business=business)
+        orders = all_sales.aggregate(total=Sum("total_price"))["total"] or 0.0
+        all_customers = Customer.objects.filter(business=business)
+        sales_products = SaleProduct.objects.filter(sale__business=business)
+        business_products = Product.objects.filter(category__business = business)
+        returning_customer = all_sales.filter(created_at__date=timezone.now().date()).values('customer').distinct().count()
+        last_7_days = timezone.now().date() - timedelta(days=7)
+        next_7_days = timezone.now().date() + timedelta(days=7)
+        today_sales = all_sales.filter(created_at__range=(start_of_today, end_of_today))
+        total_sales_today = today_sales.aggregate(total=Sum('total_price'))['total'] or 0.0
+        total_purchases = all_sales.count()
+        new_customer = all_customers.filter(created_at__range=(start_of_today, end_of_today)).count()
+        fast_moving = list(sales_products.filter(sale__date__gte=last_7_days).values("product__name", "product__status", "product__image", "product__image_variants", "product__selling_price").annotate(quantity_sold=Sum("quantity")).order_by("-quantity_sold")[:10])
+        for product in fast_moving:
+            product["product__image"] = ImageDerivatives.url(product["product__image"], product.pop("product__image_variants"), "thumb")
+        top_products = list(sales_products.values("product__name", "product__status", "product__image", "product__image_variants", "product__selling_price").annotate(quantity_sold=Sum("quantity")).order_by("-quantity_sold")[:10])
+        for product in top_products:
+            product["product__image"] = ImageDerivatives.url(product["product__image"], product.pop("product__image_variants"), "thumb")
+        expiring_soon = business_products.filter(expiry_date__range=(end_of_today,next_7_days)).order_by("-expiry_date")[:10]
+        expired_product = business_products.filter(expiry_date__lte=end_of_today).order_by("-expiry_date")[:10]
+        if expiring_soon:
+            expiring_soon = [{
+                "product__name": prod.name,
+                "product__status": prod.status,
+                "product__image": ImageDerivatives.url(prod.image.name, prod.image_variants, "thumb"),
+                "product__selling_price": prod.selling_price,
+                "quantity_sold": prod.sold
+            } for prod in expiring_soon]
+        if expired_product:
+            expired_product = [{
+                "product__name": prod.name,
+                "product__status": prod.status,
+                "product__image": ImageDerivatives.url(prod.image.name, prod.image_variants, "thumb"),
+                "product__selling_price": prod.selling_price,
+                "quantity_sold": prod.sold
+            } for prod in expired_product]
+        return {
+            'total_sales_today': total_sales_today,
+            'returning_customer':returning_customer,
+            'total_purchases': total_purchases,
+            'new_customer': new_customer,
+            'fast_moving_product': fast_moving,
+            'top_selling_products': top_products,
+            'total_orders':orders,
+            'expiring_soon': list(expiring_soon),
+            'expired_product': list(expired_product)
+        }
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:27
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0011_businessbank'),
+        ('sale', '0008_saleservice_quantity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaleSyncKey',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('key', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sale_sync_keys', to='business.business')),
+                ('sale', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_keys', to='sale.sale')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('business', 'key'), name='unique_business_sale_sync_key')],
+            },
+        ),
+    ]
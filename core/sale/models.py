@@ -73,4 +73,17 @@ class SaleService(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2)
 
     def __str__(self):
-        return f"{self.service.name} in Sale {self.sale.id}"
\ No newline at end of file
+        return f"{self.service.name} in Sale {self.sale.id}"
+
+class SaleSyncKey(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    business = models.ForeignKey(Business, on_delete=models.CASCADE, related_name="sale_sync_keys")
+    key = models.CharField(max_length=64)
+    sale = models.ForeignKey(Sale, on_delete=models.CASCADE, related_name="sync_keys")
+    created_at = models.DateTimeField(auto_now_add=True)
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["business", "key"], name="unique_business_sale_sync_key")
+        ]
+    def __str__(self):
+        return f"{self.key} for Sale {self.sale_id}"
@@ -3,6 +3,8 @@ from sale.models import Sale, PAYMENT_METHOD, SaleProduct, SaleService
 from datetime import date
 from product.models import Product
 from itertools import chain
+from django.db.models import F
+from utils.media import ImageVariantField, ImageDerivatives
 
 
 class ProductSerializer(serializers.Serializer):
@@ -63,18 +65,19 @@ class UserSalesSerializer(serializers.ModelSerializer):
         return super().validate(attrs)
 
 class SalesCatAnalysisSerializer(serializers.ModelSerializer):
+    image = ImageVariantField(size="thumb")
     class Meta:
         model = Product
         fields = ["id", "name", "sku", "image", "sold", "selling_price"]
 
 class SalesProductSerializer(serializers.ModelSerializer):
-    image = serializers.ImageField(source= "product.image")
+    image = ImageVariantField(source="product.image", size="thumb")
     name = serializers.CharField(source="product.name")
     class Meta:
         model = SaleProduct
         fields = ["image", "name", "quantity", "price","unit_price"]
 class SalesServiceSerializer(serializers.ModelSerializer):
-    image = serializers.ImageField(source= "service.image")
+    image = ImageVariantField(source="service.image", size="thumb")
     name = serializers.CharField(source="service.name")
     unit_price = serializers.CharField(source="price")
     class Meta:
@@ -96,4 +99,66 @@ class OrderHIstorySerializer(serializers.ModelSerializer):
         sales_services = obj.sale_services.all()
         sales_product_serializer =  SalesProductSerializer(sales_products, many=True)
         sales_service_serializer =  SalesServiceSerializer(sales_services, many=True)
-        return list(chain(sales_product_serializer.data, sales_service_serializer.data))  
\ No newline at end of file
+        return list(chain(sales_product_serializer.data, sales_service_serializer.data))  
+
+class LeanOrderLineSerializer(serializers.Serializer):
+    image = serializers.SerializerMethodField()
+    name = serializers.CharField()
+    quantity = serializers.IntegerField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    def get_image(self, obj):
+        return ImageDerivatives.url(obj["image"], obj["image_variants"], "thumb")
+
+class LeanOrderHistoryListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        """Loads the lines of every order on the page in two queries."""
+        orders = list(data)
+        lines = {order["id"]: [] for order in orders}
+        sale_products = SaleProduct.objects.filter(sale_id__in=lines.keys()).values(
+            "sale_id", "quantity", "price", "unit_price", name=F("product__name"),
+            image=F("product__image"), image_variants=F("product__image_variants")
+        )
+        sale_services = SaleService.objects.filter(sale_id__in=lines.keys()).values(
+            "sale_id", "quantity", "price", unit_price=F("price"), name=F("service__name"),
+            image=F("service__image"), image_variants=F("service__image_variants")
+        )
+        # Products come before services, as in OrderHIstorySerializer
+        for line in chain(sale_products, sale_services):
+            lines[line["sale_id"]].append(line)
+        for order in orders:
+            order["lines"] = lines[order["id"]]
+        return super().to_representation(orders)
+
+class LeanOrderHistorySerializer(serializers.Serializer):
+    """
+    Same output as OrderHIstorySerializer, built from a values() queryset with
+    the fields in `FIELDS` instead of model instances.
+    """
+    FIELDS = ["id", "date", "attendant__firstname", "attendant__lastname", "payment_status", "method", "total_price", "created_at"]
+    id = serializers.UUIDField()
+    date = serializers.DateField()
+    attendant = serializers.SerializerMethodField()
+    payment_status = serializers.CharField()
+    method = serializers.CharField()
+    total_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    products = serializers.SerializerMethodField()
+    created_at = serializers.DateTimeField()
+    class Meta:
+        list_serializer_class = LeanOrderHistoryListSerializer
+
+    def get_attendant(self, obj):
+        if obj["attendant__firstname"] is not None:
+            return f"{obj['attendant__firstname']} {obj['attendant__lastname']}"
+        return None
+    def get_products(self, obj):
+        return LeanOrderLineSerializer(obj["lines"], many=True, context=self.context).data
+
+class SaleSyncItemSerializer(UserSalesSerializer):
+    idempotency_key = serializers.CharField(max_length=64, write_only=True)
+    class Meta(UserSalesSerializer.Meta):
+        fields = UserSalesSerializer.Meta.fields + ["idempotency_key"]
+
+
+class SaleSyncSerializer(serializers.Serializer):
+    sales = serializers.ListField(child=serializers.DictField(), min_length=1, max_length=500)
@@ -1,3 +1,198 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+from django.db import IntegrityError
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from authentication.models import User
+from business.models import Business
+from category.models import Category
+from customer.models import Customer
+from product.models import Product
+from service.models import Service
+from sale.checkout import SaleCheckout, CheckoutError
+from sale.models import Sale, SaleProduct, SaleService, PaymentHistory, SaleSyncKey
+from sale.serializers import UserSalesSerializer
+from utils.cache import DashboardCache
 
-# Create your tests here.
+
+class SaleFixtures:
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Obi", "owner@example.com", "0801", password="pw")
+        User.objects.filter(id=self.owner.id).update(is_subscribed=True, subscription_end_date=timezone.localdate() + timedelta(days=30))
+        self.owner.refresh_from_db()
+        self.business = Business.objects.create(owner=self.owner, name="Shop", country="NG", state="Lagos", city="Ikeja", street="1 Road", logo="business/logo.png")
+        category = Category.objects.create(business=self.business, name="Drinks")
+        self.malt = Product.objects.create(name="Malt", category=category, quantity=10, cost_price=5, selling_price=10, low_stock_threshold=3)
+        self.soda = Product.objects.create(name="Soda", category=category, quantity=2, cost_price=4, selling_price=8, low_stock_threshold=1)
+        self.wash = Service.objects.create(name="Wash", category=category, amount=100)
+        self.customer = Customer.objects.create(business=self.business, name="Cus", phone="1", email="c@example.com")
+
+    def payload(self, method="CASH", malt=1, soda=0, **extra):
+        lines = [{"id": str(self.malt.id), "unit_price": "10", "quantity": malt}]
+        if soda:
+            lines.append({"id": str(self.soda.id), "unit_price": "8", "quantity": soda})
+        return {"date": str(timezone.localdate()), "method": method, "products": lines, **extra}
+
+    def quantities(self):
+        return list(Product.objects.filter(id__in=[self.malt.id, self.soda.id]).order_by("name").values_list("quantity", flat=True))
+
+
+class SaleCheckoutTest(SaleFixtures, TestCase):
+    def checkout(self, payload):
+        serializer = UserSalesSerializer(data=payload)
+        serializer.is_valid(raise_exception=True)
+        return SaleCheckout(self.business, self.owner).run(serializer.validated_data)
+
+    def test_cash_sale_takes_stock_and_records_every_line(self):
+        payload = self.payload(malt=3, soda=2)
+        payload["products"].append({"id": str(self.wash.id), "unit_price": "100", "type": "SERVICE"})
+        sale = self.checkout(payload)
+        self.assertEqual(sale.total_price, 146)
+        self.assertEqual((sale.balance, sale.payment_status), (0, "PAID"))
+        self.assertEqual(self.quantities(), [7, 0])
+        self.assertEqual(Product.objects.get(id=self.soda.id).status, "OUT-OF-STOCK")
+        self.assertEqual(
+            sorted(SaleProduct.objects.filter(sale=sale).values_list("quantity", "price", "profit")),
+            [(2, 16, 8), (3, 30, 15)]
+        )
+        self.assertEqual(SaleService.objects.filter(sale=sale, service=self.wash).count(), 1)
+        self.assertEqual(list(PaymentHistory.objects.filter(sale=sale).values_list("amount", "method")), [(146, "CASH")])
+
+    def test_credit_sale_is_owed_by_the_customer(self):
+        due_date = str(timezone.localdate() + timedelta(days=7))
+        sale = self.checkout(self.payload("CREDIT", malt=2, customer=str(self.customer.id), due_date=due_date))
+        self.customer.refresh_from_db()
+        self.assertEqual((sale.balance, sale.payment_status), (20, "UNPAID"))
+        self.assertEqual((self.customer.wallet, self.customer.purchase_value), (-20, 20))
+        self.assertFalse(PaymentHistory.objects.filter(sale=sale).exists())
+
+    def test_short_stock_changes_nothing(self):
+        with self.assertRaises(CheckoutError):
+            self.checkout(self.payload(malt=1, soda=3))
+        self.assertEqual(self.quantities(), [10, 2])
+        self.assertFalse(Sale.objects.exists())
+
+
+class UserSaleSyncViewTest(SaleFixtures, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+
+    def sync(self, *sales):
+        response = self.client.post(f"/api/v1/sale/sync/{self.business.id}/", {"sales": list(sales)}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return [(result["idempotency_key"], result["status"]) for result in response.data["results"]], response.data["results"]
+
+    def test_each_key_is_applied_once(self):
+        statuses, results = self.sync(
+            self.payload(idempotency_key="a"), self.payload(idempotency_key="b"), self.payload(idempotency_key="a")
+        )
+        self.assertEqual(statuses, [("a", "CREATED"), ("b", "CREATED"), ("a", "DUPLICATE")])
+        self.assertEqual(results[2]["sale_id"], results[0]["sale_id"])
+        statuses, _ = self.sync(self.payload(idempotency_key="a"), self.payload(idempotency_key="c"))
+        self.assertEqual(statuses, [("a", "DUPLICATE"), ("c", "CREATED")])
+        self.assertEqual(Sale.objects.count(), 3)
+        self.assertEqual(self.quantities(), [7, 2])
+
+    def test_failed_items_do_not_stop_the_batch(self):
+        statuses, results = self.sync(
+            self.payload(idempotency_key="a"),
+            self.payload(soda=5, idempotency_key="b"),
+            {"method": "CASH", "idempotency_key": "c"},
+            self.payload(idempotency_key="d"),
+        )
+        self.assertEqual(statuses, [("a", "CREATED"), ("b", "FAILED"), ("c", "FAILED"), ("d", "CREATED")])
+        self.assertIn("errors", results[2])
+        self.assertEqual(self.quantities(), [8, 2])
+        self.assertEqual(set(SaleSyncKey.objects.values_list("key", flat=True)), {"a", "d"})
+
+    def test_unexpected_errors_are_reported_per_item(self):
+        run = SaleCheckout.run
+        def run_unless_b(checkout, data):
+            if data.get("description") == "b":
+                raise ValueError("boom")
+            return run(checkout, data)
+        with mock.patch.object(SaleCheckout, "run", run_unless_b):
+            statuses, results = self.sync(
+                self.payload(idempotency_key="a"), self.payload(description="b", idempotency_key="b"), self.payload(idempotency_key="c")
+            )
+        self.assertEqual(statuses, [("a", "CREATED"), ("b", "FAILED"), ("c", "CREATED")])
+        self.assertEqual(results[1]["message"], "The sale could not be saved")
+        self.assertEqual(self.quantities(), [8, 2])
+
+    def test_integrity_errors_without_a_stored_key_fail(self):
+        with mock.patch.object(SaleCheckout, "run", side_effect=IntegrityError("null value in column")):
+            _, results = self.sync(self.payload(idempotency_key="a"))
+        self.assertEqual(results, [{"idempotency_key": "a", "status": "FAILED", "message": "The sale could not be saved"}])
+        self.assertFalse(SaleSyncKey.objects.exists())
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class DashboardCacheTest(TestCase):
+    business_id = "business"
+
+    def setUp(self):
+        cache.clear()
+        self.builds = 0
+        self.threads = []
+
+    def build(self):
+        self.builds += 1
+        return {"total_purchases": self.builds, "total_sales_today": None}
+
+    def get(self, build=None):
+        spawn = threading.Thread
+        def record(*args, **kwargs):
+            thread = spawn(*args, **kwargs)
+            self.threads.append(thread)
+            return thread
+        with mock.patch("utils.cache.threading.Thread", record):
+            return DashboardCache.get(self.business_id, build or self.build)
+
+    def wait(self):
+        for thread in self.threads:
+            thread.join(5)
+
+    def test_fresh_entries_are_served_from_the_cache(self):
+        self.assertEqual(self.get()["total_purchases"], 1)
+        self.assertEqual(self.get()["total_purchases"], 1)
+        self.assertEqual((self.builds, self.threads), (1, []))
+
+    def test_invalidated_entries_are_served_stale_while_one_rebuild_runs(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            DashboardCache.invalidate(self.business_id, total_purchases=2, total_sales_today=50)
+        release = threading.Event()
+        def slow_build():
+            release.wait(5)
+            return self.build()
+        self.assertEqual(self.get(slow_build), {"total_purchases": 3, "total_sales_today": 50})
+        self.assertEqual(self.get(slow_build)["total_purchases"], 3)
+        self.assertEqual(len(self.threads), 1)
+        release.set()
+        self.wait()
+        self.assertEqual(self.get(), {"total_purchases": 2, "total_sales_today": None})
+
+    def test_invalidation_waits_for_the_commit(self):
+        self.get()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            DashboardCache.invalidate(self.business_id, total_purchases=1)
+        self.assertEqual(self.get()["total_purchases"], 1)
+        self.assertEqual(self.threads, [])
+        callbacks[0]()
+        self.assertEqual(self.get()["total_purchases"], 2)
+        self.wait()
+
+    def test_old_entries_are_rebuilt_in_the_background(self):
+        self.get()
+        entry = cache.get(DashboardCache.key(self.business_id))
+        entry["built_at"] = time.time() - 3600
+        cache.set(DashboardCache.key(self.business_id), entry)
+        self.assertEqual(self.get()["total_purchases"], 1)
+        self.wait()
+        self.assertEqual(self.get()["total_purchases"], 2)
@@ -6,5 +6,7 @@ urlpatterns = [
     path("category/<uuid:id>/", ProductCategoryAnalysis.as_view(), name="category_sales"),
     path("sales_history/<uuid:id>/", SalesHistory.as_view(), name="sales_history"),
     path("order_history/<uuid:id>/", OrderHistory.as_view(), name="order_history"),
+    path("sync/<uuid:id>/", UserSaleSyncView.as_view(), name="user_sales_sync"),
+    path("export/<str:dataset>/<uuid:id>/", SalesExport.as_view(), name="sales_export"),
     path("<uuid:id>/", UserSaleView.as_view(), name="user_sales")
 ]
\ No newline at end of file
@@ -1,33 +1,41 @@
 from django.shortcuts import render
 from sale.serializers import (
     UserSalesSerializer,
+    SaleSyncSerializer,
+    SaleSyncItemSerializer,
     SalesCatAnalysisSerializer,
-    OrderHIstorySerializer
+    OrderHIstorySerializer,
+    LeanOrderHistorySerializer
     )
 from rest_framework import generics, status, views, filters
 from rest_framework.response import Response
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticated
-from django.db import transaction
-from business.models import Business, BusinessBank
+from django.db import transaction, IntegrityError
+from django.http import Http404
+from business.models import Business
 from product.models import Product
-from customer.models import Customer
-from sale.models import Sale, SaleProduct, PaymentHistory, SaleService
+from sale.models import Sale, SaleProduct, PaymentHistory, SaleService, SaleSyncKey
 from django.shortcuts import get_object_or_404, get_list_or_404
 from datetime import datetime
+from utils import logger
+from utils.access import Access
+from authentication.tokens import ClaimsAuthentication
 from utils.permissions import IsBusinessOwner
-from django.db.models import Sum, Count, Q, F, DecimalField, FloatField
+from django.db.models import Sum, Count, Q, F, DecimalField, FloatField, Prefetch, Subquery
 from django.utils import timezone
 from datetime import timedelta
 from drf_yasg import openapi
-from service.models import Service
 from drf_yasg.utils import swagger_auto_schema
 from utils.pagination import CustomPagination
 from django.db import models
 from django.contrib.auth import get_user_model
 from utils.date import CustomDateFormating
-from utils.notification import SendPushNotification
+from sale.checkout import SaleCheckout, CheckoutError
+from sale.dashboard import SalesDashboard
+from utils.streaming import StreamingJSON, STREAM_CHUNK_SIZE
+from utils.export import Export, EXPORT_FILE_TYPES
 from utils.permissions import IsSubscribed
-from itertools import chain
 # Create your views here.
 
 User = get_user_model()
@@ -38,180 +46,84 @@ class UserSaleView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated, IsSubscribed]
     def post(self, request, id):
         user = request.user
-        business = get_object_or_404(Business, id=id)
-        is_attendant = business.attendants.filter(id=user.id).exists()
-        if not business.owner == user and not is_attendant:
+        access = Access.of(request)
+        if not access.can_access(id):
             return Response(data={"message": "No Business matches the given query"}, status=status.HTTP_401_UNAUTHORIZED)
+        business = get_object_or_404(Business, id=id)
         serializer = self.serializer_class(data=request.data)
         serializer.is_valid(raise_exception=True)
-        products = serializer.validated_data.pop("products", None)
-        product_ids = [p["id"] for p in products if p["type"] == "PRODUCT"]
-        service_ids = [p["id"] for p in products if p["type"] == "SERVICE"]
-        customer = serializer.validated_data.pop("customer", None)
-        bank = serializer.validated_data.pop("bank", None)
-        if customer:
-            customer = get_object_or_404(Customer, business=business, id=customer)
-        if bank:
-            bank  = get_object_or_404(BusinessBank, business=business, id=bank)
-        amount_paid = serializer.validated_data.pop("amount_paid", None)
-        method = serializer.validated_data.get("method")
-        valid_products = Product.objects.filter(id__in = product_ids, category__business = business).exclude(status="OUT-OF-STOCK")
-        valid_services = Service.objects.filter(id__in = service_ids, category__business = business)
-        total_amount = 0
-        partial_method  = serializer.validated_data.pop("partial_method", None)
+        try:
+            serializer.instance = SaleCheckout(business, user).run(serializer.validated_data)
+        except CheckoutError as e:
+            return Response(data={"message": e.message}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
-        ## Notification check
-        low_stock_notification = business.owner.low_stock_alert_notification
-        out_stock_notification = business.owner.out_of_stock_alert_notification
-        fcm_token = business.owner.fcm_token
+class UserSaleSyncView(generics.GenericAPIView):
+    serializer_class = SaleSyncSerializer
+    permission_classes = [IsAuthenticated, IsSubscribed]
+    chunk_size = 50
+    def post(self, request, id):
+        user = request.user
+        access = Access.of(request)
+        if not access.can_access(id):
+            return Response(data={"message": "No Business matches the given query"}, status=status.HTTP_401_UNAUTHORIZED)
+        business = get_object_or_404(Business, id=id)
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        payloads = serializer.validated_data["sales"]
+        checkout = SaleCheckout(business, user)
+        results = []
+        for start in range(0, len(payloads), self.chunk_size):
+            results += self.sync_chunk(business, checkout, payloads[start:start + self.chunk_size])
+        return Response(data={"results": results}, status=status.HTTP_200_OK)
 
-        with transaction.atomic():
-            for product in valid_products:
-                prd = next((d for d in products if d.get('id') == product.id))
-                if product.quantity < prd["quantity"]:
-                    return Response(data={"message": f'Quantity of {product.name} available is less than {prd["quantity"]}'}, status=status.HTTP_400_BAD_REQUEST)
-                total_amount += (prd["quantity"] * prd["unit_price"])
-            for service in valid_services:
-                prd = next((d for d in products if d.get('id') == service.id))
-                service_qty = prd.get("quantity", 1)
-                total_amount += (prd["unit_price"] * service_qty )
-            mtd = method
-            amt = total_amount
-            balance = 0
-            if method == "CREDIT":
-                balance = total_amount
-                customer.wallet -= total_amount
-            elif method == "PARTIAL":
-                if amount_paid > total_amount:
-                    return Response(data={"message":"Amount paid greater than value"}, status=status.HTTP_400_BAD_REQUEST)
-                debt = total_amount - amount_paid
-                customer.wallet -= debt
-                balance = debt
-                mtd = partial_method
-                amt = amount_paid
-            elif method == "ADVANCE" and customer.wallet < total_amount:
-                return Response(data={"message":"Wallet balance not up to amount"}, status=status.HTTP_400_BAD_REQUEST)
-            elif method == "ADVANCE":
-                customer.wallet -= total_amount
-            if balance:
-                payment_status = "UNPAID"
+    def sync_chunk(self, business, checkout, payloads):
+        keys = [p.get("idempotency_key") for p in payloads if p.get("idempotency_key")]
+        seen = dict(SaleSyncKey.objects.filter(business=business, key__in=keys).values_list("key", "sale_id"))
+        results = []
+        for payload in payloads:
+            item = SaleSyncItemSerializer(data=payload)
+            if not item.is_valid():
+                results.append({"idempotency_key": payload.get("idempotency_key"), "status": "FAILED", "errors": item.errors})
+                continue
+            key = item.validated_data.pop("idempotency_key")
+            if key in seen:
+                results.append({"idempotency_key": key, "status": "DUPLICATE", "sale_id": seen[key]})
+                continue
+            try:
+                # Each sale commits on its own, so its stock locks are not held for the rest of the chunk
+                with transaction.atomic():
+                    sale = checkout.run(item.validated_data)
+                    SaleSyncKey.objects.create(business=business, key=key, sale=sale)
+            except IntegrityError as e:
+                # Another request may have stored this key while the sale was being applied
+                sale_id = SaleSyncKey.objects.filter(business=business, key=key).values_list("sale_id", flat=True).first()
+                if sale_id is None:
+                    logger.error(f"Error syncing sale {key} for business {business.id}: {str(e)}")
+                    results.append({"idempotency_key": key, "status": "FAILED", "message": "The sale could not be saved"})
+                    continue
+                seen[key] = sale_id
+                results.append({"idempotency_key": key, "status": "DUPLICATE", "sale_id": sale_id})
+            except (CheckoutError, Http404) as e:
+                results.append({"idempotency_key": key, "status": "FAILED", "message": str(e)})
+            except Exception as e:
+                logger.error(f"Error syncing sale {key} for business {business.id}: {str(e)}")
+                results.append({"idempotency_key": key, "status": "FAILED", "message": "The sale could not be saved"})
             else:
-                payment_status = "PAID"
-            sales = serializer.save(business=business, attendant=user,total_price=total_amount, balance=balance, payment_status=payment_status,customer=customer)
-            if customer:
-                customer.lastSales = timezone.now().date()
-                customer.purchase_value += total_amount
-                customer.save()
-            if method != "CREDIT":
-                PaymentHistory.objects.create(amount=amt, sale=sales, method=mtd, bank=bank)
-            for product in valid_products:
-                prd = next((d for d in products if d.get('id') == product.id))
-                product.quantity -= prd["quantity"]
-                if product.quantity == 0:
-                    product.status = "OUT-OF-STOCK"
-                    if out_stock_notification and fcm_token:
-                        SendPushNotification.notify(
-                            {
-                                "token":fcm_token,
-                                "title": "Product Out of stock",
-                                "body": f'Your product {product.name} has been sold out',
-                                "data": {}
-                            }
-                        )
-                elif product.quantity <= product.low_stock_threshold:
-                    product.status = "LOW"
-                    if low_stock_notification and fcm_token:
-                        SendPushNotification.notify(
-                            {
-                                "token":fcm_token,
-                                "title": "Product Low on stock",
-                                "body": f'Your product {product.name} is running out of stock',
-                                "data": {}
-                            }
-                        )
-                product.sold += prd["quantity"]
-                product.save()
-                amt = prd["quantity"] * prd["unit_price"]
-                dsc = prd.get("discount") or 0
-                price = amt - dsc
-                qty = prd["quantity"]
-                profit = price - (product.cost_price * qty)
-                SaleProduct.objects.create(sale=sales, product=product, unit_price=prd["unit_price"], discount=dsc, quantity=prd["quantity"], price=price, profit=profit)
-
-            for service in valid_services:
-                prd = next((d for d in products if d.get('id') == service.id))
-                service_qty = prd.get("quantity", 1)
-                SaleService.objects.create(sale=sales, service=service, price=prd["unit_price"], quantity=service_qty)
-            return Response(data=serializer.data, status=status.HTTP_201_CREATED)
+                seen[key] = sale.id
+                results.append({"idempotency_key": key, "status": "CREATED", "sale_id": sale.id})
+        return results
 
 class SalesAnalysisView(views.APIView):
     serializer_class = UserSalesSerializer
     permission_classes = [IsAuthenticated, IsBusinessOwner, IsSubscribed]
+    authentication_classes = [ClaimsAuthentication]
     pagination_class = CustomPagination
     def get(self, request, id):
-        user = request.user
-        business = get_object_or_404(Business, id=id, owner=user)
-        today = datetime.now()
-        start_of_today = today.replace(hour=0, minute=0, second=0)
-        end_of_today = start_of_today + timedelta(days=1)
-        all_sales = Sale.objects.filter(business=business)
-        # annotated_sales = all_sales.annotate(
-        #     total_revenue=Sum(F('sale_products__price') * F('sale_products__quantity'), output_field=DecimalField()),
-        #     total_cost=Sum(F('sale_products__product__cost_price') * F('sale_products__quantity'), output_field=DecimalField())
-        # )
-        # total_product_cost = annotated_sales.aggregate(total_cost=Sum('total_cost'))['total_cost']
-        # total_revenue = annotated_sales.aggregate(total_revenue=Sum('total_revenue'))['total_revenue']
-        orders = all_sales.aggregate(total=Sum("total_price"))["total"] or 0.0
-        all_customers = Customer.objects.filter(business=business)
-        sales_products = SaleProduct.objects.filter(sale__business=business)
-        business_products = Product.objects.filter(category__business = business)
-        returning_customer = all_sales.filter(created_at__date=timezone.now().date()).values('customer').distinct().count()
-        last_7_days = timezone.now().date() - timedelta(days=7)
-        next_7_days = timezone.now().date() + timedelta(days=7)
-        today_sales = all_sales.filter(created_at__range=(start_of_today, end_of_today))
-        total_sales_today = today_sales.aggregate(total=Sum('total_price'))['total'] or 0.0
-        current_balance = business.balance
-        total_purchases = all_sales.count()
-        new_customer = all_customers.filter(created_at__range=(start_of_today, end_of_today)).count()
-        # fast_moving = sales_products.filter(sale__date__gte=last_7_days).values("product__name").annotate(total_quantity=Sum("quantity")).order_by("-total_quantity").first()
-        fast_moving = sales_products.filter(sale__date__gte=last_7_days).values("product__name", "product__status", "product__image", "product__selling_price").annotate(quantity_sold=Sum("quantity")).order_by("-quantity_sold")[:10]
-        for product in fast_moving:
-            product["product__image"] = f"https://sync-bck.s3.amazonaws.com{product['product__image']}"
-        top_products = sales_products.values("product__name", "product__status", "product__image", "product__selling_price").annotate(quantity_sold=Sum("quantity")).order_by("-quantity_sold")[:10]
-        for product in top_products:
-            product["product__image"] = f"https://sync-bck.s3.amazonaws.com{product['product__image']}"
-        expiring_soon = business_products.filter(expiry_date__range=(end_of_today,next_7_days)).order_by("-expiry_date")[:10]
-        expired_product = business_products.filter(expiry_date__lte=end_of_today).order_by("-expiry_date")[:10]
-        if expiring_soon:
-            expiring_soon = [{
-                "product__name": prod.name,
-                "product__status": prod.status,
-                "product__image": prod.image.url if prod.image else None,
-                "product__selling_price": prod.selling_price,
-                "quantity_sold": prod.sold
-            } for prod in expiring_soon]
-        if expired_product:
-            expired_product = [{
-                "product__name": prod.name,
-                "product__status": prod.status,
-                "product__image": prod.image.url if prod.image else None,
-                "product__selling_price": prod.selling_price,
-                "quantity_sold": prod.sold
-            } for prod in expired_product]
-        return Response({
-            'total_sales_today': total_sales_today,
-            'current_balance': current_balance,
-            'returning_customer':returning_customer,
-            'total_purchases': total_purchases,
-            'new_customer': new_customer,
-            'fast_moving_product': fast_moving,
-            'top_selling_products': top_products,
-            # 'total_product_cost':total_product_cost,
-            # 'total_revenue': total_revenue,
-            'total_orders':orders,
-            'expiring_soon': expiring_soon,
-            'expired_product':expired_product
-        }, status=status.HTTP_200_OK)
+        if not Access.of(request).owns(id):
+            return Response(data={"message": "No Business matches the given query"}, status=status.HTTP_404_NOT_FOUND)
+        business = get_object_or_404(Business, id=id)
+        return Response(SalesDashboard.get(business), status=status.HTTP_200_OK)
     
 
 class ProductCategoryAnalysis(generics.ListAPIView):
@@ -222,7 +134,9 @@ class ProductCategoryAnalysis(generics.ListAPIView):
     @swagger_auto_schema(
         manual_parameters=[
             openapi.Parameter('type', openapi.IN_QUERY, description='Filter by account status',
-                              type=openapi.TYPE_STRING, enum=['TOP-SELLING', 'FAST-MOVING', 'EXPIRING', 'EXPIRED'], required=False)
+                              type=openapi.TYPE_STRING, enum=['TOP-SELLING', 'FAST-MOVING', 'EXPIRING', 'EXPIRED'], required=False),
+            openapi.Parameter('stream', openapi.IN_QUERY, description='Stream every product as one JSON array instead of a page',
+                              type=openapi.TYPE_BOOLEAN, required=False)
         ]
     )
     def get(self, request, id):
@@ -257,15 +171,18 @@ class ProductCategoryAnalysis(generics.ListAPIView):
             products = business_products.filter(
                 expiry_date__lte=end_of_today
             ).order_by('-expiry_date')
+        if request.GET.get("stream", "").lower() == "true":
+            return StreamingJSON.response(products, lambda product: self.get_serializer(product).data)
         page = self.paginate_queryset(products)
-        # if page is not None:
-        #     serializer = self.get_serializer(page, many=True)
-        #     return self.get_paginated_response(serializer.data)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(products, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 class SalesHistory(generics.GenericAPIView):
     permission_classes = [IsAuthenticated, IsSubscribed]
+    authentication_classes = [ClaimsAuthentication]
     pagination_class = CustomPagination
     @swagger_auto_schema(
         manual_parameters=[
@@ -281,10 +198,11 @@ class SalesHistory(generics.GenericAPIView):
     )
     def get(self, request, id):
         user = request.user
+        access = Access.of(request)
+        if not access.can_access(id):
+            raise PermissionDenied("No Business matches the given query")
         business = get_object_or_404(Business, id=id)
-        is_attendant = business.attendants.filter(id=user.id).exists()
-        if not business.owner == user and not is_attendant:
-            return Response(data={"message": "No Business matches the given query"}, status=status.HTTP_401_UNAUTHORIZED)
+        is_attendant = access.attends(id)
         search = request.GET.get("search")
         param1 = self.request.query_params.get('start_date', None)
         param2 = self.request.query_params.get('end_date', None)
@@ -294,7 +212,7 @@ class SalesHistory(generics.GenericAPIView):
         # business_products = Product.objects.filter(category__business = business)
         all_sales = Sale.objects.filter(business=business, date__range=[start_date, end_date])
         if is_attendant:
-            all_sales = all_sales.filter(attendant=user)
+            all_sales = all_sales.filter(attendant_id=user.id)
         type  = request.GET.get("type")
         attendance_id  = request.GET.get("attendance_id")
         attendance = None
@@ -313,25 +231,17 @@ class SalesHistory(generics.GenericAPIView):
             sale__date__range=[start_date, end_date]
         )
         if is_attendant:
-            business_sales_products = business_sales_products.filter(sale__attendant = user)
-            business_sales_services = business_sales_services.filter(sale__attendant = user)
+            business_sales_products = business_sales_products.filter(sale__attendant_id=user.id)
+            business_sales_services = business_sales_services.filter(sale__attendant_id=user.id)
         if attendance:
             all_sales = all_sales.filter(attendant = attendance)
             business_sales_products = business_sales_products.filter(sale__attendant = attendance)
             business_sales_services = business_sales_services.filter(sale__attendant = attendance)
-        revenue = all_sales.aggregate(total=Sum("total_price"))["total"] or 0.0
-    
-        today = datetime.now()
-        start_of_today = today.replace(hour=0, minute=0, second=0)
-        # end_of_today = start_of_today + timedelta(days=1)
-        # last_7_days = timezone.now().date() - timedelta(days=7)
-        products = business_sales_products.values('product__name').annotate(
+        products = business_sales_products.values(name=F('product__name')).annotate(
             unit_sold=Sum('quantity'),
             revenue=Sum(F('unit_price') * F('quantity'), output_field=FloatField()),
-            profit=Sum('profit')
-        ).values('product__name', 'unit_sold', 'revenue', 'profit').order_by('unit_sold')
-
-        products = [{'name': p['product__name'], 'unit_sold': p['unit_sold'], 'revenue': p['revenue'], 'profit': p['profit']} for p in products]
+            profit=Sum('profit', output_field=FloatField())
+        )
 
         '''
         "name": "Headset",
@@ -339,33 +249,29 @@ class SalesHistory(generics.GenericAPIView):
         "revenue": 900,
         "profit": 2110
         '''
-        services = business_sales_services.values(
-            'service__name'
-        ).annotate(
-            name=F('service__name'),
+        services = business_sales_services.values(name=F('service__name')).annotate(
             unit_sold=Sum('quantity'),
             revenue=Sum(F('price') * F('quantity'), output_field=FloatField()),
             profit=Sum(F('price') * F('quantity'), output_field=FloatField()),
-        ).values(
-            'name',
-            'unit_sold',
-            'revenue',
-            'profit'
-        ).order_by('unit_sold')
+        )
         if search:
-            products = products.filter(name__icontains=search)
-            services = services.filter(name__icontains=search)
-        costs = business_sales_products.aggregate(
-            cost=Sum(F('product__cost_price') * F('quantity') - F('discount'), output_field=FloatField())
-        )['cost'] or 0.0
-        product_orders = business_sales_products.aggregate(
-            sum_orders = Sum('quantity')
-        )['sum_orders'] or 0.0
-        service_orders = business_sales_services.aggregate(
-            sum_orders = Count('id')
-        )['sum_orders'] or 0.0
-        orders = product_orders + service_orders
-        joint_results = list(chain(products, services))
+            products = products.filter(product__name__icontains=search)
+            services = services.filter(service__name__icontains=search)
+        ordering = {'MOST-PROFITABLE': '-profit'}.get(type.upper(), '-unit_sold')
+        joint_results = products.order_by().union(services.order_by(), all=True).order_by(ordering, 'name')
+        # Each subquery is grouped by the business every row belongs to, so it
+        # yields a single total and all of them come back in one round trip
+        totals = Business.objects.filter(id=business.id).values(
+            revenue=Subquery(all_sales.order_by().values('business').annotate(total=Sum('total_price')).values('total')),
+            cost=Subquery(business_sales_products.order_by().values('sale__business').annotate(
+                total=Sum(F('product__cost_price') * F('quantity') - F('discount'), output_field=FloatField())
+            ).values('total')),
+            product_orders=Subquery(business_sales_products.order_by().values('sale__business').annotate(total=Sum('quantity')).values('total')),
+            service_orders=Subquery(business_sales_services.order_by().values('sale__business').annotate(total=Count('id')).values('total')),
+        ).get()
+        revenue = totals['revenue'] or 0.0
+        costs = totals['cost'] or 0.0
+        orders = (totals['product_orders'] or 0.0) + (totals['service_orders'] or 0.0)
         page = self.paginate_queryset(joint_results)
         if page is not None:
             return self.get_paginated_response({
@@ -378,41 +284,117 @@ class SalesHistory(generics.GenericAPIView):
             "revenue":revenue,
             "cost":costs,
             'orders':orders,
-            "data": products
+            "data": list(joint_results)
         }
         return Response(resp, status=status.HTTP_200_OK)
 
 class OrderHistory(generics.ListAPIView):
     serializer_class = OrderHIstorySerializer
     permission_classes = [IsAuthenticated, IsSubscribed]
+    authentication_classes = [ClaimsAuthentication]
     pagination_class = CustomPagination
+    cursor_ordering = ("-created_at", "-id")
     filter_backends = [filters.SearchFilter]
     search_fields = ["id", "customer__firstname", "customer__lastname", "user__email"]
     @swagger_auto_schema(
         manual_parameters=[
             openapi.Parameter('status', openapi.IN_QUERY, description='Filter by account status',
-                              type=openapi.TYPE_STRING, enum=['COMPLETED', 'PENDING', 'CANCELLED'], required=False)
+                              type=openapi.TYPE_STRING, enum=['COMPLETED', 'PENDING', 'CANCELLED'], required=False),
+            openapi.Parameter('lean', openapi.IN_QUERY, description='Build the page from values() projections',
+                              type=openapi.TYPE_BOOLEAN, required=False),
+            openapi.Parameter('cursor', openapi.IN_QUERY, description='Keyset paging: empty for the first page, then the cursor from links.next',
+                              type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('total', openapi.IN_QUERY, description='Total to return in keyset paging',
+                              type=openapi.TYPE_STRING, enum=['exact', 'estimate'], required=False)
         ]
     )
     def get(self, request, id):
         queryset = self.get_queryset()
+        if self.is_lean():
+            queryset = queryset.prefetch_related(None).values(*LeanOrderHistorySerializer.FIELDS)
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
+    def is_lean(self):
+        return self.request.query_params.get("lean", "").lower() == "true"
+    def get_serializer_class(self):
+        if self.is_lean():
+            return LeanOrderHistorySerializer
+        return self.serializer_class
     def get_queryset(self):
         id = self.kwargs["id"]
         user = self.request.user
+        access = Access.of(self.request)
+        if not access.can_access(id):
+            raise PermissionDenied("No Business matches the given query")
         business = get_object_or_404(Business, id=id)
-        is_attendant = business.attendants.filter(id=user.id).exists()
-        if not business.owner == user and not is_attendant:
-            return Response(data={"message": "No Business matches the given query"}, status=status.HTTP_401_UNAUTHORIZED)
+        is_attendant = access.attends(id)
         search_param = self.request.query_params.get('search', None)
-        queryset = Sale.objects.filter(business=business).order_by("-created_at").distinct()
+        queryset = Sale.objects.filter(business=business).select_related("attendant").prefetch_related(
+            Prefetch("sale_products", queryset=SaleProduct.objects.select_related("product")),
+            Prefetch("sale_services", queryset=SaleService.objects.select_related("service")),
+        ).order_by("-created_at")
         if is_attendant:
-            queryset = queryset.filter(attendant=user)
+            queryset = queryset.filter(attendant_id=user.id)
         # if search_param:
         #     queryset = queryset.filter(Q(id__icontains=search_param) | Q(customer__firstname__icontains=search_param) | Q(customer__lastname__icontains=search_param) | Q(customer__email__icontains=search_param))
-        return queryset
\ No newline at end of file
+        return queryset
+
+
+class SalesExport(views.APIView):
+    permission_classes = [IsAuthenticated, IsBusinessOwner, IsSubscribed]
+    # dataset: (model, business lookup, date lookup, [(header, field)])
+    datasets = {
+        "sales": (Sale, "business", "date", [
+            ("Sale ID", "id"), ("Date", "date"), ("Customer", "customer__name"),
+            ("Attendant first name", "attendant__firstname"), ("Attendant last name", "attendant__lastname"),
+            ("Total price", "total_price"), ("Balance", "balance"), ("Method", "method"),
+            ("Payment status", "payment_status"), ("Due date", "due_date"), ("Description", "description"),
+            ("Created at", "created_at"),
+        ]),
+        "products": (SaleProduct, "sale__business", "sale__date", [
+            ("Sale ID", "sale_id"), ("Date", "sale__date"), ("Product", "product__name"), ("SKU", "product__sku"),
+            ("Quantity", "quantity"), ("Unit price", "unit_price"), ("Discount", "discount"),
+            ("Price", "price"), ("Profit", "profit"),
+        ]),
+        "services": (SaleService, "sale__business", "sale__date", [
+            ("Sale ID", "sale_id"), ("Date", "sale__date"), ("Service", "service__name"),
+            ("Quantity", "quantity"), ("Discount", "discount"), ("Price", "price"),
+        ]),
+        "payments": (PaymentHistory, "sale__business", "sale__date", [
+            ("Sale ID", "sale_id"), ("Sale date", "sale__date"), ("Amount", "amount"), ("Method", "method"),
+            ("Bank", "bank__bank_name"), ("Account number", "bank__account_number"), ("Paid at", "created_at"),
+        ]),
+    }
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('file_type', openapi.IN_QUERY, description='File to download',
+                              type=openapi.TYPE_STRING, enum=list(EXPORT_FILE_TYPES), required=False),
+            openapi.Parameter('start_date', openapi.IN_QUERY, description='Start date (YYYY-MM-DD)', type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter('end_date', openapi.IN_QUERY, description='End date (YYYY-MM-DD)', type=openapi.TYPE_STRING, required=False),
+        ]
+    )
+    def get(self, request, dataset, id):
+        business = get_object_or_404(Business, id=id, owner=request.user)
+        if dataset not in self.datasets:
+            return Response(data={"message": f"Export one of {', '.join(self.datasets)}"}, status=status.HTTP_400_BAD_REQUEST)
+        file_type = request.GET.get("file_type", "csv").lower()
+        if file_type not in EXPORT_FILE_TYPES:
+            return Response(data={"message": "file_type must be csv or xlsx"}, status=status.HTTP_400_BAD_REQUEST)
+        param1 = request.query_params.get('start_date', None)
+        param2 = request.query_params.get('end_date', None)
+        start_date, end_date, _ = CustomDateFormating.start_end_date(param1, param2)
+        if not start_date:
+            return Response(data={"message":end_date}, status=status.HTTP_400_BAD_REQUEST)
+        model, business_lookup, date_lookup, columns = self.datasets[dataset]
+        rows = model.objects.filter(
+            **{business_lookup: business, f"{date_lookup}__range": [start_date, end_date]}
+        ).order_by(date_lookup, "pk").values_list(*[field for _, field in columns])
+        # iterator() reads through a server side cursor instead of loading every row
+        return Export.response(
+            rows.iterator(chunk_size=STREAM_CHUNK_SIZE), [header for header, _ in columns],
+            f"{dataset}-{start_date.date()}-{end_date.date()}", file_type
+        )
@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.db.models.functions import Upper
 from category.models import Category
 import uuid
 
@@ -9,9 +11,15 @@ class Service(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(null=True, blank=True)
     image = models.ImageField(upload_to="service", null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     amount = models.BigIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    class Meta:
+        # Back icontains/istartswith searches, see utils.search.Search
+        indexes = [
+            GinIndex(OpClass(Upper("name"), name="gin_trgm_ops"), name="service_name_trgm"),
+        ]
     def __str__(self):
         return f"{self.name} - {self.amount} by {self.category.business.name}"
\ No newline at end of file
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from service.models import Service
+from utils.media import ImageVariantField
 
 class ServiceSerializer(serializers.ModelSerializer):
     category_id = serializers.UUIDField(write_only=True)
@@ -7,7 +8,7 @@ class ServiceSerializer(serializers.ModelSerializer):
     name = serializers.CharField()
     description = serializers.CharField(required=False)
     amount = serializers.IntegerField()
-    image= serializers.ImageField(required=False)
+    image = ImageVariantField(required=False)
     class Meta:
         model = Service
         fields = ["id", "name", "category", "category_id","description", "amount", "image"]
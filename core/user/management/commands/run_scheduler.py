@@ -0,0 +1,29 @@
+from decouple import config
+from django.core.management.base import BaseCommand
+from user.subscriptions import SubscriptionExpiry
+from user.usage import PlanUsageLedger
+from utils.scheduler import Scheduler
+
+SUBSCRIPTION_CHECK_INTERVAL = config("SUBSCRIPTION_CHECK_INTERVAL", default=300, cast=int)
+USAGE_PRUNE_INTERVAL = config("USAGE_PRUNE_INTERVAL", default=60 * 60, cast=int)
+
+
+class Command(BaseCommand):
+    help = "Run the periodic jobs: subscription expiry, renewal reminders and usage pruning"
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run the due jobs once and exit")
+    def handle(self, *args, **options):
+        scheduler = (
+            Scheduler()
+            .every(SUBSCRIPTION_CHECK_INTERVAL, "expire_subscriptions", SubscriptionExpiry.expire)
+            .every(SUBSCRIPTION_CHECK_INTERVAL, "remind_subscriptions", SubscriptionExpiry.remind)
+            .every(USAGE_PRUNE_INTERVAL, "prune_usage", PlanUsageLedger.prune)
+        )
+        if options["once"]:
+            for name, result in scheduler.run_pending().items():
+                self.report(name, result)
+            return
+        scheduler.run(self.report)
+    def report(self, name, result):
+        if result:
+            self.stdout.write(f"{name}: {result}")
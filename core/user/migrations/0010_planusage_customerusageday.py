@@ -0,0 +1,70 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:58
+
+import django.db.models.deletion
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def populate_usage(apps, schema_editor):
+    Business = apps.get_model("business", "Business")
+    Product = apps.get_model("product", "Product")
+    Service = apps.get_model("service", "Service")
+    Customer = apps.get_model("customer", "Customer")
+    PlanUsage = apps.get_model("user", "PlanUsage")
+    CustomerUsageDay = apps.get_model("user", "CustomerUsageDay")
+    usage = defaultdict(lambda: {"businesses": 0, "inventory": 0})
+    for owner_id, count in Business.objects.order_by().values_list("owner_id").annotate(count=Count("id")):
+        usage[owner_id]["businesses"] = count
+    for model in (Product, Service):
+        for owner_id, count in model.objects.order_by().values_list("category__business__owner_id").annotate(count=Count("id")):
+            if owner_id:
+                usage[owner_id]["inventory"] += count
+    PlanUsage.objects.bulk_create([PlanUsage(owner_id=owner_id, **counts) for owner_id, counts in usage.items()], batch_size=1000)
+    since = timezone.localdate() - timedelta(days=29)
+    days = Customer.objects.filter(created_at__date__gte=since).order_by().values_list(
+        "business__owner_id", "created_at__date").annotate(count=Count("id"))
+    CustomerUsageDay.objects.bulk_create([
+        CustomerUsageDay(owner_id=owner_id, date=day, customers=count) for owner_id, day, count in days
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('business', '0012_business_logo_variants'),
+        ('customer', '0003_customer_profile_pic_variants'),
+        ('product', '0014_product_image_variants'),
+        ('service', '0003_service_image_variants'),
+        ('user', '0009_syncsubscription_inventory_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('businesses', models.IntegerField(default=0)),
+                ('inventory', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='plan_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CustomerUsageDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('customers', models.IntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='customer_usage_days', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('owner', 'date')},
+            },
+        ),
+        migrations.RunPython(populate_usage, migrations.RunPython.noop),
+    ]
@@ -80,3 +80,27 @@ class MarketerCommision(models.Model):
     def __str__(self):
         return str(self.id)
 
+
+
+class PlanUsage(models.Model):
+    """
+    What an owner has used of their plan's limits, kept up to date by
+    user.usage.PlanUsageLedger so limits are checked without counting rows.
+    """
+    owner = models.OneToOneField(User, on_delete=models.CASCADE, related_name="plan_usage")
+    businesses = models.IntegerField(default=0)
+    inventory = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    def __str__(self):
+        return f"{self.owner_id}: {self.businesses} businesses, {self.inventory} inventory"
+
+
+class CustomerUsageDay(models.Model):
+    """Customers an owner added on one day; the customer limit sums a window of these."""
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="customer_usage_days")
+    date = models.DateField()
+    customers = models.IntegerField(default=0)
+    class Meta:
+        unique_together = ("owner", "date")
+    def __str__(self):
+        return f"{self.owner_id} {self.date}: {self.customers}"
@@ -0,0 +1,96 @@
+from datetime import timedelta
+from decouple import config
+from django.db import connection, transaction
+from django.utils import timezone
+from authentication.models import User
+from notification.outbox import Outbox
+from utils.access import Access
+
+EXPIRY_CHUNK_SIZE = config("EXPIRY_CHUNK_SIZE", default=500, cast=int)
+# Subscriptions ending within this many days get one renewal reminder
+RENEWAL_REMINDER_DAYS = config("RENEWAL_REMINDER_DAYS", default=3, cast=int)
+
+
+def _column(name):
+    return connection.ops.quote_name(User._meta.get_field(name).column)
+
+
+class SubscriptionExpiry:
+    """
+    Set based subscription housekeeping, cheap enough to run every few
+    minutes from run_scheduler.
+
+    Each pass claims a chunk of users with one UPDATE ... RETURNING (skipping
+    rows another pass has locked, where the database can) and queues their
+    push notifications through the outbox with one insert, in a short
+    transaction per chunk, until a chunk comes back short. Expired users'
+    cached access is dropped after each chunk. Reminders record the end date
+    they were sent for, so each subscription gets one however often the
+    pass runs.
+    """
+
+    @staticmethod
+    def update_returning(assignments, conditions, params, returning, chunk_size):
+        table = connection.ops.quote_name(User._meta.db_table)
+        pk = _column("id")
+        lock = " FOR UPDATE SKIP LOCKED" if connection.features.has_select_for_update_skip_locked else ""
+        sql = (
+            f"UPDATE {table} SET {assignments} WHERE {pk} IN ("
+            f"SELECT {pk} FROM {table} WHERE {conditions} LIMIT %s{lock}"
+            f") RETURNING {pk}, {', '.join(_column(field) for field in returning)}"
+        )
+        fields = [User._meta.pk] + [User._meta.get_field(field) for field in returning]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [*params, chunk_size])
+            return [tuple(field.to_python(value) for field, value in zip(fields, row)) for row in cursor.fetchall()]
+
+    @staticmethod
+    def expire(chunk_size=EXPIRY_CHUNK_SIZE):
+        """Unsubscribes the users whose subscription has ended. Returns how many."""
+        today = timezone.localdate()
+        updated_at = User._meta.get_field("updated_at").get_db_prep_value(timezone.now(), connection)
+        expired = 0
+        while True:
+            with transaction.atomic():
+                rows = SubscriptionExpiry.update_returning(
+                    f"{_column('is_subscribed')} = %s, {_column('updated_at')} = %s",
+                    f"{_column('is_subscribed')} = %s AND {_column('subscription_end_date')} <= %s",
+                    [False, updated_at, True, today],
+                    ["fcm_token"],
+                    chunk_size,
+                )
+                Outbox.enqueue([
+                    Outbox.push(token, "Subscription expired", "Your subscription has expired. Renew it to keep using your businesses.",
+                                {"type": "SUBSCRIPTION_EXPIRED"})
+                    for _, token in rows if token
+                ])
+            if rows:
+                Access.invalidate_owners([user_id for user_id, _ in rows])
+            expired += len(rows)
+            if len(rows) < chunk_size:
+                return expired
+
+    @staticmethod
+    def remind(chunk_size=EXPIRY_CHUNK_SIZE, days=RENEWAL_REMINDER_DAYS):
+        """Queues one renewal reminder per subscription ending within `days`. Returns how many."""
+        today = timezone.localdate()
+        reminded_for, end_date = _column("subscription_reminded_for"), _column("subscription_end_date")
+        reminded = 0
+        while True:
+            with transaction.atomic():
+                rows = SubscriptionExpiry.update_returning(
+                    f"{reminded_for} = {end_date}",
+                    f"{_column('is_subscribed')} = %s AND {end_date} > %s AND {end_date} <= %s"
+                    f" AND ({reminded_for} IS NULL OR {reminded_for} <> {end_date})",
+                    [True, today, today + timedelta(days=days)],
+                    ["fcm_token", "subscription_end_date"],
+                    chunk_size,
+                )
+                Outbox.enqueue([
+                    Outbox.push(token, "Subscription ending soon", f"Your subscription ends on {ends:%d %b %Y}. Renew it to avoid any interruption.",
+                                {"type": "SUBSCRIPTION_REMINDER"})
+                    for _, token, ends in rows if token
+                ])
+            reminded += len(rows)
+            if len(rows) < chunk_size:
+                return reminded
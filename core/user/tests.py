@@ -1,3 +1,100 @@
+from datetime import timedelta
 from django.test import TestCase
+from django.utils import timezone
+from authentication.models import User
+from business.models import Business
+from category.models import Category
+from customer.models import Customer
+from notification.models import OutboxMessage
+from product.models import Product
+from user.models import PlanUsage, CustomerUsageDay, SyncSubscription
+from user.subscriptions import SubscriptionExpiry
+from user.usage import PlanUsageLedger
 
-# Create your tests here.
+
+def make_plan(**limits):
+    values = {"inventory_count": -1, "customers_count": -1, "no_of_business": -1, "no_of_attendants": -1}
+    values.update(limits)
+    return SyncSubscription.objects.create(
+        name="GOLD", code="GOLD", monthly=1, quarterly=1, biannually=1, annually=1, sales_count=1, **values
+    )
+
+
+class PlanUsageLedgerTest(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user("Ada", "Obi", "owner@example.com", "0801", password="pw", subscription="GOLD")
+        self.business = Business.objects.create(owner=self.owner, name="Shop", country="NG", state="Lagos", city="Ikeja", street="1 Road", logo="business/logo.png")
+        self.category = Category.objects.create(business=self.business, name="Drinks")
+        for i in range(3):
+            Product.objects.create(name=f"P{i}", category=self.category, quantity=5, cost_price=5, selling_price=10)
+
+    def test_missing_usage_is_recounted_before_reserving(self):
+        self.assertFalse(PlanUsage.objects.filter(owner=self.owner).exists())
+        self.assertTrue(PlanUsageLedger.reserve(self.owner, make_plan(inventory_count=10), "inventory", 2))
+        usage = PlanUsage.objects.get(owner=self.owner)
+        self.assertEqual(usage.inventory, 5)
+        self.assertEqual(usage.businesses, 1)
+
+    def test_reserve_stops_at_the_limit(self):
+        plan = make_plan(inventory_count=4)
+        PlanUsageLedger.recount(self.owner)
+        self.assertTrue(PlanUsageLedger.reserve(self.owner, plan, "inventory"))
+        self.assertFalse(PlanUsageLedger.reserve(self.owner, plan, "inventory"))
+        self.assertFalse(PlanUsageLedger.reserve(self.owner, plan, "inventory", 2))
+        self.assertEqual(PlanUsage.objects.get(owner=self.owner).inventory, 4)
+
+    def test_unlimited_plan_always_reserves(self):
+        PlanUsageLedger.recount(self.owner)
+        self.assertTrue(PlanUsageLedger.reserve(self.owner, make_plan(), "businesses", 100))
+        self.assertEqual(PlanUsage.objects.get(owner=self.owner).businesses, 101)
+
+    def test_release_gives_the_room_back(self):
+        plan = make_plan(inventory_count=3)
+        PlanUsageLedger.recount(self.owner)
+        self.assertFalse(PlanUsageLedger.reserve(self.owner, plan, "inventory"))
+        PlanUsageLedger.release(self.owner, "inventory")
+        self.assertTrue(PlanUsageLedger.reserve(self.owner, plan, "inventory"))
+
+    def test_recount_matches_the_rows(self):
+        PlanUsageLedger.recount(self.owner)
+        PlanUsage.objects.filter(owner=self.owner).update(inventory=42, businesses=7)
+        Customer.objects.create(business=self.business, name="Cus", phone="1", email="c@example.com")
+        usage = PlanUsageLedger.recount(self.owner)
+        self.assertEqual((usage.inventory, usage.businesses), (3, 1))
+        self.assertEqual(PlanUsageLedger.customers(self.owner), 1)
+
+    def test_customers_are_limited_over_the_window(self):
+        plan = make_plan(customers_count=2)
+        PlanUsageLedger.recount(self.owner)
+        CustomerUsageDay.objects.create(owner=self.owner, date=PlanUsageLedger.window_start() - timedelta(days=1), customers=5)
+        self.assertTrue(PlanUsageLedger.reserve(self.owner, plan, "customers", 2))
+        self.assertFalse(PlanUsageLedger.reserve(self.owner, plan, "customers"))
+        PlanUsageLedger.release(self.owner, "customers", day=timezone.localdate())
+        self.assertTrue(PlanUsageLedger.reserve(self.owner, plan, "customers"))
+        self.assertEqual(PlanUsageLedger.prune(), 1)
+
+
+class SubscriptionExpiryTest(TestCase):
+    def setUp(self):
+        today = timezone.localdate()
+        self.users = []
+        for i, days in enumerate([-2, 0, 1, 2, 10]):
+            user = User.objects.create_user("Ada", "Obi", f"user{i}@example.com", f"080{i}", password="pw")
+            User.objects.filter(id=user.id).update(is_subscribed=True, subscription_end_date=today + timedelta(days=days), fcm_token=f"token{i}")
+            self.users.append(user)
+
+    def subscribed(self):
+        return list(User.objects.filter(id__in=[user.id for user in self.users]).order_by("email").values_list("is_subscribed", flat=True))
+
+    def test_expire_unsubscribes_ended_subscriptions_in_chunks(self):
+        self.assertEqual(SubscriptionExpiry.expire(chunk_size=1), 2)
+        self.assertEqual(self.subscribed(), [False, False, True, True, True])
+        self.assertEqual(OutboxMessage.objects.filter(payload__data__type="SUBSCRIPTION_EXPIRED").count(), 2)
+        self.assertEqual(SubscriptionExpiry.expire(), 0)
+
+    def test_remind_once_per_end_date(self):
+        self.assertEqual(SubscriptionExpiry.remind(days=3), 2)
+        self.assertEqual(SubscriptionExpiry.remind(days=3), 0)
+        User.objects.filter(id=self.users[2].id).update(subscription_end_date=timezone.localdate() + timedelta(days=3))
+        self.assertEqual(SubscriptionExpiry.remind(days=3), 1)
+        self.assertEqual(OutboxMessage.objects.filter(payload__data__type="SUBSCRIPTION_REMINDER").count(), 3)
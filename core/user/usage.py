@@ -0,0 +1,99 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from business.models import Business
+from customer.models import Customer
+from product.models import Product
+from service.models import Service
+from user.models import PlanUsage, CustomerUsageDay
+
+# The customer limit covers the customers added in this many days, today included
+CUSTOMER_WINDOW_DAYS = 30
+# PlanUsage counter: SyncSubscription limit
+LIMITS = {"businesses": "no_of_business", "inventory": "inventory_count", "customers": "customers_count"}
+
+
+class PlanUsageLedger:
+    """
+    Keeps PlanUsage and CustomerUsageDay in step with what owners create.
+
+    `reserve` checks a plan limit and takes the room in the same statement,
+    so it runs in the transaction that creates the rows and rolls back with
+    it. Deletes `release` what they free; deletes that cascade (a business
+    or a category) `recount` the owner instead. Customers are counted per
+    day and the limit applies to the last CUSTOMER_WINDOW_DAYS of buckets.
+    """
+
+    @staticmethod
+    def window_start():
+        return timezone.localdate() - timedelta(days=CUSTOMER_WINDOW_DAYS - 1)
+
+    @staticmethod
+    def usage(owner):
+        return PlanUsage.objects.filter(owner=owner).first() or PlanUsageLedger.recount(owner)
+
+    @staticmethod
+    def customers(owner):
+        days = CustomerUsageDay.objects.filter(owner=owner, date__gte=PlanUsageLedger.window_start())
+        return days.aggregate(total=Sum("customers"))["total"] or 0
+
+    @staticmethod
+    def recount(owner):
+        counts = {
+            "businesses": Business.objects.filter(owner=owner).count(),
+            "inventory": (
+                Product.objects.filter(category__business__owner=owner).count()
+                + Service.objects.filter(category__business__owner=owner).count()
+            ),
+        }
+        days = Customer.objects.filter(business__owner=owner, created_at__date__gte=PlanUsageLedger.window_start()).order_by()
+        days = days.values_list("created_at__date").annotate(added=Count("id"))
+        with transaction.atomic():
+            usage, _ = PlanUsage.objects.update_or_create(owner=owner, defaults=counts)
+            CustomerUsageDay.objects.filter(owner=owner).delete()
+            CustomerUsageDay.objects.bulk_create([CustomerUsageDay(owner=owner, date=day, customers=added) for day, added in days])
+        return usage
+
+    @staticmethod
+    def reserve(owner, plan, counter, count=1):
+        """Takes `count` of `counter` if `plan` allows it; False when over the limit."""
+        limit = getattr(plan, LIMITS[counter])
+        if counter == "customers":
+            return PlanUsageLedger.reserve_customers(owner, limit, count)
+        usage = PlanUsage.objects.filter(owner=owner)
+        if limit != -1:
+            usage = usage.filter(**{f"{counter}__lte": limit - count})
+        if usage.update(**{counter: F(counter) + count}):
+            return True
+        if PlanUsage.objects.filter(owner=owner).exists():
+            return False
+        PlanUsageLedger.recount(owner)
+        return PlanUsageLedger.reserve(owner, plan, counter, count)
+
+    @staticmethod
+    def reserve_customers(owner, limit, count=1):
+        with transaction.atomic():
+            # The usage row serialises the owner's check and bucket update
+            if PlanUsage.objects.select_for_update().filter(owner=owner).first() is None:
+                PlanUsageLedger.recount(owner)
+                PlanUsage.objects.select_for_update().filter(owner=owner).first()
+            if limit != -1 and PlanUsageLedger.customers(owner) + count > limit:
+                return False
+            today = timezone.localdate()
+            if not CustomerUsageDay.objects.filter(owner=owner, date=today).update(customers=F("customers") + count):
+                CustomerUsageDay.objects.create(owner=owner, date=today, customers=count)
+        return True
+
+    @staticmethod
+    def release(owner, counter, count=1, day=None):
+        """Gives back `count` of `counter`; customers also need the `day` they were added."""
+        if counter == "customers":
+            CustomerUsageDay.objects.filter(owner=owner, date=day).update(customers=F("customers") - count)
+        else:
+            PlanUsage.objects.filter(owner=owner).update(**{counter: F(counter) - count})
+
+    @staticmethod
+    def prune():
+        """Deletes the customer buckets that fell out of every window."""
+        return CustomerUsageDay.objects.filter(date__lt=PlanUsageLedger.window_start()).delete()[0]
@@ -7,12 +7,8 @@ from utils.permissions import IsBusinessOwner, IsSubscribed
 from utils.velve import VelvePayment
 from django.db.models import Q
 from django.db import transaction
-from service.models import Service
-from product.models import Product
-from customer.models import Customer
-from django.utils import timezone
-from datetime import timedelta
 from user.models import UserSubscriptions, SyncSubscription
+from user.usage import PlanUsageLedger
 from django.shortcuts import get_object_or_404
 from user.serializers import (
     UserProfileSerializer,
@@ -82,11 +78,8 @@ class UserActivePlan(views.APIView):
     def get(self, request):
         user = self.request.user
         plan = UserSubscriptions.objects.filter(user=user, status="SUCCESSFUL").order_by("-created_at").first()
-        product_counts = Product.objects.filter(category__business__owner=user).count()
-        service_counts = Service.objects.filter(category__business__owner=user).count()
-        inventory_count =  product_counts + service_counts
-        thirty_days_ago = timezone.now() - timedelta(days=30)
-        recent_customers_count = Customer.objects.filter(business__owner=user, created_at__gte=thirty_days_ago).count()
+        inventory_count = PlanUsageLedger.usage(user).inventory
+        recent_customers_count = PlanUsageLedger.customers(user)
         return Response(data={
             "plan_id": plan.id if plan else 1,
             "start_date":user.subscription_date,
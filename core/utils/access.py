@@ -0,0 +1,122 @@
+import time
+from decouple import config
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from business.models import Business
+
+ACCESS_TTL = config("ACCESS_CACHE_TTL", default=60, cast=int)
+
+
+class AccessContext:
+    """
+    The businesses a user owns or attends, and whether the subscription
+    paying for them is live; None for an attendant with no active business.
+    """
+    def __init__(self, role, owned, attended, subscribed):
+        self.role = role
+        self.owned = set(owned)
+        self.attended = set(attended)
+        self.subscribed = subscribed
+
+    @property
+    def business_ids(self):
+        return self.owned | self.attended
+
+    def owns(self, business_id):
+        return str(business_id) in self.owned
+
+    def attends(self, business_id):
+        return str(business_id) in self.attended
+
+    def can_access(self, business_id):
+        return self.owns(business_id) or self.attends(business_id)
+
+
+class Access:
+    """
+    Resolves a user's AccessContext once per request, and keeps it in the
+    cache for ACCESS_TTL seconds so the permission classes and the view of
+    the same request, and the next few requests, share it.
+
+    Writes that change ownership, attendance or a subscription call
+    `invalidate` (or `invalidate_owner`, which also covers the owner's
+    attendants, whose access depends on the owner's subscription) once their
+    transaction commits; the TTL bounds how long anything else can be stale.
+    `invalidate` also records
+    when it happened, for as long as an access token lives, so claims signed
+    into older tokens stop being trusted (see authentication.tokens).
+
+    A user authenticated from token claims carries the context in its
+    `access_state`, and no lookup is made at all.
+    """
+
+    @staticmethod
+    def key(user_id):
+        return f"access:{user_id}"
+
+    @staticmethod
+    def of(request):
+        context = getattr(request, "_access", None)
+        if context is None:
+            state = getattr(request.user, "access_state", None)
+            context = AccessContext(**state) if state else Access.get(request.user)
+            request._access = context
+        return context
+
+    @staticmethod
+    def get(user):
+        state = cache.get(Access.key(user.id))
+        if state is None:
+            state = Access.build(user)
+            cache.set(Access.key(user.id), state, ACCESS_TTL)
+        return AccessContext(**state)
+
+    @staticmethod
+    def build(user):
+        owned, attended = [], []
+        subscribed = user.is_subscribed if user.role == "OWNER" else None
+        businesses = Business.objects.filter(Q(owner=user) | Q(attendants=user)).values_list(
+            "id", "owner_id", "is_active", "owner__is_subscribed").distinct()
+        for business_id, owner_id, is_active, owner_subscribed in businesses:
+            if owner_id == user.id:
+                owned.append(str(business_id))
+                continue
+            attended.append(str(business_id))
+            # Attendants ride on the owner's subscription of an active business
+            if user.role == "ATTENDANT" and is_active and subscribed is None:
+                subscribed = owner_subscribed
+        return {"role": user.role, "owned": owned, "attended": attended, "subscribed": subscribed}
+
+    @staticmethod
+    def changed_key(user_id):
+        return f"access:{user_id}:changed_at"
+
+    @staticmethod
+    def changed_since(user_id, timestamp):
+        changed_at = cache.get(Access.changed_key(user_id))
+        return changed_at is not None and changed_at >= timestamp
+
+    @staticmethod
+    def invalidate(*user_ids):
+        """
+        Drops the cached context of `user_ids` once the current transaction
+        commits, so a concurrent request cannot cache the state before it.
+        """
+        def apply():
+            cache.delete_many([Access.key(user_id) for user_id in user_ids])
+            changed_at = int(time.time())
+            lifetime = int(jwt_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+            cache.set_many({Access.changed_key(user_id): changed_at for user_id in user_ids}, lifetime)
+        transaction.on_commit(apply)
+
+    @staticmethod
+    def invalidate_owner(owner):
+        Access.invalidate_owners([owner.id])
+
+    @staticmethod
+    def invalidate_owners(owner_ids):
+        # Read now: the attendants may be deleted before the commit
+        attendants = Business.attendants.through.objects.filter(business__owner_id__in=owner_ids).values_list("user_id", flat=True)
+        Access.invalidate(*owner_ids, *list(attendants))
@@ -0,0 +1,101 @@
+import threading
+import time
+from decouple import config
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+from utils import logger
+
+DASHBOARD_FRESH_FOR = config("DASHBOARD_CACHE_FRESH_FOR", default=60, cast=int)
+DASHBOARD_TTL = config("DASHBOARD_CACHE_TTL", default=60 * 60 * 24, cast=int)
+REBUILD_LOCK_TIMEOUT = 60
+# Backends whose entries only the process that wrote them can see
+PER_PROCESS_CACHES = [
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+]
+
+
+def cache_is_shared():
+    """Whether every worker reads and writes the same default cache."""
+    return settings.CACHES["default"]["BACKEND"] not in PER_PROCESS_CACHES
+
+
+def check_shared_cache(app_configs, **kwargs):
+    if cache_is_shared():
+        return []
+    return [checks.Warning(
+        "The default cache is local to each process, so dashboard invalidations, "
+        "access invalidations, token revocations and scheduler locks only reach "
+        "the worker that made them.",
+        hint="Set CACHE_BACKEND and CACHE_LOCATION to a shared cache such as redis.",
+        id="utils.W001",
+    )]
+
+
+class DashboardCache:
+    """
+    Per business cache of the home dashboard payload.
+
+    Entries are served while fresh. Once older than DASHBOARD_FRESH_FOR, or
+    marked stale by a write, the cached copy is still returned and a single
+    background rebuild is started, so only the first request of the day (or
+    after an eviction) waits for the queries.
+    """
+
+    @staticmethod
+    def key(business_id):
+        # "Today" figures are part of the payload, so each day gets its own entry
+        return f"dashboard:{business_id}:{timezone.localdate()}"
+
+    @staticmethod
+    def get(business_id, build):
+        entry = cache.get(DashboardCache.key(business_id))
+        if entry is None:
+            return DashboardCache.refresh(business_id, build)
+        if entry["stale"] or time.time() - entry["built_at"] > DASHBOARD_FRESH_FOR:
+            DashboardCache.revalidate(business_id, build)
+        return entry["payload"]
+
+    @staticmethod
+    def refresh(business_id, build):
+        payload = build()
+        cache.set(DashboardCache.key(business_id), {"payload": payload, "built_at": time.time(), "stale": False}, DASHBOARD_TTL)
+        return payload
+
+    @staticmethod
+    def revalidate(business_id, build):
+        lock = f"{DashboardCache.key(business_id)}:rebuilding"
+        if not cache.add(lock, 1, REBUILD_LOCK_TIMEOUT):
+            return
+        def run():
+            try:
+                DashboardCache.refresh(business_id, build)
+            except Exception as e:
+                logger.error(f"Error rebuilding dashboard for business {business_id}: {str(e)}")
+            finally:
+                cache.delete(lock)
+                connection.close()
+        threading.Thread(target=run, daemon=True).start()
+
+    @staticmethod
+    def invalidate(business_id, **increments):
+        """
+        Marks the cached payload stale once the current transaction commits.
+        `increments` are added to the matching counters first so the copy served
+        until the rebuild lands already includes the write; a lost update between
+        two writers is corrected by that rebuild.
+        """
+        def apply():
+            key = DashboardCache.key(business_id)
+            entry = cache.get(key)
+            if entry is None:
+                return
+            payload = entry["payload"]
+            for field, value in increments.items():
+                payload[field] = payload[field] + value if payload[field] else value
+            entry["stale"] = True
+            cache.set(key, entry, DASHBOARD_TTL)
+        transaction.on_commit(apply)
@@ -0,0 +1,113 @@
+import os
+from io import BytesIO
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from rest_framework import serializers
+from notification.models import OutboxMessage
+from utils.uploads import DirectUpload, IMAGE_MAX_PIXELS
+
+# Longest side, in pixels, of every derivative
+IMAGE_SIZES = {"thumb": 200, "medium": 800}
+WEBP_QUALITY = 80
+
+# model label: image field; the derivatives live in "<field>_variants"
+IMAGE_FIELDS = {
+    "product.Product": "image",
+    "service.Service": "image",
+    "customer.Customer": "profile_pic",
+    "business.Business": "logo",
+}
+
+
+class ImageDerivatives:
+    """
+    WebP thumbnails of uploaded images, stored next to the originals.
+
+    Uploads only queue an IMAGE_DERIVATIVES outbox message; drain_outbox
+    builds the files later and records their names with the name of the
+    original they came from in the model's `<field>_variants`. Until then, or
+    once the image is replaced, `url` serves the original.
+    """
+
+    @staticmethod
+    def url(name, variants=None, size=None):
+        if not name:
+            return None
+        if size and variants and variants.get("source") == name and variants.get(size):
+            return default_storage.url(variants[size])
+        return default_storage.url(name)
+
+    @staticmethod
+    def schedule(instance, field):
+        """Queues the derivatives of `instance.<field>` unless they are up to date."""
+        name = getattr(instance, field).name
+        variants = getattr(instance, f"{field}_variants") or {}
+        if not name or variants.get("source") == name:
+            return None
+        return OutboxMessage.objects.create(
+            kind="IMAGE_DERIVATIVES",
+            payload={"model": instance._meta.label, "id": str(instance.pk), "field": field},
+        )
+
+    @staticmethod
+    def build(label, pk, field):
+        model = apps.get_model(label)
+        instance = model.objects.filter(pk=pk).only(field, f"{field}_variants").first()
+        if not instance or not getattr(instance, field).name:
+            return
+        name = getattr(instance, field).name
+        previous = getattr(instance, f"{field}_variants") or {}
+        if previous.get("source") == name:
+            return
+        with default_storage.open(name, "rb") as original:
+            image = Image.open(original)
+            # Only the header has been read so far; refuse to decode bombs
+            if image.width * image.height > IMAGE_MAX_PIXELS:
+                raise ValueError(f"{name} is over {IMAGE_MAX_PIXELS} pixels")
+            image = ImageOps.exif_transpose(image)
+            image.load()
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        stem = os.path.splitext(name)[0]
+        variants = {"source": name}
+        for size, pixels in IMAGE_SIZES.items():
+            derivative = image.copy()
+            derivative.thumbnail((pixels, pixels))
+            content = BytesIO()
+            derivative.save(content, "WEBP", quality=WEBP_QUALITY)
+            variants[size] = default_storage.save(f"{stem}.{size}.webp", ContentFile(content.getvalue()))
+        # Only record them if the image was not replaced in the meantime
+        updated = model.objects.filter(pk=pk, **{field: name}).update(**{f"{field}_variants": variants})
+        stale = previous if updated else variants
+        for size in IMAGE_SIZES:
+            if stale.get(size):
+                default_storage.delete(stale[size])
+
+
+class ImageVariantField(serializers.ImageField):
+    """
+    ImageField that serves a derivative: `size` ("thumb" or "medium"), or
+    else the `image_size` of the serializer context, as list endpoints pass.
+
+    Besides a file, it accepts the token of a DirectUpload slot of the model
+    field's folder, issued to the user of the request in the context.
+    """
+
+    def __init__(self, *args, size=None, **kwargs):
+        self.size = size
+        super().__init__(*args, **kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        variants = getattr(value.instance, f"{value.field.name}_variants", None)
+        return ImageDerivatives.url(value.name, variants, self.size or self.context.get("image_size"))
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and data:
+            folder = self.parent.Meta.model._meta.get_field(self.source).upload_to
+            request = self.context.get("request")
+            return DirectUpload.claim(data, folder, getattr(request, "user", None))
+        return super().to_internal_value(data)
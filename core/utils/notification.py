@@ -2,6 +2,8 @@ import requests
 from decouple import config
 from utils import logger, NOTIFICATION_BASE_URL
 
+NOTIFICATION_TIMEOUT = config("NOTIFICATION_TIMEOUT", default=5, cast=int)
+
 
 class SendSMS:
     @staticmethod
@@ -23,12 +25,14 @@ class SendSMS:
 class SendPushNotification:
     @staticmethod
     def send_notification(data):
-        url = f"http://127.0.0.1:8000/send-notification/"
+        url = f"{NOTIFICATION_BASE_URL}/send-notification/"
         headers = {"Content-Type": "application/json"}
         try:
-            requests.post(url, headers=headers, json=data)
+            response = requests.post(url, headers=headers, json=data, timeout=NOTIFICATION_TIMEOUT)
+            return response.ok
         except BaseException as e:
             logger.error(f"Error sending Notification: {str(e)}")
+            return False
     @staticmethod
     def notify(info):
         data = {
@@ -37,4 +41,23 @@ class SendPushNotification:
             "body": info["body"],
             "data": info["data"]
         }
-        SendPushNotification.send_notification(data)
+        return SendPushNotification.send_notification(data)
+    @staticmethod
+    def send_bulk_notification(data):
+        url = f"{NOTIFICATION_BASE_URL}/send-bulk-notification/"
+        headers = {"Content-Type": "application/json"}
+        try:
+            response = requests.post(url, headers=headers, json=data, timeout=NOTIFICATION_TIMEOUT)
+            return response.ok
+        except BaseException as e:
+            logger.error(f"Error sending bulk Notification: {str(e)}")
+            return False
+    @staticmethod
+    def notify_bulk(info):
+        data = {
+            "tokens": info["tokens"],
+            "title": info["title"],
+            "body": info["body"],
+            "data": {key: str(value) for key, value in info["data"].items()}
+        }
+        return SendPushNotification.send_bulk_notification(data)
@@ -1,15 +1,148 @@
+import base64
 import math
+from datetime import date, datetime
+from django.db import connection
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.settings import api_settings
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomPagination(PageNumberPagination):
+    """
+    Page number pagination, plus a keyset mode for views that set
+    `cursor_ordering`, e.g. ("-created_at", "-id"), whose last column is unique.
+
+    The keyset mode is used when the request has a `cursor` parameter (empty
+    for the first page) next to the usual `limit`. Pages are read with a WHERE
+    on the last row of the previous page instead of an OFFSET, and `total` is
+    only computed when asked for with `total=exact` or `total=estimate`.
+    """
 
     page_size_query_param = 'limit'
     max_page_size = 1000
+    cursor_query_param = 'cursor'
+    total_query_param = 'total'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_ordering = getattr(view, "cursor_ordering", None)
+        self.use_cursor = bool(self.cursor_ordering) and self.cursor_query_param in request.query_params
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_keyset([queryset], request)
+
+    def paginate_union(self, querysets, request, view=None, ordering=None):
+        """
+        Paginates the UNION ALL of `querysets`, which must select the same
+        columns. A union cannot be filtered, so in keyset mode the cursor is
+        applied to every part before they are combined. `ordering` sorts the
+        union when paging by number and defaults to `cursor_ordering`.
+        """
+        self.cursor_ordering = getattr(view, "cursor_ordering", None)
+        self.use_cursor = bool(self.cursor_ordering) and self.cursor_query_param in request.query_params
+        if not self.use_cursor:
+            union = querysets[0].order_by().union(*[queryset.order_by() for queryset in querysets[1:]], all=True)
+            ordering = ordering or self.cursor_ordering
+            if ordering:
+                union = union.order_by(*ordering)
+            return super().paginate_queryset(union, request, view)
+        return self.paginate_keyset(querysets, request)
+
+    def paginate_keyset(self, querysets, request):
+        self.request = request
+        page_size = self.get_page_size(request) or api_settings.PAGE_SIZE
+        mode = request.query_params.get(self.total_query_param)
+        totals = [self.get_total(queryset, mode) for queryset in querysets]
+        self.total = None if None in totals else sum(totals)
+        position = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        if position:
+            querysets = [queryset.filter(self.after(*position)) for queryset in querysets]
+        if len(querysets) == 1:
+            queryset = querysets[0].order_by(*self.cursor_ordering)
+        else:
+            queryset = querysets[0].order_by().union(
+                *[queryset.order_by() for queryset in querysets[1:]], all=True
+            ).order_by(*self.cursor_ordering)
+        rows = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_position = tuple(self.value(rows[-1], field.lstrip("-")) for field in self.cursor_ordering)
+        self.page_size = page_size
+        return rows
+
+    def after(self, *position):
+        """Rows that sort after `position` for the `cursor_ordering` columns, the last one a unique tiebreaker."""
+        condition = Q()
+        equal = {}
+        for ordering, value in zip(self.cursor_ordering, position):
+            field = ordering.lstrip("-")
+            lookup = "lt" if ordering.startswith("-") else "gt"
+            condition |= Q(**equal, **{f"{field}__{lookup}": value})
+            equal[field] = value
+        return condition
+
+    @staticmethod
+    def value(row, field):
+        return row[field] if isinstance(row, dict) else getattr(row, field)
+
+    def encode_cursor(self, position):
+        raw = "|".join(value.isoformat() if isinstance(value, (date, datetime)) else str(value) for value in position)
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return None
+        try:
+            values = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", len(self.cursor_ordering) - 1)
+            if len(values) != len(self.cursor_ordering):
+                raise ValueError("Wrong number of cursor values")
+            position = []
+            for ordering, value in zip(self.cursor_ordering, values):
+                field = ordering.lstrip("-")
+                if field in ("created_at", "updated_at"):
+                    value = datetime.fromisoformat(value)
+                elif field == "date":
+                    value = date.fromisoformat(value)
+                position.append(value)
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound("Invalid cursor")
+        return tuple(position)
+
+    @staticmethod
+    def get_total(queryset, mode):
+        if mode == "exact":
+            return queryset.count()
+        if mode != "estimate":
+            return None
+        if connection.vendor != "postgresql":
+            return queryset.count()
+        # The planner's row estimate costs no scan
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        return plan[0]["Plan"]["Plan Rows"]
 
     def get_paginated_response(self, data):
+        if self.use_cursor:
+            next_link = None
+            if self.next_position:
+                next_link = replace_query_param(
+                    self.request.build_absolute_uri(), self.cursor_query_param, self.encode_cursor(self.next_position)
+                )
+            return Response({
+                'links': {
+                    'next': next_link,
+                    'previous': None
+                },
+                'total': self.total,
+                'limit': self.page_size,
+                'pages': math.ceil(self.total / self.page_size) if self.total is not None else None,
+                'results': data
+            })
         page_size = self.get_page_size(self.request)
         if page_size is None:
             page_size = api_settings.PAGE_SIZE
@@ -1,5 +1,5 @@
 from rest_framework import permissions, status
-from business.models import Business
+from utils.access import Access
 from rest_framework.exceptions import APIException
 
 class IsUser(permissions.BasePermission):
@@ -51,14 +51,12 @@ class IsSubscribed(permissions.BasePermission):
                 raise PaymentRequired()
             return True
 
-        # Check if the user is an ATTENDANT
+        # Check if the user is an ATTENDANT, of an active business
         if user.role == "ATTENDANT":
-            # Get the businesses the user is attending
-            business = Business.objects.filter(attendants=user, is_active=True).first()
-            if not business:
+            subscribed = Access.of(request).subscribed
+            if subscribed is None:
                 return False
-            
-            if not business.owner.is_subscribed:
+            if not subscribed:
                 raise PaymentRequired()
             return True
         return False
@@ -0,0 +1,47 @@
+import time
+from django.core.cache import cache
+from django.db import close_old_connections
+from utils import logger
+
+
+class Scheduler:
+    """
+    Runs periodic jobs in one long lived process (`manage.py run_scheduler`).
+
+    Before a job runs it takes a cache lock that lasts its interval, so with
+    a shared cache each job runs once per interval however many scheduler
+    processes are up. A failing job is logged and tried again next interval.
+    """
+
+    def __init__(self):
+        self.jobs = []
+
+    def every(self, seconds, name, function):
+        self.jobs.append({"name": name, "interval": seconds, "function": function, "due": 0})
+        return self
+
+    def run_pending(self):
+        """Runs the jobs that are due; returns {name: result} of the ones that ran here."""
+        results = {}
+        for job in self.jobs:
+            now = time.monotonic()
+            if job["due"] > now:
+                continue
+            job["due"] = now + job["interval"]
+            if not cache.add(f"scheduler:{job['name']}", 1, job["interval"]):
+                continue
+            close_old_connections()
+            try:
+                results[job["name"]] = job["function"]()
+            except Exception as e:
+                logger.error(f"Error running scheduled job {job['name']}: {str(e)}")
+            finally:
+                close_old_connections()
+        return results
+
+    def run(self, report=None):
+        while True:
+            for name, result in self.run_pending().items():
+                if report:
+                    report(name, result)
+            time.sleep(max(min(job["due"] for job in self.jobs) - time.monotonic(), 1))
@@ -0,0 +1,61 @@
+import uuid
+from functools import reduce
+from operator import and_, or_
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, FloatField, Q, Value, When
+from django.db.models.functions import Greatest
+
+
+class Search:
+    """
+    Relevance search over a few text columns of a model.
+
+    Every word of the query has to be found in one of the fields. `icontains`
+    and `istartswith` compile to UPPER(column) LIKE UPPER(...) on PostgreSQL,
+    which the models' gin_trgm_ops indexes on UPPER(column) answer without a
+    sequential scan. A word ending with `*` only matches the start of a field,
+    e.g. "cok*". A query that is a UUID matches the primary key exactly.
+
+    Results are annotated with `search_rank`: 1 for a field starting with the
+    query, plus the trigram word similarity between the query and the field
+    on PostgreSQL, the best field winning.
+    """
+
+    rank_field = "search_rank"
+
+    @staticmethod
+    def filter(queryset, query, fields):
+        query = query.strip()
+        if not query:
+            return queryset
+        try:
+            pk = uuid.UUID(query)
+        except ValueError:
+            pk = None
+        if pk and queryset.model._meta.pk.get_internal_type() == "UUIDField":
+            return queryset.filter(pk=pk).annotate(**{Search.rank_field: Value(1.0, output_field=FloatField())})
+        terms = []
+        for word in query.split():
+            if word.endswith("*"):
+                lookup, word = "istartswith", word.rstrip("*")
+            else:
+                lookup = "icontains"
+            if word:
+                terms.append(reduce(or_, [Q(**{f"{field}__{lookup}": word}) for field in fields]))
+        if terms:
+            queryset = queryset.filter(reduce(and_, terms))
+        return queryset.annotate(**{Search.rank_field: Search.rank(query.replace("*", ""), fields)})
+
+    @staticmethod
+    def rank(query, fields):
+        scores = []
+        for field in fields:
+            score = Case(
+                When(**{f"{field}__istartswith": query}, then=Value(1.0)),
+                default=Value(0.0), output_field=FloatField()
+            )
+            if connection.vendor == "postgresql":
+                score = score + TrigramWordSimilarity(query, field)
+            scores.append(score)
+        return Greatest(*scores) if len(scores) > 1 else scores[0]
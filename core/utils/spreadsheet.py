@@ -0,0 +1,103 @@
+import csv
+import io
+import re
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+SHEET_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+CELL_COLUMN = re.compile(r"^([A-Z]+)")
+
+
+class SpreadsheetError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def _column_index(reference):
+    index = 0
+    for letter in CELL_COLUMN.match(reference).group(1):
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+class Spreadsheet:
+    """
+    Reads the first sheet of an uploaded CSV or XLSX file as dicts keyed by the
+    header row, lowercased with spaces turned into underscores. Rows are
+    yielded one at a time; empty rows are skipped. A file that turns out to be
+    unreadable part way raises SpreadsheetError from the iteration, after the
+    rows before the fault were yielded.
+    """
+
+    @staticmethod
+    def rows(file):
+        name = (getattr(file, "name", "") or "").lower()
+        if name.endswith(".xlsx"):
+            values = Spreadsheet.xlsx_values(file)
+        elif name.endswith(".csv"):
+            values = Spreadsheet.csv_values(file)
+        else:
+            raise SpreadsheetError("Upload a .csv or .xlsx file")
+        header = None
+        for row in values:
+            if not any(str(value).strip() for value in row):
+                continue
+            if header is None:
+                header = [str(value).strip().lower().replace(" ", "_") for value in row]
+                continue
+            yield {key: str(value).strip() for key, value in zip(header, row) if key}
+
+    @staticmethod
+    def csv_values(file):
+        reader = csv.reader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+        try:
+            yield from reader
+        except UnicodeDecodeError:
+            raise SpreadsheetError("The .csv file is not UTF-8 text")
+        except csv.Error as e:
+            raise SpreadsheetError(f"The .csv file could not be read after line {reader.line_num}: {e}")
+
+    @staticmethod
+    def xlsx_values(file):
+        try:
+            workbook = zipfile.ZipFile(file)
+            shared = []
+            if "xl/sharedStrings.xml" in workbook.namelist():
+                with workbook.open("xl/sharedStrings.xml") as strings:
+                    for _, element in iterparse(strings):
+                        if element.tag == f"{SHEET_NS}si":
+                            shared.append("".join(text.text or "" for text in element.iter(f"{SHEET_NS}t")))
+                            element.clear()
+            sheets = sorted(name for name in workbook.namelist() if name.startswith("xl/worksheets/sheet"))
+            if not sheets:
+                raise SpreadsheetError("The workbook has no sheet")
+            with workbook.open(sheets[0]) as sheet:
+                for _, element in iterparse(sheet):
+                    if element.tag != f"{SHEET_NS}row":
+                        continue
+                    row = []
+                    for cell in element.iter(f"{SHEET_NS}c"):
+                        index = _column_index(cell.get("r")) if cell.get("r") else len(row)
+                        row.extend([""] * (index - len(row)))
+                        row.append(Spreadsheet.xlsx_cell(cell, shared))
+                    element.clear()
+                    yield row
+        except (zipfile.BadZipFile, KeyError, IndexError, SyntaxError):
+            raise SpreadsheetError("The file is not a valid .xlsx workbook")
+
+    @staticmethod
+    def xlsx_cell(cell, shared):
+        kind = cell.get("t")
+        if kind == "inlineStr":
+            return "".join(text.text or "" for text in cell.iter(f"{SHEET_NS}t"))
+        value = cell.find(f"{SHEET_NS}v")
+        value = value.text if value is not None and value.text is not None else ""
+        if kind == "s" and value:
+            return shared[int(value)]
+        if kind == "b":
+            return "TRUE" if value == "1" else "FALSE"
+        if kind is None and value.endswith(".0"):
+            # Whole numbers are stored as floats
+            return value[:-2]
+        return value
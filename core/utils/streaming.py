@@ -0,0 +1,31 @@
+import json
+from decouple import config
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+STREAM_CHUNK_SIZE = config("STREAM_CHUNK_SIZE", default=500, cast=int)
+
+
+class StreamingJSON:
+    """
+    Writes a queryset out as a JSON array while it is read from a server side
+    cursor, so only one chunk of rows is ever held in memory.
+    """
+
+    @staticmethod
+    def response(queryset, serialize, chunk_size=STREAM_CHUNK_SIZE):
+        return StreamingHttpResponse(StreamingJSON.rows(queryset, serialize, chunk_size), content_type="application/json")
+
+    @staticmethod
+    def rows(queryset, serialize, chunk_size=STREAM_CHUNK_SIZE):
+        yield "["
+        chunk = []
+        first = True
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(json.dumps(serialize(obj), cls=JSONEncoder))
+            if len(chunk) == chunk_size:
+                yield ("" if first else ",") + ",".join(chunk)
+                chunk, first = [], False
+        if chunk:
+            yield ("" if first else ",") + ",".join(chunk)
+        yield "]"
@@ -0,0 +1,106 @@
+import mimetypes
+import os
+import uuid
+from decouple import config
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image
+from rest_framework import serializers
+from storages.backends.s3 import S3Storage
+
+UPLOAD_URL_EXPIRES = config("UPLOAD_URL_EXPIRES", default=900, cast=int)
+UPLOAD_MAX_SIZE = config("UPLOAD_MAX_SIZE", default=5 * 1024 * 1024, cast=int)
+# How long the token of a slot can be sent as an image after it was issued
+UPLOAD_CLAIM_EXPIRES = config("UPLOAD_CLAIM_EXPIRES", default=60 * 60 * 24, cast=int)
+UPLOAD_TOKEN_SALT = "direct-upload"
+UPLOAD_CLAIM_SALT = "direct-upload-claim"
+# Images are refused, and never decoded, past this many pixels
+IMAGE_MAX_PIXELS = config("IMAGE_MAX_PIXELS", default=40_000_000, cast=int)
+
+# Raster formats only; content type: Pillow format
+UPLOAD_CONTENT_TYPES = {
+    "image/jpeg": "JPEG",
+    "image/png": "PNG",
+    "image/webp": "WEBP",
+}
+
+# kind: folder of the model's upload_to, so uploads land where form uploads do
+UPLOAD_FOLDERS = {
+    "product": "product",
+    "service": "service",
+    "customer": "customer",
+    "business": "business",
+}
+
+
+class DirectUpload:
+    """
+    Upload slots the client PUTs an image to without going through Django.
+
+    With S3 storage the slot is a presigned PUT on the bucket. Any other
+    storage (local runs and tests) gets a signed URL on LocalUploadView, which
+    stands in for the bucket. The client then sends only the returned token
+    as the image of a product, service, customer or business. The token binds
+    the key to the user the slot was issued to, and `claim` checks it and
+    that the object is a JPEG, PNG or WebP image before the key is saved.
+    """
+
+    @staticmethod
+    def slot(request, kind, filename, content_type):
+        extension = os.path.splitext(filename)[1].lower() or mimetypes.guess_extension(content_type) or ""
+        key = f"{UPLOAD_FOLDERS[kind]}/{uuid.uuid4().hex}{extension}"
+        if isinstance(default_storage, S3Storage):
+            url = default_storage.connection.meta.client.generate_presigned_url(
+                "put_object",
+                Params={"Bucket": default_storage.bucket_name, "Key": default_storage._normalize_name(key), "ContentType": content_type},
+                ExpiresIn=UPLOAD_URL_EXPIRES,
+            )
+        else:
+            token = signing.dumps({"key": key, "content_type": content_type}, salt=UPLOAD_TOKEN_SALT)
+            url = request.build_absolute_uri(reverse("local_upload", kwargs={"token": token}))
+        claim = signing.dumps({"key": key, "user": str(request.user.id)}, salt=UPLOAD_CLAIM_SALT)
+        return {
+            "token": claim,
+            "url": url,
+            "method": "PUT",
+            "headers": {"Content-Type": content_type},
+            "expires_in": UPLOAD_URL_EXPIRES,
+        }
+
+    @staticmethod
+    def read_token(token):
+        """The {"key", "content_type"} of a LocalUploadView token, or None."""
+        try:
+            return signing.loads(token, salt=UPLOAD_TOKEN_SALT, max_age=UPLOAD_URL_EXPIRES)
+        except signing.BadSignature:
+            return None
+
+    @staticmethod
+    def claim(token, folder, user):
+        """Returns the key of a slot `token` issued to `user` if it names an uploaded image of `folder`."""
+        try:
+            upload = signing.loads(token, salt=UPLOAD_CLAIM_SALT, max_age=UPLOAD_CLAIM_EXPIRES)
+        except signing.BadSignature:
+            raise serializers.ValidationError("Invalid or expired upload token")
+        key = upload["key"]
+        if user is None or upload["user"] != str(user.id) or not key.startswith(f"{folder}/") or ".." in key:
+            raise serializers.ValidationError("Invalid upload token")
+        try:
+            size = default_storage.size(key)
+        except (FileNotFoundError, OSError):
+            raise serializers.ValidationError("Nothing was uploaded with this token")
+        if size > UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Uploads are limited to {UPLOAD_MAX_SIZE // (1024 * 1024)}MB")
+        try:
+            with default_storage.open(key, "rb") as upload_file:
+                image = Image.open(upload_file)
+                image_format, pixels = image.format, image.width * image.height
+                image.verify()
+        except Exception:
+            raise serializers.ValidationError("Upload a valid image. The file uploaded was either not an image or a corrupted image.")
+        if pixels > IMAGE_MAX_PIXELS:
+            raise serializers.ValidationError(f"Images are limited to {IMAGE_MAX_PIXELS // 1_000_000} megapixels")
+        if image_format not in UPLOAD_CONTENT_TYPES.values():
+            raise serializers.ValidationError("Only JPEG, PNG and WebP images can be uploaded")
+        return key
@@ -57,7 +57,7 @@ def send_bulk_push_notification(
 
     try:
         # Send the notifications
-        response = messaging.send_multicast(message)
+        response = messaging.send_each_for_multicast(message)
 
         # Log the overall response
         logger.info(f"Send result: {response}")